@@ -0,0 +1,466 @@
+"""asyncio flavour of pyArango, requires python >= 3.5 and aiohttp (pip install pyArango[async]).
+It shares the url building and the handling of ArangoDB's responses with the synchronous classes, only the requests are awaited::
+
+    async with AsyncConnection(username = "root", password = "root") as conn :
+        db = await conn.getDatabase("test_db")
+        doc = db["users"].createDocument({"name" : "Tesla"})
+        await doc.save()
+        query = await db.AQLQuery("FOR u IN users RETURN u", batchSize = 100)
+        async for doc in query :
+            print(doc["name"])
+"""
+
+try :
+    import aiohttp
+except ImportError :
+    aiohttp = None
+
+from .database import Database
+from .document import Document, Edge
+from .query import Query, AQLQuery, RawCursor
+from .theExceptions import ConnectionError, CreationError, AQLQueryError, TransactionError
+from .codec import getCodec
+from .negativecache import NegativeCache
+from .connection import JsonResponse
+from . import consts as CONST
+
+__all__ = ["AsyncConnection", "AsyncDatabase", "AsyncCollection", "AsyncDocument", "AsyncEdge", "AsyncAQLQuery", "AsyncSession", "AsyncResponse"]
+
+class AsyncResponse(JsonResponse) :
+    """A response that has already been read. It has the same interface as JsonResponse: status_code, url, headers, content and json(), that decodes the content only once"""
+
+    __slots__ = ("url", "status_code", "headers", "content")
+
+    def __init__(self, url, status_code, headers, content, codec) :
+        JsonResponse.__init__(self, None, codec)
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+class AsyncSession(object) :
+    """The asynchronous counterpart of AikidoSession. Requests are performed by an aiohttp session that keeps up to 'connectionLimit' connections open,
+    allowing many requests to be in flight on a single event loop. Basic stats on requests are saved in the attribute '.log'"""
+
+    def __init__(self, username, password, connectionLimit = 100, codec = None) :
+        if aiohttp is None :
+            raise ImportError("The asyncio interface of pyArango requires aiohttp, install it with: pip install aiohttp")
+
+        if username :
+            self.auth = aiohttp.BasicAuth(username, password)
+        else :
+            self.auth = None
+
+        self.connectionLimit = connectionLimit
+        self.codec = getCodec(codec or "json")
+        self.session = None
+        self.log = {}
+        self.log["nb_request"] = 0
+        self.log["requests"] = {}
+
+    def _params(self, params) :
+        "aiohttp only accepts strings and numbers as url parameters"
+        if not params :
+            return None
+
+        ret = {}
+        for k, v in params.items() :
+            if type(v) is bool :
+                ret[k] = "true" if v else "false"
+            else :
+                ret[k] = v
+        return ret
+
+    async def request(self, method, url, params = None, data = None, headers = None) :
+        """performs a request and returns an AsyncResponse"""
+        if self.session is None :
+            self.session = aiohttp.ClientSession(connector = aiohttp.TCPConnector(limit = self.connectionLimit), auth = self.auth)
+
+        self.log["nb_request"] += 1
+        try :
+            self.log["requests"][method] += 1
+        except KeyError :
+            self.log["requests"][method] = 1
+
+        try :
+            async with self.session.request(method, url, params = self._params(params), data = data, headers = headers) as r :
+                content = await r.read()
+        except :
+            print ("===\nUnable to establish connection, perhaps arango is not running.\n===")
+            raise
+
+        if r.status == 401 :
+            raise ConnectionError("Unauthorized access, you must supply a (username, password) with the correct credentials", str(r.url), r.status, content)
+
+        return AsyncResponse(str(r.url), r.status, r.headers, content, self.codec)
+
+    def get(self, url, **kwargs) :
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) :
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs) :
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url, **kwargs) :
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs) :
+        return self.request("DELETE", url, **kwargs)
+
+    async def disconnect(self) :
+        if self.session is not None :
+            await self.session.close()
+            self.session = None
+
+class AsyncConnection(object) :
+    """The asynchronous counterpart of Connection. Nothing is loaded until connect() is awaited, databases are then loaded on demand with getDatabase()"""
+
+    def __init__(self, arangoURL = 'http://127.0.0.1:8529', username = None, password = None, connectionLimit = 100, codec = "json", negativeCacheTTL = 0) :
+        self.arangoURL = arangoURL.rstrip("/")
+        self.username = username
+        self.password = password
+        self.codec = getCodec(codec)
+        self.negativeCacheTTL = negativeCacheTTL
+        self.session = AsyncSession(username, password, connectionLimit, self.codec)
+
+        self.URL = '%s/_api' % self.arangoURL
+        if not self.session.auth :
+            self.databasesURL = '%s/database/user' % self.URL
+        else :
+            self.databasesURL = '%s/user/%s/database' % (self.URL, username)
+
+        self.databaseNames = []
+        self.databases = {}
+
+    async def connect(self) :
+        """loads the list of databases and returns the connection"""
+        await self.reload()
+        return self
+
+    async def reload(self) :
+        """reloads the list of database names"""
+        r = await self.session.get(self.databasesURL)
+        data = r.json()
+        if r.status_code == 200 and not data["error"] :
+            self.databaseNames = data["result"]
+        else :
+            raise ConnectionError(data["errorMessage"], self.databasesURL, r.status_code, r.content)
+
+    async def createDatabase(self, name, **dbArgs) :
+        "use dbArgs for arguments other than name. for a full list of arguments please have a look at arangoDB's doc"
+        dbArgs['name'] = name
+        r = await self.session.post(self.URL + "/database", data = self.codec.encode(dbArgs))
+        data = r.json()
+        if r.status_code == 201 and not data["error"] :
+            self.databaseNames.append(name)
+            return await self.getDatabase(name)
+        else :
+            raise CreationError(data["errorMessage"], r.content)
+
+    async def getDatabase(self, name) :
+        """returns the database 'name', loading its collections if they are not already"""
+        try :
+            return self.databases[name]
+        except KeyError :
+            pass
+
+        db = AsyncDatabase(self, name)
+        await db.reload()
+        self.databases[name] = db
+        return db
+
+    def hasDatabase(self, name) :
+        """returns true/false wether the connection has a database by the name of 'name'"""
+        return name in self.databaseNames
+
+    async def disconnect(self) :
+        await self.session.disconnect()
+
+    async def __aenter__(self) :
+        return await self.connect()
+
+    async def __aexit__(self, excType, excValue, traceback) :
+        await self.disconnect()
+
+    def __getitem__(self, dbName) :
+        """returns an already loaded database, use getDatabase() to load it"""
+        try :
+            return self.databases[dbName]
+        except KeyError :
+            raise KeyError("Database %s is not loaded, use: await connection.getDatabase('%s')" % (dbName, dbName))
+
+class AsyncDatabase(object) :
+    """The asynchronous counterpart of Database. Collections are wrapped into AsyncCollections. It only offers the functions listed here,
+    graphs, sessions, stream transactions and async jobs are not supported"""
+
+    def __init__(self, connection, name) :
+        self.name = name
+        self.connection = connection
+
+        self.URL = '%s/_db/%s/_api' % (self.connection.arangoURL, self.name)
+        self.collectionsURL = '%s/collection' % (self.URL)
+        self.cursorsURL = '%s/cursor' % (self.URL)
+        self.explainURL = '%s/explain' % (self.URL)
+        self.graphsURL = "%s/gharial" % self.URL
+        self.transactionURL = "%s/transaction" % self.URL
+
+        self.collections = {}
+        self.graphs = {}
+        self.missingCollections = NegativeCache(self.connection.negativeCacheTTL)
+
+    # the handling of the responses is shared with Database
+    _collectionsResponse = Database._collectionsResponse
+    _createCollectionRequest = Database._createCollectionRequest
+    _createCollectionResponse = Database._createCollectionResponse
+    hasCollection = Database.hasCollection
+
+    async def reloadCollections(self) :
+        "reloads the collection list."
+        r = await self.connection.session.get(self.collectionsURL)
+        self._collectionsResponse(r)
+        for name, col in self.collections.items() :
+            self.collections[name] = AsyncCollection(col)
+
+    async def reload(self) :
+        "reloads collections"
+        await self.reloadCollections()
+
+    async def createCollection(self, className = 'Collection', waitForSync = False, **colArgs) :
+        """Creates a collection and returns it, see Database.createCollection()"""
+        colClass, payload = self._createCollectionRequest(className, waitForSync, colArgs)
+        r = await self.connection.session.post(self.collectionsURL, data = payload)
+        col = AsyncCollection(self._createCollectionResponse(colClass, r))
+        self.collections[col.name] = col
+        return col
+
+    async def fetchDocument(self, _id) :
+        "fetchs a document using it's _id"
+        sid = _id.split("/")
+        return await self[sid[0]].fetchDocument(sid[1])
+
+    async def AQLQuery(self, query, batchSize = 100, rawResults = False, bindVars = {}, options = {}, count = False, fullCount = False, **moreArgs) :
+        """Executes the query and returns an AsyncAQLQuery, use 'async for' to iterate over the results. See Database.AQLQuery()"""
+        payload = AQLQuery.getPayload(query, batchSize, bindVars, options, count, fullCount, moreArgs)
+        r = await self.connection.session.post(self.cursorsURL, data = self.connection.codec.encode(payload))
+        return AsyncAQLQuery(self, query, r, rawResults)
+
+    async def explainAQLQuery(self, query, allPlans = False) :
+        """Returns an explanation of the query, see Database.explainAQLQuery()"""
+        payload = {'query' : query, 'allPlans' : allPlans}
+        r = await self.connection.session.post(self.explainURL, data = self.connection.codec.encode(payload))
+        return r.json()
+
+    async def validateAQLQuery(self, query, bindVars = {}, options = {}) :
+        "returns the server answer is the query is valid. Raises an AQLQueryError if not"
+        payload = {'query' : query, 'bindVars' : bindVars, 'options' : options}
+        r = await self.connection.session.post(self.cursorsURL, data = self.connection.codec.encode(payload))
+        data = r.json()
+        if r.status_code == 201 and not data["error"] :
+            return data
+        else :
+            raise AQLQueryError(data["errorMessage"], query, data)
+
+    async def transaction(self, collections, action, waitForSync = False, lockTimeout = None, params = None) :
+        """Execute a server-side transaction"""
+        payload = {
+                "collections": collections,
+                "action": action,
+                "waitForSync": waitForSync}
+        if lockTimeout is not None:
+                payload["lockTimeout"] = lockTimeout
+        if params is not None:
+            payload["params"] = params
+
+        r = await self.connection.session.post(self.transactionURL, data = self.connection.codec.encode(payload))
+        data = r.json()
+        if r.status_code == 200 and not data["error"] :
+            return data
+        else :
+            raise TransactionError(data["errorMessage"], action, data)
+
+    def __repr__(self) :
+        return "Async ArangoDB database: %s" % self.name
+
+    def __getitem__(self, collectionName) :
+        """use database[collectionName] to get a loaded collection from the database"""
+        try :
+            return self.collections[collectionName]
+        except KeyError :
+            raise KeyError("Can't find any collection named : %s, you may have to reload the database" % collectionName)
+
+class AsyncCollection(object) :
+    """Wraps a collection (of any class, with its fields and validation) and exposes asynchronous versions of its requests.
+    Everything else (name, validation, urls...) is read from the wrapped collection"""
+
+    def __init__(self, collection) :
+        self.collection = collection
+
+    def __getattr__(self, k) :
+        return getattr(object.__getattribute__(self, "collection"), k)
+
+    def createDocument(self, initValues = {}) :
+        "create and returns an AsyncDocument, or an AsyncEdge for edge collections"
+        if self.collection.type == CONST.COLLECTION_EDGE_TYPE :
+            return AsyncEdge(self, initValues)
+        return AsyncDocument(self, initValues)
+
+    async def fetchDocument(self, key, rawResults = False, rev = None) :
+        """Fetches a document from the collection given it's key"""
+        if rev is None and key in self.collection.missingDocuments :
+            raise KeyError("Unable to find document with _key: %s" % key)
+        url, params = self.collection._fetchDocumentRequest(key, rev)
+        r = await self.connection.session.get(url, params = params)
+        data = self.collection._fetchDocumentResponse(r, key, rawResults = True)
+        if rawResults :
+            return data
+        return self.createDocument(data)
+
+    async def action(self, method, action, **params) :
+        "a generic fct for interacting everything that doesn't have an assigned fct"
+        r = await self.connection.session.request(method.upper(), self.URL + "/" + action, params = params)
+        return r.json()
+
+    async def truncate(self) :
+        "deletes every document in the collection"
+        return await self.action('PUT', 'truncate')
+
+    async def count(self) :
+        """returns the number of documents in the collection"""
+        return (await self.action('GET', 'count'))["count"]
+
+    def __repr__(self) :
+        return "Async %s" % repr(self.collection)
+
+class AsyncDocument(Document) :
+    """A Document whose save(), patch() and delete() functions are coroutines"""
+
+    async def save(self, waitForSync = False, **docArgs) :
+        """Saves the document, see Document.save()"""
+        old = None
+        if self.modified :
+            method, url, params, payload = self._saveRequest(waitForSync, docArgs)
+            r = await self.connection.session.request(method.upper(), url, params = params, data = payload)
+            old = self._saveResponse(r)
+
+        self._patchStore = {}
+        return old
+
+    async def forceSave(self, **docArgs) :
+        "saves even if the document has not been modified since the last save"
+        self.modified = True
+        return await self.save(**docArgs)
+
+    async def saveCopy(self) :
+        "saves a copy of the object and become that copy. returns a tuple (old _key, new _key)"
+        old_key = self._key
+        self.reset(self.collection)
+        await self.save()
+        return (old_key, self._key)
+
+    async def patch(self, keepNull = True, **docArgs) :
+        """Saves the document by only updating the modified fields, see Document.patch()"""
+        if self._fullSave and self.URL is not None :
+            return await self.forceSave(**docArgs)
+
+        old = None
+        request = self._patchRequest(keepNull, docArgs)
+        if request is not None :
+            url, params, payload = request
+            r = await self.connection.session.patch(url, params = params, data = payload)
+            old = self._patchResponse(r)
+
+        self._patchStore = {}
+        return old
+
+    async def delete(self, **docArgs) :
+        "deletes the document from the database, see Document.delete()"
+        url, params = self._deleteRequest(docArgs)
+        r = await self.connection.session.delete(url, params = params)
+        return self._deleteResponse(r)
+
+class AsyncEdge(AsyncDocument, Edge) :
+    """An Edge whose save(), patch(), delete() and links() functions are coroutines"""
+
+    async def links(self, fromVertice, toVertice, **edgeArgs) :
+        """An alias to save that updates the _from and _to attributes, see Edge.links(). Vertices must have already been saved"""
+        for field, vertice in (("_from", fromVertice), ("_to", toVertice)) :
+            if isinstance(vertice, Document) :
+                self[field] = vertice._id
+            else :
+                self[field] = vertice
+
+        await self.save(**edgeArgs)
+
+    async def save(self, **edgeArgs) :
+        """Works like AsyncDocument's except that you must specify '_from' and '_to' vertices before."""
+        if "_from" not in self._store or "_to" not in self._store :
+            raise AttributeError("You must specify '_from' and '_to' attributes before saving. You can also use the function 'links()'")
+
+        await AsyncDocument.save(self, **edgeArgs)
+
+class AsyncRawCursor(RawCursor) :
+    "a raw interface to cursors whose batches are awaited"
+
+    async def next(self) :
+        "returns the next batch"
+        r = await self.connection.session.put(self.URL)
+        return self._batchResponse(r)
+
+    async def delete(self) :
+        "kills the cursor"
+        await self.connection.session.delete(self.URL)
+
+class AsyncAQLQuery(AQLQuery) :
+    """An AQL query whose batches are fetched asynchronously. Use 'async for doc in query' to iterate over all results.
+    AsyncAQLQueries are instanciated by AsyncDatabase.AQLQuery()"""
+
+    cursorClass = AsyncRawCursor
+
+    def __init__(self, database, query, request, rawResults) :
+        self.query = query
+        self.database = database
+        self.connection = self.database.connection
+        Query.__init__(self, request, database, rawResults)
+
+    async def nextBatch(self) :
+        "become the next batch. raises a StopAsyncIteration if there is None"
+        try :
+            self._checkHasMore()
+        except StopIteration :
+            raise StopAsyncIteration("That was the last batch")
+        self.response = await self.cursor.next()
+
+    def _developDoc(self, i) :
+        docJson = self.result[i]
+        try :
+            collection = self.database[docJson["_id"].split("/")[0]]
+        except KeyError :
+            raise CreationError("result %d is not a valid Document. Try setting rawResults to True" % i)
+
+        self.result[i] = collection.createDocument(docJson)
+
+    async def delete(self) :
+        "kills the cursor"
+        if self.cursor is not None :
+            await self.cursor.delete()
+
+    def __next__(self) :
+        raise TypeError("AsyncAQLQuery must be iterated using 'async for'")
+
+    def __iter__(self) :
+        raise TypeError("AsyncAQLQuery must be iterated using 'async for'")
+
+    def __aiter__(self) :
+        return self
+
+    async def __anext__(self) :
+        """returns the next element of the query result. Automatomatically awaits for new batches if needed"""
+        try :
+            v = self[self.currI]
+        except IndexError :
+            await self.nextBatch()
+            v = self[self.currI]
+        self.currI += 1
+        return v
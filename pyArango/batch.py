@@ -0,0 +1,249 @@
+import re
+import threading
+import uuid
+
+from requests.structures import CaseInsensitiveDict
+
+try :
+    from urllib.parse import urlparse, urlencode
+except ImportError :
+    from urlparse import urlparse
+    from urllib import urlencode
+
+from .theExceptions import ConnectionError
+
+__all__ = ["Batch", "BatchCall", "getActiveBatch"]
+
+_local = threading.local()
+
+def getActiveBatch() :
+    """returns the Batch that collects the requests of the current thread, or None. Used by sessions to defer requests"""
+    return getattr(_local, "batch", None)
+
+class BatchCall(object) :
+    """A call deferred by Batch.call(). Its result is available once the batch has been sent"""
+
+    def __init__(self, batch, fct, args, kwargs) :
+        self.batch = batch
+        self.fct = fct
+        self.args = args
+        self.kwargs = kwargs
+        self.done = False
+        self._result = None
+        self._exception = None
+
+    def result(self) :
+        """returns the value returned by the call, or raises its exception. Sends the batch if it has not been sent yet"""
+        if not self.done :
+            self.batch.flush()
+        if self._exception is not None :
+            raise self._exception
+        return self._result
+
+    def _run(self, batch) :
+        _local.batch = batch
+        try :
+            self._result = self.fct(*self.args, **self.kwargs)
+        except Exception as e :
+            self._exception = e
+        finally :
+            _local.batch = None
+            self.done = True
+            batch._finished()
+
+class _Part(object) :
+    """A request waiting in a batch"""
+
+    def __init__(self, method, url, kwargs, endpoint = None) :
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.params = kwargs.get("params") or {}
+        self.data = kwargs.get("data")
+        self.headers = kwargs.get("headers") or {}
+        self.event = threading.Event()
+        self.response = None
+        self.exception = None
+
+class _PartResponse(object) :
+    """The response to a part of a batch, it has the attributes of the responses of requests used by JsonResponse"""
+
+    def __init__(self, url, status_code, headers, content, endpoint = None) :
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.endpoint = endpoint
+
+class Batch(object) :
+    """Multiplexes many small operations into a single request to ArangoDB's batch API, sent as a multipart message. Use Connection.batch() as a context manager::
+
+        with conn.batch() as batch :
+            count = batch.call(db["users"].count)
+            doc = batch.call(db["users"].fetchDocument, "tesla")
+        print(count.result(), doc.result()["name"])
+
+    call() defers a call to any function of pyArango and returns a BatchCall. When the batch is sent (at the end of the with block, by flush()
+    or by the first call to result()), every deferred call runs on its own thread, whose requests are collected and sent together, one batch request per database
+    and coordinator (requests pinned to a coordinator, such as those of stream transactions, are sent to it). A call that needs several requests costs one batch request per step.
+    At most 'maxSize' calls are sent at once. The requests of the calls are not part of the stream transactions of the calling thread, and bypass request coalescing and write-behind"""
+
+    def __init__(self, connection, maxSize = 1000) :
+        self.connection = connection
+        self.maxSize = maxSize
+        self.calls = []
+        self.condition = threading.Condition()
+        self.running = 0
+        self.parts = []
+        self.nbRequests = 0
+
+    def call(self, fct, *args, **kwargs) :
+        """defers fct(*args, **kwargs) and returns its BatchCall"""
+        call = BatchCall(self, fct, args, kwargs)
+        self.calls.append(call)
+        return call
+
+    def flush(self) :
+        """sends the deferred calls, their results are then available"""
+        while len(self.calls) > 0 :
+            calls, self.calls = self.calls[:self.maxSize], self.calls[self.maxSize:]
+            self._run(calls)
+
+    def defer(self, method, url, kwargs, endpoint = None) :
+        """called by sessions on the threads of the calls: adds the request to the batch and blocks until its response has arrived.
+        A request pinned to the coordinator 'endpoint' is sent to it"""
+        part = _Part(method, url, kwargs, endpoint)
+        with self.condition :
+            self.parts.append(part)
+            self.running -= 1
+            self.condition.notify_all()
+
+        part.event.wait()
+        if part.exception is not None :
+            raise part.exception
+        return part.response
+
+    def _finished(self) :
+        with self.condition :
+            self.running -= 1
+            self.condition.notify_all()
+
+    def _run(self, calls) :
+        self.running = len(calls)
+        threads = []
+        for call in calls :
+            thread = threading.Thread(target = call._run, args = (self, ))
+            thread.daemon = True
+            threads.append(thread)
+            thread.start()
+
+        while True :
+            with self.condition :
+                while self.running > 0 :
+                    self.condition.wait()
+                parts, self.parts = self.parts, []
+                self.running = len(parts)
+
+            if len(parts) == 0 :
+                break
+
+            try :
+                self._send(parts)
+            except Exception as e :
+                for part in parts :
+                    part.exception = e
+            for part in parts :
+                part.event.set()
+
+        for thread in threads :
+            thread.join()
+
+    def _send(self, parts) :
+        """sends 'parts' with one batch request per database and pinned endpoint"""
+        databases = {}
+        for part in parts :
+            url = urlparse(part.url)
+            match = re.match(r"^(/_db/[^/]+)?(/.*)$", url.path)
+            batchURL = "%s://%s%s/_api/batch" % (url.scheme, url.netloc, match.group(1) or "")
+            databases.setdefault((batchURL, part.endpoint), []).append((part, match.group(2)))
+
+        for (batchURL, endpoint), dbParts in databases.items() :
+            self._sendDatabase(batchURL, dbParts, endpoint)
+
+    def _sendDatabase(self, batchURL, dbParts, endpoint = None) :
+        boundary = "pyArangoBatch%s" % uuid.uuid4().hex
+        chunks = []
+        for i, (part, path) in enumerate(dbParts) :
+            params = [(k, v) for k, v in part.params.items() if v is not None]
+            if len(params) > 0 :
+                path = "%s?%s" % (path, urlencode(params))
+
+            data = part.data
+            if data is None :
+                data = b""
+            elif not isinstance(data, bytes) :
+                data = data.encode("utf-8")
+
+            head = ["--%s" % boundary, "Content-Type: application/x-arango-batchpart", "Content-Id: %d" % i, "", "%s %s HTTP/1.1" % (part.method, path)]
+            for k, v in part.headers.items() :
+                head.append("%s: %s" % (k, v))
+            head.extend(["", ""])
+            chunks.append("\r\n".join(head).encode("utf-8") + data + b"\r\n")
+        chunks.append(("--%s--\r\n" % boundary).encode("utf-8"))
+
+        r = self.connection.session.post(batchURL, data = b"".join(chunks), headers = {"Content-Type" : "multipart/form-data; boundary=%s" % boundary}, endpoint = endpoint)
+        self.nbRequests += 1
+        if r.status_code != 200 :
+            raise ConnectionError("Batch request failed", batchURL, r.status_code, r.content)
+
+        responses = self._parse(r)
+        for i, (part, path) in enumerate(dbParts) :
+            try :
+                part.response = responses[i]
+            except KeyError :
+                part.exception = ConnectionError("No response for the part %d of the batch" % i, part.url)
+            else :
+                part.response.url = part.url
+                part.response.endpoint = r.endpoint
+
+    def _parse(self, r) :
+        """returns the responses contained in the multipart response of a batch request, by Content-Id"""
+        contentType = r.headers.get("Content-Type", "")
+        match = re.search(r"boundary=\"?([^\";]+)\"?", contentType)
+        if match is None :
+            raise ConnectionError("Batch response is not a multipart message", r.url, r.status_code, r.content)
+
+        responses = {}
+        delimiter = ("--%s" % match.group(1)).encode("utf-8")
+        for i, segment in enumerate(r.content.split(delimiter)[1:]) :
+            if segment.startswith(b"--") :
+                break
+            partHead, message = segment.lstrip(b"\r\n").split(b"\r\n\r\n", 1)
+            contentId = i
+            for line in partHead.decode("utf-8").split("\r\n") :
+                k, v = line.split(":", 1)
+                if k.strip().lower() == "content-id" :
+                    contentId = int(v.strip())
+
+            if b"\r\n\r\n" in message :
+                head, body = message.split(b"\r\n\r\n", 1)
+            else :
+                head, body = message, b""
+            if body.endswith(b"\r\n") :
+                body = body[:-2]
+
+            lines = head.decode("utf-8").split("\r\n")
+            headers = CaseInsensitiveDict()
+            for line in lines[1:] :
+                k, v = line.split(":", 1)
+                headers[k.strip()] = v.strip()
+            responses[contentId] = _PartResponse(None, int(lines[0].split(" ")[1]), headers, body)
+        return responses
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, excType, excValue, traceback) :
+        if excType is None :
+            self.flush()
+        return False
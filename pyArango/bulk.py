@@ -0,0 +1,267 @@
+import threading
+import time
+
+import requests
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue
+
+from .theExceptions import CreationError
+
+__all__ = ["ParallelImporter", "AdaptiveConcurrency", "BulkImportResult", "WorkerStats"]
+
+class AdaptiveConcurrency(object) :
+    """Limits the number of concurrent uploads using AIMD (additive increase, multiplicative decrease): the limit grows by one every time as many uploads
+    as the current limit succeeded quickly, and is halved when an upload fails or becomes much slower than the average. Only uploads that started after the last
+    decrease can trigger a new one, so that a single slow down does not collapse the limit"""
+
+    def __init__(self, minimum, maximum, latencyFactor = 2., smoothing = 0.1) :
+        if minimum < 1 or maximum < minimum :
+            raise ValueError("Concurrency bounds must verify 1 <= minimum <= maximum, got: [%s, %s]" % (minimum, maximum))
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latencyFactor = latencyFactor
+        self.smoothing = smoothing
+
+        self.limit = minimum
+        self.inFlight = 0
+        self.avgLatency = None
+        self.nbSuccesses = 0
+        self.lastDecrease = 0
+        self.history = [minimum]
+        self.condition = threading.Condition()
+
+    def acquire(self) :
+        """blocks until an upload can be started and returns its start time"""
+        with self.condition :
+            while self.inFlight >= self.limit :
+                self.condition.wait()
+            self.inFlight += 1
+            return time.time()
+
+    def release(self, startTime, latency, failed = False) :
+        """must be called at the end of every upload. 'latency' is the time it took per document"""
+        with self.condition :
+            self.inFlight -= 1
+            if failed :
+                self._decrease(startTime)
+            elif self.avgLatency is not None and latency > self.latencyFactor * self.avgLatency :
+                self._decrease(startTime)
+            else :
+                if self.avgLatency is None :
+                    self.avgLatency = latency
+                else :
+                    self.avgLatency += self.smoothing * (latency - self.avgLatency)
+
+                self.nbSuccesses += 1
+                if self.nbSuccesses >= self.limit and self.limit < self.maximum :
+                    self.nbSuccesses = 0
+                    self._setLimit(self.limit + 1)
+            self.condition.notify_all()
+
+    def _decrease(self, startTime) :
+        if startTime >= self.lastDecrease :
+            self.lastDecrease = time.time()
+            self.nbSuccesses = 0
+            self._setLimit(max(self.minimum, self.limit // 2))
+
+    def _setLimit(self, limit) :
+        if limit != self.limit :
+            self.limit = limit
+            self.history.append(limit)
+
+class WorkerStats(object) :
+    """Statistics of a single import worker"""
+
+    def __init__(self, name) :
+        self.name = name
+        self.nbChunks = 0
+        self.nbDocuments = 0
+        self.nbRetries = 0
+        self.nbFailures = 0
+        self.busyTime = 0.
+
+    def throughput(self) :
+        """the number of documents sent per second of work"""
+        if self.busyTime == 0 :
+            return 0.
+        return self.nbDocuments / self.busyTime
+
+    def __repr__(self) :
+        return "<WorkerStats %s, chunks: %d, documents: %d, retries: %d, failures: %d, busy: %.3fs>" % (self.name, self.nbChunks, self.nbDocuments, self.nbRetries, self.nbFailures, self.busyTime)
+
+class BulkImportResult(object) :
+    """The result of a parallel import. 'chunks' contains the counters returned by ArangoDB for each chunk, in the order of the source (None for chunks that failed),
+    'failures' a list of (chunk number, exception) for the chunks that could not be imported"""
+
+    def __init__(self) :
+        self.chunks = []
+        self.failures = []
+        self.workers = {}
+        self.concurrencyHistory = []
+        self.nbDocuments = 0
+        self.elapsed = 0.
+
+    def _counter(self, name) :
+        return sum(c[name] for c in self.chunks if c is not None)
+
+    @property
+    def created(self) :
+        return self._counter("created")
+
+    @property
+    def errors(self) :
+        return self._counter("errors")
+
+    @property
+    def updated(self) :
+        return self._counter("updated")
+
+    @property
+    def ignored(self) :
+        return self._counter("ignored")
+
+    @property
+    def empty(self) :
+        return self._counter("empty")
+
+    def throughput(self) :
+        """the number of documents sent per second"""
+        if self.elapsed == 0 :
+            return 0.
+        return self.nbDocuments / self.elapsed
+
+    def __repr__(self) :
+        return "<BulkImportResult documents: %d, created: %d, errors: %d, failed chunks: %d, %.1f docs/s>" % (self.nbDocuments, self.created, self.errors, len(self.failures), self.throughput())
+
+class ParallelImporter(object) :
+    """Uploads chunks to a collection's bulk import API using a pool of threads, each with its own session. The number of concurrent uploads
+    is controlled by an AdaptiveConcurrency. Chunks that time out or are answered with a 503 are retried up to 'maxRetries' times, waiting
+    'retryDelay' seconds more after each attempt"""
+
+    retryStatusCodes = (503, )
+    pollInterval = 0.1
+
+    def __init__(self, collection, maxWorkers = 8, minWorkers = 1, maxRetries = 3, timeout = None, retryDelay = 0.5) :
+        self.collection = collection
+        self.maxWorkers = maxWorkers
+        self.maxRetries = maxRetries
+        self.timeout = timeout
+        self.retryDelay = retryDelay
+        self.concurrency = AdaptiveConcurrency(minWorkers, maxWorkers)
+
+    def _isRetryable(self, exception) :
+        if isinstance(exception, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)) :
+            return True
+        return isinstance(exception, CreationError) and isinstance(exception.errors, dict) and exception.errors.get("code") in self.retryStatusCodes
+
+    def _work(self, name, session, tasks, params, result, lock) :
+        stats = WorkerStats(name)
+        with lock :
+            result.workers[name] = stats
+
+        try :
+            while True :
+                task = tasks.get()
+                if task is None :
+                    break
+
+                try :
+                    chunkNumber, chunk = task
+                    nbDocuments = chunk.count(b"\n") + 1
+                    nbTries = 0
+                    while True :
+                        startTime = self.concurrency.acquire()
+                        try :
+                            counters = self.collection._importChunk(session, chunk, params, timeout = self.timeout)
+                        except Exception as e :
+                            elapsed = time.time() - startTime
+                            self.concurrency.release(startTime, elapsed / nbDocuments, failed = True)
+                            stats.busyTime += elapsed
+                            if self._isRetryable(e) and nbTries < self.maxRetries :
+                                nbTries += 1
+                                stats.nbRetries += 1
+                                time.sleep(self.retryDelay * nbTries)
+                                continue
+
+                            stats.nbFailures += 1
+                            with lock :
+                                result.failures.append((chunkNumber, e))
+                        else :
+                            elapsed = time.time() - startTime
+                            self.concurrency.release(startTime, elapsed / nbDocuments)
+                            stats.busyTime += elapsed
+                            stats.nbChunks += 1
+                            stats.nbDocuments += nbDocuments
+                            with lock :
+                                result.chunks[chunkNumber] = counters
+                                result.nbDocuments += nbDocuments
+                        break
+                finally :
+                    tasks.task_done()
+        finally :
+            session.disconnect()
+
+    def _put(self, tasks, task, workers) :
+        """puts 'task' in the queue, raises a CreationError if every worker died, as nobody would ever take it"""
+        while True :
+            try :
+                tasks.put(task, timeout = self.pollInterval)
+                return
+            except queue.Full :
+                if not any(worker.is_alive() for worker in workers) :
+                    raise CreationError("Unable to import chunks, all the workers died")
+
+    def run(self, chunks, params) :
+        """uploads every chunk of the iterable 'chunks' with the import parameters 'params' and returns a BulkImportResult"""
+        result = BulkImportResult()
+        lock = threading.Lock()
+        tasks = queue.Queue(maxsize = 2 * self.maxWorkers)
+
+        sessions = []
+        try :
+            for i in range(self.maxWorkers) :
+                sessions.append(self.collection.connection.createSession())
+        except :
+            for session in sessions :
+                session.disconnect()
+            raise
+
+        workers = []
+        for i, session in enumerate(sessions) :
+            worker = threading.Thread(target = self._work, args = ("worker-%d" % i, session, tasks, params, result, lock))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        startTime = time.time()
+        try :
+            for chunkNumber, chunk in enumerate(chunks) :
+                with lock :
+                    result.chunks.append(None)
+                self._put(tasks, (chunkNumber, chunk), workers)
+        finally :
+            # workers stop after the tasks that are already queued, or died before
+            try :
+                for worker in workers :
+                    self._put(tasks, None, workers)
+            except CreationError :
+                pass
+            for worker in workers :
+                worker.join()
+
+            while True :
+                try :
+                    task = tasks.get_nowait()
+                except queue.Empty :
+                    break
+                if task is not None :
+                    result.failures.append((task[0], CreationError("Chunk %d was not imported, all the workers died" % task[0])))
+
+        result.elapsed = time.time() - startTime
+        result.failures.sort(key = lambda failure : failure[0])
+        result.concurrencyHistory = list(self.concurrency.history)
+        return result
@@ -0,0 +1,143 @@
+import copy
+import threading
+
+__all__ = ["SingleFlight", "MicroBatcher", "Coalescer"]
+
+class _Call(object) :
+    """The result of a call shared by several threads"""
+
+    def __init__(self) :
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+
+    def wait(self) :
+        self.event.wait()
+        if self.exception is not None :
+            raise self.exception
+        return self.result
+
+class SingleFlight(object) :
+    """Makes the threads that ask for the same key at the same time share a single call: the first one (the leader) performs it,
+    the others wait for its result, or its exception"""
+
+    def __init__(self) :
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fct) :
+        """returns fct(), unless a call for 'key' is already in flight, in which case its result is returned"""
+        with self.lock :
+            call = self.calls.get(key)
+            leader = call is None
+            if leader :
+                call = _Call()
+                self.calls[key] = call
+
+        if leader :
+            try :
+                call.result = fct()
+            except Exception as e :
+                call.exception = e
+            finally :
+                with self.lock :
+                    del(self.calls[key])
+                call.event.set()
+
+        return call.wait()
+
+class _Batch(object) :
+    def __init__(self) :
+        self.calls = {}
+        self.full = threading.Event()
+
+class MicroBatcher(object) :
+    """Merges the keys asked by different threads within 'window' seconds into a single call to fetchMany(keys), that must return a dictionary {key : result}.
+    Keys absent from the dictionary get None. A batch is sent as soon as it has 'maxBatchSize' keys"""
+
+    def __init__(self, fetchMany, window = 0.002, maxBatchSize = 1000) :
+        self.fetchMany = fetchMany
+        self.window = window
+        self.maxBatchSize = maxBatchSize
+        self.lock = threading.Lock()
+        self.batch = None
+
+    def get(self, key) :
+        """returns the result for 'key', once the batch it belongs to has been fetched"""
+        with self.lock :
+            batch = self.batch
+            leader = batch is None
+            if leader :
+                batch = _Batch()
+                self.batch = batch
+
+            call = batch.calls.get(key)
+            if call is None :
+                call = _Call()
+                batch.calls[key] = call
+            if len(batch.calls) >= self.maxBatchSize :
+                self.batch = None
+                batch.full.set()
+
+        if leader :
+            batch.full.wait(self.window)
+            with self.lock :
+                if self.batch is batch :
+                    self.batch = None
+            self._fetch(batch)
+
+        return call.wait()
+
+    def _fetch(self, batch) :
+        try :
+            results = self.fetchMany(list(batch.calls.keys()))
+        except Exception as e :
+            for call in batch.calls.values() :
+                call.exception = e
+                call.event.set()
+        else :
+            for key, call in batch.calls.items() :
+                call.result = results.get(key)
+                call.event.set()
+
+class Coalescer(object) :
+    """Coalesces concurrent fetches of documents: identical fetches share a single request (SingleFlight) and, if 'window' > 0, fetches
+    of different keys are merged into multi-gets (MicroBatcher). fetchOne(key) must return the json of a document or raise a KeyError,
+    fetchMany(keys) a dictionary {key : json}. Every caller receives its own copy of the json"""
+
+    def __init__(self, fetchOne, fetchMany = None, window = 0, maxBatchSize = 1000) :
+        if window > 0 and fetchMany is None :
+            raise ValueError("Micro batching requires a fetchMany function")
+
+        self.fetchOne = fetchOne
+        self.singleFlight = SingleFlight()
+        if window > 0 :
+            self.batcher = MicroBatcher(fetchMany, window, maxBatchSize)
+        else :
+            self.batcher = None
+
+        self.lock = threading.Lock()
+        self.nbCalls = 0
+        self.nbFetches = 0
+
+    def _fetch(self, key) :
+        with self.lock :
+            self.nbFetches += 1
+        if self.batcher is None :
+            return self.fetchOne(key)
+
+        ret = self.batcher.get(key)
+        if ret is None :
+            raise KeyError("Unable to find document with _key: %s" % key)
+        return ret
+
+    def fetch(self, key) :
+        """returns a copy of the json of the document of _key 'key', raises a KeyError if it does not exist"""
+        with self.lock :
+            self.nbCalls += 1
+        return copy.deepcopy(self.singleFlight.do(key, lambda : self._fetch(key)))
+
+    def getStats(self) :
+        "returns the number of calls and of fetches actually performed"
+        with self.lock :
+            return {"calls" : self.nbCalls, "fetches" : self.nbFetches}
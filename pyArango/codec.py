@@ -0,0 +1,84 @@
+import json
+
+try :
+    _stringTypes = basestring
+except NameError :
+    _stringTypes = str
+
+__all__ = ["JSONCodec", "OrjsonCodec", "UjsonCodec", "getCodec", "getCodecClasses"]
+
+class JSONCodec(object) :
+    """Encodes payloads and decodes responses using python's json module. All codecs must implement encode(), that returns bytes, and decode(), that accepts bytes"""
+    name = "json"
+
+    def encode(self, obj) :
+        ret = json.dumps(obj)
+        if not isinstance(ret, bytes) :
+            ret = ret.encode("utf-8")
+        return ret
+
+    def decode(self, data) :
+        if isinstance(data, bytes) :
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    def __repr__(self) :
+        return "<Codec %s>" % self.name
+
+class OrjsonCodec(JSONCodec) :
+    """Uses orjson, that goes straight from and to bytes"""
+    name = "orjson"
+
+    def __init__(self) :
+        import orjson
+        self.orjson = orjson
+
+    def encode(self, obj) :
+        return self.orjson.dumps(obj)
+
+    def decode(self, data) :
+        return self.orjson.loads(data)
+
+class UjsonCodec(JSONCodec) :
+    """Uses ujson"""
+    name = "ujson"
+
+    def __init__(self) :
+        import ujson
+        self.ujson = ujson
+
+    def encode(self, obj) :
+        return self.ujson.dumps(obj, ensure_ascii = False).encode("utf-8")
+
+    def decode(self, data) :
+        return self.ujson.loads(data)
+
+_codecClasses = {
+    JSONCodec.name : JSONCodec,
+    OrjsonCodec.name : OrjsonCodec,
+    UjsonCodec.name : UjsonCodec,
+}
+
+def getCodecClasses() :
+    "returns a dictionary of all available codec classes"
+    return _codecClasses
+
+def getCodec(codec = "json") :
+    """returns a codec instance. 'codec' can be an instance (returned as is), the name of a codec ('json', 'orjson', 'ujson') or 'auto'.
+    'auto' returns the fastest installed codec and falls back to python's json module"""
+    if not isinstance(codec, _stringTypes) :
+        return codec
+
+    if codec == "auto" :
+        for name in (OrjsonCodec.name, UjsonCodec.name) :
+            try :
+                return _codecClasses[name]()
+            except ImportError :
+                pass
+        return JSONCodec()
+
+    try :
+        codecClass = _codecClasses[codec]
+    except KeyError :
+        raise KeyError("Unknown codec '%s', available codecs are: %s, or 'auto'" % (codec, ", ".join(_codecClasses.keys())))
+    return codecClass()
@@ -1,22 +1,33 @@
-import json
 import types
+import threading
+import time
+from collections import OrderedDict
+
 from future.utils import with_metaclass
 from . import consts as CONST
 
 from .document import Document, Edge
-from .theExceptions import ValidationError, SchemaViolation, CreationError, UpdateError, DeletionError, InvalidDocument
+from .theExceptions import ValidationError, SchemaViolation, CreationError, UpdateError, DeletionError, InvalidDocument, SimpleQueryError
 from .query import SimpleQuery
 from .index import Index
+from .bulk import ParallelImporter
+from .coalescing import Coalescer
+from .negativecache import NegativeCache
+from .writebehind import WriteBehindQueue
+from .unitofwork import registerDocument
+from .batch import getActiveBatch
+from .transactions import getActiveTransaction
 
-__all__ = ["Collection", "Edges", "Field", "DocumentCache", "CachedDoc", "Collection_metaclass", "getCollectionClass", "isCollection", "isDocumentCollection", "isEdgeCollection", "getCollectionClasses"]
+__all__ = ["Collection", "Edges", "Field", "DocumentCache", "CachedDoc", "approximateSize", "Collection_metaclass", "getCollectionClass", "isCollection", "isDocumentCollection", "isEdgeCollection", "getCollectionClasses"]
 
 class CachedDoc(object) :
-    """A cached document"""
-    def __init__(self, document, prev, nextDoc) :
-        self.prev = prev
+    """A cached document. 'size' is its approximate size in bytes, 'expires' the time after which it is stale and 'ttl' its time to live (None if never)"""
+    def __init__(self, document, size = 0, expires = None, ttl = None) :
         self.document = document
-        self.nextDoc = nextDoc
         self._key = document._key
+        self.size = size
+        self.expires = expires
+        self.ttl = ttl
 
     def __getitem__(self, k) :
         return self.document[k]
@@ -33,76 +44,181 @@ class CachedDoc(object) :
             except Exception as e2 :
                 raise e2
 
+def approximateSize(value) :
+    """returns a rough estimate of the memory used by 'value' in bytes. Documents are measured through their store"""
+    store = getattr(value, "_store", None)
+    if store is not None :
+        return approximateSize(store) + 200
+    if isinstance(value, dict) :
+        return 64 + sum(approximateSize(k) + approximateSize(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)) :
+        return 64 + sum(approximateSize(v) for v in value)
+    if value is None or isinstance(value, (int, float)) :
+        return 24
+    try :
+        return 50 + len(value)
+    except TypeError :
+        return 24
+
 class DocumentCache(object) :
-    "Document cache for collection, with insert, deletes and updates in O(1)"
+    """Document cache for collection, with insert, deletes and updates in O(1). The least recently used documents are evicted when there are more than
+    'cacheSize' of them, or when their approximate size exceeds 'maxBytes'. Documents cached for longer than 'ttl' seconds are considered missing, unless
+    'revalidate' is True: they are then returned as stale (see isStale()) so that the caller can check whether they changed and renew them.
+    The cache is thread safe and keeps counts of hits, misses, evictions, expirations and revalidations"""
 
-    def __init__(self, cacheSize) :
+    def __init__(self, cacheSize, maxBytes = None, ttl = None, revalidate = False, sizeOf = approximateSize, clock = time.time) :
         self.cacheSize = cacheSize
-        self.cacheStore = {}
-        self.head = None
-        self.tail = None
-
-    def cache(self, doc) :
-        if doc._key in self.cacheStore :
-            ret = self.cacheStore[doc._key]
-            if ret.prev is not None :
-                ret.prev.nextDoc = ret.nextDoc
-                self.head.prev = ret
-                ret.nextDoc = self.head
-                self.head = ret
-            return self.head
-        else :
+        self.maxBytes = maxBytes
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self.sizeOf = sizeOf
+        self.clock = clock
+        self.cacheStore = OrderedDict()
+        self.nbBytes = 0
+        self.lock = threading.RLock()
+        self.resetStats()
+
+    def resetStats(self) :
+        "sets all counters to 0"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.notModified = 0
+        self.modified = 0
+
+    @property
+    def head(self) :
+        "the most recently used document"
+        with self.lock :
             if len(self.cacheStore) == 0 :
-                ret = CachedDoc(doc, prev = None, nextDoc = None)
-                self.head = ret
-                self.tail = self.head
-                self.cacheStore[doc._key] = ret
-            else :
-                if len(self.cacheStore) >= self.cacheSize :
-                    del(self.cacheStore[self.tail._key])
-                    self.tail = self.tail.prev
-                    self.tail.nextDoc = None
+                return None
+            return self.cacheStore[next(reversed(self.cacheStore))]
 
-                ret = CachedDoc(doc, prev = None, nextDoc = self.head)
-                self.head.prev = ret
-                self.head = self.head.prev
-                self.cacheStore[doc._key] = ret
+    @property
+    def tail(self) :
+        "the least recently used document, the next one to be evicted"
+        with self.lock :
+            if len(self.cacheStore) == 0 :
+                return None
+            return self.cacheStore[next(iter(self.cacheStore))]
+
+    def _touch(self, _key) :
+        try :
+            self.cacheStore.move_to_end(_key)
+        except AttributeError :
+            self.cacheStore[_key] = self.cacheStore.pop(_key)
+
+    def _remove(self, _key) :
+        entry = self.cacheStore.pop(_key)
+        self.nbBytes -= entry.size
+        return entry
+
+    def cache(self, doc, ttl = None) :
+        """adds 'doc' to the cache, or replaces the cached version of it, and returns its CachedDoc. 'ttl' overrides the default time to live of the cache"""
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else self.clock() + ttl
+        size = self.sizeOf(doc) if self.maxBytes is not None else 0
+
+        with self.lock :
+            if doc._key in self.cacheStore :
+                self._remove(doc._key)
+
+            ret = CachedDoc(doc, size, expires, ttl)
+            self.cacheStore[doc._key] = ret
+            self.nbBytes += size
+
+            while len(self.cacheStore) > self.cacheSize or (self.maxBytes is not None and self.nbBytes > self.maxBytes and len(self.cacheStore) > 0) :
+                self._remove(next(iter(self.cacheStore)))
+                self.evictions += 1
+        return ret
+
+    def isStale(self, cachedDoc) :
+        "returns True if the time to live of 'cachedDoc' has expired"
+        return cachedDoc.expires is not None and cachedDoc.expires <= self.clock()
+
+    def revalidated(self, _key, modified) :
+        """must be called once a stale document has been checked against the database. If it was not modified, its own time to live is renewed, otherwise
+        the new version should be cached"""
+        with self.lock :
+            if modified :
+                self.modified += 1
+                return
+
+            self.notModified += 1
+            entry = self.cacheStore.get(_key)
+            if entry is not None and entry.ttl is not None :
+                entry.expires = self.clock() + entry.ttl
 
     def delete(self, _key) :
         "removes a document from the cache"
-        try :
-            doc = self.cacheStore[_key]
-            doc.prev.nextDoc = doc.nextDoc
-            doc.nextDoc.prev = doc.prev
-            del(self.cacheStore[_key])
-        except KeyError :
-            raise KeyError("Document with _key %s is not available in cache" % _key)
+        with self.lock :
+            try :
+                self._remove(_key)
+            except KeyError :
+                raise KeyError("Document with _key %s is not available in cache" % _key)
+
+    def clear(self) :
+        "removes all documents from the cache"
+        with self.lock :
+            self.cacheStore.clear()
+            self.nbBytes = 0
 
     def getChain(self) :
-        "returns a list of keys representing the chain of documents"
-        l = []
-        h = self.head
-        while h :
-            l.append(h._key)
-            h = h.nextDoc
-        return l
+        "returns a list of keys representing the chain of documents, from the most to the least recently used"
+        with self.lock :
+            return list(reversed(self.cacheStore))
 
     def stringify(self) :
         "a pretty str version of getChain()"
-        l = []
-        h = self.head
-        while h :
-            l.append(str(h._key))
-            h = h.nextDoc
-        return "<->".join(l)
+        return "<->".join([str(k) for k in self.getChain()])
+
+    def getStats(self) :
+        "returns the counters of the cache"
+        with self.lock :
+            nbLookups = self.hits + self.misses
+            return {
+                "size" : len(self.cacheStore),
+                "cacheSize" : self.cacheSize,
+                "bytes" : self.nbBytes,
+                "maxBytes" : self.maxBytes,
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "hitRatio" : float(self.hits) / nbLookups if nbLookups > 0 else 0.,
+                "evictions" : self.evictions,
+                "expirations" : self.expirations,
+                "notModified" : self.notModified,
+                "modified" : self.modified,
+            }
+
+    def __contains__(self, _key) :
+        "stale documents are in the cache if it revalidates them, they are returned by __getitem__()"
+        with self.lock :
+            entry = self.cacheStore.get(_key)
+            return entry is not None and (self.revalidate or entry.expires is None or entry.expires > self.clock())
+
+    def __len__(self) :
+        return len(self.cacheStore)
 
     def __getitem__(self, _key) :
-        try :
-            ret = self.cacheStore[_key]
-            self.cache(ret)
+        with self.lock :
+            try :
+                ret = self.cacheStore[_key]
+            except KeyError :
+                self.misses += 1
+                raise KeyError("Document with _key %s is not available in cache" % _key)
+
+            if ret.expires is not None and ret.expires <= self.clock() :
+                self.expirations += 1
+                if not self.revalidate :
+                    self._remove(_key)
+                    self.misses += 1
+                    raise KeyError("Document with _key %s has expired" % _key)
+            else :
+                self.hits += 1
+
+            self._touch(_key)
             return ret
-        except KeyError :
-            raise KeyError("Document with _key %s is not available in cache" % _key)
 
     def __repr__(self) :
         return "[DocumentCache, size: %d, full: %d]" %(self.cacheSize, len(self.cacheStore))
@@ -232,7 +348,11 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
 
         self.URL = "%s/collection/%s" % (self.database.URL, self.name)
         self.documentsURL = "%s/document" % (self.database.URL)
+        self.importURL = "%s/import" % (self.database.URL)
         self.documentCache = None
+        self.coalescer = None
+        self.writeBehind = None
+        self.missingDocuments = NegativeCache(self.connection.negativeCacheTTL)
 
         self.documentClass = Document
         self.indexes = {
@@ -253,61 +373,106 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
 
         return self.indexes
 
-    def activateCache(self, cacheSize) :
-        "Activate the caching system. Cached documents are only available through the __getitem__ interface"
-        self.documentCache = DocumentCache(cacheSize)
+    def activateCache(self, cacheSize, maxBytes = None, ttl = None, revalidate = False) :
+        """Activate the caching system. Cached documents are only available through the __getitem__ interface.
+        At most 'cacheSize' documents are kept, and if 'maxBytes' is set, their approximate size is limited as well. Documents older than 'ttl' seconds are fetched again.
+        If revalidate is True, they are instead fetched with a conditional request that only transfers them if their _rev has changed"""
+        self.documentCache = DocumentCache(cacheSize, maxBytes = maxBytes, ttl = ttl, revalidate = revalidate)
 
     def deactivateCache(self) :
         "deactivate the caching system"
         self.documentCache = None
 
+    def activateCoalescing(self, window = 0, maxBatchSize = 1000) :
+        """Concurrent calls to fetchDocument() (and collection[key]) for the same document share a single request. If 'window' > 0, the documents
+        asked by different threads within 'window' seconds are fetched together with a single multi-get of at most 'maxBatchSize' keys"""
+        self.coalescer = Coalescer(self._fetchDocumentJson, self._fetchDocumentsJson, window = window, maxBatchSize = maxBatchSize)
+
+    def deactivateCoalescing(self) :
+        "deactivate the coalescing of fetches"
+        self.coalescer = None
+
+    def activateWriteBehind(self, maxSize = 10000, batchSize = 1000, maxLatency = 0.1, nbWorkers = 1, onError = None, waitForSync = False) :
+        """From now on, saving a new document only enqueues it: background workers insert the queued documents in batches (see WriteBehindQueue).
+        Saves of documents that already exist remain synchronous. Returns the queue, use its flush() method to wait for the pending documents"""
+        self.deactivateWriteBehind()
+        self.writeBehind = WriteBehindQueue(self, maxSize = maxSize, batchSize = batchSize, maxLatency = maxLatency, nbWorkers = nbWorkers, onError = onError, waitForSync = waitForSync)
+        return self.writeBehind
+
+    def deactivateWriteBehind(self) :
+        "sends the pending documents and goes back to synchronous saves"
+        if self.writeBehind is not None :
+            self.writeBehind.close()
+            self.writeBehind = None
+
+    def _fetchDocumentJson(self, key) :
+        url, params = self._fetchDocumentRequest(key, None)
+        r = self.connection.session.get(url, params = params)
+        return self._fetchDocumentResponse(r, key, rawResults = True)
+
+    def _fetchDocumentsJson(self, keys) :
+        ret = dict((docJson["_key"], docJson) for docJson in self._lookupKeys(keys))
+        for key in keys :
+            if key not in ret :
+                self.missingDocuments.add(key)
+        return ret
+
+    def _cacheDocument(self, doc) :
+        "puts 'doc' in the cache, or refreshes its cached version, if the cache is activated"
+        if self.documentCache is not None and doc._key is not None :
+            self.documentCache.cache(doc)
+
+    def _uncacheDocument(self, key) :
+        "removes the document of _key 'key' from the cache, if the cache is activated"
+        if self.documentCache is not None :
+            try :
+                self.documentCache.delete(key)
+            except KeyError :
+                pass
+
     def delete(self) :
         "deletes the collection from the database"
         r = self.connection.session.delete(self.URL)
         data = r.json()
         if not r.status_code == 200 or data["error"] :
             raise DeletionError(data["errorMessage"], data)
+        if self.documentCache is not None :
+            self.documentCache.clear()
 
     def createDocument(self, initValues = {}) :
         "create and returns a document"
         return self.documentClass(self, initValues)
 
-    def ensureHashIndex(self, fields, unique = False, sparse = True) :
-        """Creates a hash index if it does not already exist, and returns it"""
+    def ensureHashIndex(self, fields, unique = False, sparse = True, asyncJob = False) :
+        """Creates a hash index if it does not already exist, and returns it. With asyncJob = True, returns a Job whose result is the index"""
         data = {
             "type" : "hash",
             "fields" : fields,
             "unique" : unique,
             "sparse" : sparse,
         }
-        ind = Index(self, creationData = data)
-        self.indexes["hash"][ind.infos["id"]] = ind
-        return ind
+        return self._ensureIndex(data, asyncJob)
 
-    def ensureSkiplistIndex(self, fields, unique = False, sparse = True) :
-        """Creates a skiplist index if it does not already exist, and returns it"""
+    def ensureSkiplistIndex(self, fields, unique = False, sparse = True, asyncJob = False) :
+        """Creates a skiplist index if it does not already exist, and returns it. With asyncJob = True, returns a Job whose result is the index"""
         data = {
             "type" : "skiplist",
             "fields" : fields,
             "unique" : unique,
             "sparse" : sparse,
         }
-        ind = Index(self, creationData = data)
-        self.indexes["skiplist"][ind.infos["id"]] = ind
-        return ind
+        return self._ensureIndex(data, asyncJob)
 
-    def ensureGeoIndex(self, fields) :
-        """Creates a geo index if it does not already exist, and returns it"""
+    def ensureGeoIndex(self, fields, asyncJob = False) :
+        """Creates a geo index if it does not already exist, and returns it. With asyncJob = True, returns a Job whose result is the index"""
         data = {
             "type" : "geo",
             "fields" : fields,
         }
-        ind = Index(self, creationData = data)
-        self.indexes["geo"][ind.infos["id"]] = ind
-        return ind
+        return self._ensureIndex(data, asyncJob)
 
-    def ensureFulltextIndex(self, fields, minLength = None) :
-        """Creates a fulltext index if it does not already exist, and returns it"""
+    def ensureFulltextIndex(self, fields, minLength = None, asyncJob = False) :
+        """Creates a fulltext index if it does not already exist, and returns it. With asyncJob = True, returns a Job whose result is the index"""
         data = {
             "type" : "fulltext",
             "fields" : fields,
@@ -315,9 +480,25 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
         if minLength is not None :
             data["minLength"] =  minLength
 
-        ind = Index(self, creationData = data)
-        self.indexes["fulltext"][ind.infos["id"]] = ind
-        return ind
+        return self._ensureIndex(data, asyncJob)
+
+    def _ensureIndex(self, data, asyncJob) :
+        """creates an index according to 'data' and returns it, or returns a Job whose result is the index if asyncJob"""
+        if not asyncJob :
+            ind = Index(self, creationData = data)
+            self.indexes[data["type"]][ind.infos["id"]] = ind
+            return ind
+
+        def _index(r) :
+            infos = r.json()
+            if (r.status_code >= 400) or infos['error'] :
+                raise CreationError(infos['errorMessage'], infos)
+            ind = Index(self, infos = infos)
+            self.indexes[data["type"]][ind.infos["id"]] = ind
+            return ind
+
+        url = "%s/index" % self.database.URL
+        return self.database.jobs.submit("POST", url, _index, params = {"collection" : self.name}, data = self.connection.codec.encode(data))
 
     @classmethod
     def validateField(cls, fieldName, value) :
@@ -348,7 +529,7 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
         "validates a dictionary. The dictionary must be defined such as {field: value}. If the validation is unsuccefull, raises an InvalidDocument"
         def _validate(dct, res) :
             for k, v in dct.items() :
-                if type(v) is dict :
+                if isinstance(v, dict) :
                     _validate(v, res)
                 elif k not in cls.arangoPrivates :
                     try :
@@ -375,51 +556,414 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
                 return False
         return True
 
+    def _bulkRequest(self, method, payloads, params, errorClass) :
+        """sends a list of payloads in a single request to the collection's document API. Returns the list of results, one per payload and in the same order.
+        Raises an 'errorClass' exception if the request as a whole failed"""
+        url = "%s/%s" % (self.documentsURL, self.name)
+        fct = getattr(self.connection.session, method.lower())
+        r = fct(url, params = params, data = self.connection.codec.encode(payloads))
+        data = r.json()
+        if r.status_code not in (200, 201, 202) or type(data) is not list :
+            raise errorClass(data["errorMessage"], data)
+        return data
+
+    def saveMany(self, documents, batchSize = 1000, waitForSync = False, **docArgs) :
+        """Saves new documents using a single request per batch of 'batchSize' documents instead of one request per document.
+        'documents' can be any iterable of Document objects or dictionaries. The _id, _key and _rev of saved Document objects are updated.
+        Returns a list with one result per document, in the same order: either the {_id, _key, _rev} dictionary returned by ArangoDB, or a dictionary
+        with the keys 'error', 'errorNum' and 'errorMessage' if that document could not be saved. A failing document does not prevent the others from being saved.
+        Use docArgs to put things such as 'returnNew = True' (for a full list cf ArangoDB's doc)"""
+
+        def _flush(batch, payloads, results) :
+            data = self._bulkRequest("POST", payloads, params, CreationError)
+            for doc, res in zip(batch, data) :
+                if isinstance(doc, Document) and not res.get("error") :
+                    doc.setPrivates(dict(res))
+                    if "new" in res :
+                        doc._setNew(res["new"])
+                    doc.modified = False
+                    doc._patchStore = {}
+                    self._cacheDocument(doc)
+                if not res.get("error") :
+                    self.missingDocuments.discard(res["_key"])
+            results.extend(data)
+
+        params = dict(docArgs)
+        params["waitForSync"] = waitForSync
+
+        results = []
+        batch, payloads = [], []
+        for doc in documents :
+            if isinstance(doc, Document) :
+                if self._validation['on_save'] :
+                    doc.validate(patch = False)
+                payload = dict(doc._store)
+                if doc._key is not None :
+                    payload["_key"] = doc._key
+            else :
+                if self._validation['on_save'] :
+                    self.validateDct(doc)
+                payload = doc
+
+            batch.append(doc)
+            payloads.append(payload)
+            if len(batch) >= batchSize :
+                _flush(batch, payloads, results)
+                batch, payloads = [], []
+
+        if len(batch) > 0 :
+            _flush(batch, payloads, results)
+
+        return results
+
+    def _bulkWrite(self, method, documents, batchSize, params, errorClass, payloadFct, resultFct) :
+        """sends 'documents' to the collection's document API, 'batchSize' of them per request. payloadFct(doc) returns the payload of a document
+        and resultFct(doc, result) is called with the result of each one. Returns the list of results, in the same order"""
+        results = []
+        batch, payloads = [], []
+
+        def _flush() :
+            data = self._bulkRequest(method, payloads, params, errorClass)
+            for doc, res in zip(batch, data) :
+                resultFct(doc, res)
+            results.extend(data)
+
+        for doc in documents :
+            batch.append(doc)
+            payloads.append(payloadFct(doc))
+            if len(batch) >= batchSize :
+                _flush()
+                batch, payloads = [], []
+
+        if len(batch) > 0 :
+            _flush()
+
+        return results
+
+    def _bulkKey(self, doc) :
+        """returns the _key of a Document, a dictionary or a key"""
+        if isinstance(doc, Document) :
+            if doc._key is None :
+                raise ValueError("Document of collection '%s' was never saved" % self.name)
+            return doc._key
+        if isinstance(doc, dict) :
+            try :
+                return doc["_key"]
+            except KeyError :
+                raise ValueError("Dictionary has no _key: %s" % doc)
+        return doc
+
+    def _bulkPayload(self, doc, fields, checkRevs) :
+        """returns the payload of 'doc' for a bulk update or replace: 'fields' plus its _key, and its _rev if checkRevs"""
+        payload = dict(fields)
+        payload["_key"] = self._bulkKey(doc)
+        if checkRevs and isinstance(doc, Document) :
+            payload["_rev"] = doc._rev
+        elif not checkRevs :
+            payload.pop("_rev", None)
+        return payload
+
+    def updateMany(self, documents, batchSize = 1000, keepNull = True, mergeObjects = True, checkRevs = False, waitForSync = False, **docArgs) :
+        """Patches documents using a single request per batch of 'batchSize' documents. 'documents' can be any iterable of saved Document objects, whose modified fields are sent,
+        or of dictionaries with a _key and the fields to update. With checkRevs = True, a document is only updated if its _rev (the one of the Document, or the _rev of the dictionary)
+        is still the current one.
+        Returns a list with one result per document, in the same order: either the {_id, _key, _rev, _oldRev} dictionary returned by ArangoDB, or a dictionary
+        with the keys 'error', 'errorNum' and 'errorMessage' if that document could not be updated, so that the failures can be retried.
+        Use docArgs to put things such as 'returnNew = True' (for a full list cf ArangoDB's doc)"""
+
+        def _payload(doc) :
+            if isinstance(doc, Document) :
+                if self._validation['on_save'] :
+                    doc.validate(patch = True)
+                return self._bulkPayload(doc, doc._patchStore, checkRevs)
+            if self._validation['on_save'] :
+                self.validateDct(doc)
+            return self._bulkPayload(doc, doc, checkRevs)
+
+        def _result(doc, res) :
+            if isinstance(doc, Document) and not res.get("error") :
+                doc._rev = res["_rev"]
+                if "new" in res :
+                    doc._setNew(res["new"])
+                doc.modified = False
+                doc._patchStore = {}
+                self._cacheDocument(doc)
+            else :
+                self._uncacheDocument(self._bulkKey(doc))
+
+        params = dict(docArgs)
+        params.update({"keepNull" : keepNull, "mergeObjects" : mergeObjects, "ignoreRevs" : not checkRevs, "waitForSync" : waitForSync})
+        return self._bulkWrite("PATCH", documents, batchSize, params, UpdateError, _payload, _result)
+
+    def replaceMany(self, documents, batchSize = 1000, checkRevs = False, waitForSync = False, **docArgs) :
+        """Overwrites documents as a whole using a single request per batch of 'batchSize' documents. 'documents' can be any iterable of saved Document objects,
+        or of dictionaries with a _key and the new content of the document. checkRevs and the results work as for updateMany()"""
+
+        def _payload(doc) :
+            if isinstance(doc, Document) :
+                if self._validation['on_save'] :
+                    doc.validate(patch = False)
+                return self._bulkPayload(doc, doc._store, checkRevs)
+            if self._validation['on_save'] :
+                self.validateDct(doc)
+            return self._bulkPayload(doc, doc, checkRevs)
+
+        def _result(doc, res) :
+            if isinstance(doc, Document) and not res.get("error") :
+                doc._rev = res["_rev"]
+                if "new" in res :
+                    doc._setNew(res["new"])
+                doc.modified = False
+                doc._fullSave = False
+                doc._patchStore = {}
+                self._cacheDocument(doc)
+            else :
+                self._uncacheDocument(self._bulkKey(doc))
+
+        params = dict(docArgs)
+        params.update({"ignoreRevs" : not checkRevs, "waitForSync" : waitForSync})
+        return self._bulkWrite("PUT", documents, batchSize, params, UpdateError, _payload, _result)
+
+    def deleteMany(self, documents, batchSize = 1000, checkRevs = False, waitForSync = False, **docArgs) :
+        """Deletes documents using a single request per batch of 'batchSize' documents. 'documents' can be any iterable of saved Document objects, which are reset,
+        of dictionaries with a _key, or of keys. checkRevs and the results work as for updateMany()"""
+
+        def _payload(doc) :
+            if checkRevs and isinstance(doc, Document) :
+                return {"_key" : self._bulkKey(doc), "_rev" : doc._rev}
+            if checkRevs and isinstance(doc, dict) and "_rev" in doc :
+                return {"_key" : self._bulkKey(doc), "_rev" : doc["_rev"]}
+            return self._bulkKey(doc)
+
+        def _result(doc, res) :
+            key = self._bulkKey(doc)
+            self._uncacheDocument(key)
+            if not res.get("error") :
+                self.missingDocuments.add(key)
+                if isinstance(doc, Document) :
+                    doc.reset(self)
+
+        params = dict(docArgs)
+        params.update({"ignoreRevs" : not checkRevs, "waitForSync" : waitForSync})
+        return self._bulkWrite("DELETE", documents, batchSize, params, DeletionError, _payload, _result)
+
+    def _importChunks(self, source, chunkSize) :
+        """generator that splits 'source' into chunks of at most 'chunkSize' JSON lines. 'source' can be the path to a JSONL file, whose lines are sent as they are,
+        or any iterable of dictionaries or Document objects"""
+        def _lines() :
+            codec = self.connection.codec
+            if isinstance(source, (str, bytes)) :
+                with open(source, "rb") as f :
+                    for line in f :
+                        line = line.strip()
+                        if len(line) > 0 :
+                            yield line
+            else :
+                for doc in source :
+                    if isinstance(doc, Document) :
+                        payload = dict(doc._store)
+                        if doc._key is not None :
+                            payload["_key"] = doc._key
+                    else :
+                        payload = doc
+                    yield codec.encode(payload)
+
+        chunk = []
+        for line in _lines() :
+            chunk.append(line)
+            if len(chunk) >= chunkSize :
+                yield b"\n".join(chunk)
+                chunk = []
+
+        if len(chunk) > 0 :
+            yield b"\n".join(chunk)
+
+    def _importChunk(self, session, chunk, params, timeout = None) :
+        "sends a single chunk to the import API using 'session' and returns ArangoDB's counters"
+        r = session.post(self.importURL, params = params, data = chunk, timeout = timeout)
+        data = r.json()
+        if r.status_code != 201 or data["error"] :
+            raise CreationError(data["errorMessage"], data)
+        self.missingDocuments.clear()
+        return data
+
+    def importBulk(self, source, chunkSize = 10000, onDuplicate = "error", complete = False, waitForSync = False, **importArgs) :
+        """Imports documents using ArangoDB's bulk import API, sending 'chunkSize' documents per request. 'source' can be the path to a JSONL file,
+        or any iterable (list, generator...) of dictionaries or Document objects. Documents are read and sent chunk by chunk, so the whole dataset is never loaded in memory.
+        'onDuplicate' can be 'error', 'update', 'replace' or 'ignore'. If 'complete' is True, a chunk containing an invalid document will be rejected as a whole
+        and a CreationError will be raised. Use importArgs to put things such as 'details = True' (for a full list cf ArangoDB's doc).
+        Returns the list of counters returned by ArangoDB for each chunk ({created, errors, empty, updated, ignored})"""
+
+        params = self._importParams(onDuplicate, complete, waitForSync, importArgs)
+        results = []
+        for chunk in self._importChunks(source, chunkSize) :
+            results.append(self._importChunk(self.connection.session, chunk, params))
+
+        return results
+
+    def importBulkParallel(self, source, chunkSize = 10000, onDuplicate = "error", complete = False, waitForSync = False, maxWorkers = 8, minWorkers = 1, maxRetries = 3, timeout = None, **importArgs) :
+        """Same as importBulk() but uploads several chunks at the same time using a pool of 'maxWorkers' threads, each with its own session.
+        The number of concurrent uploads starts at 'minWorkers' and adapts itself (AIMD): it increases while uploads remain fast and is halved when they slow down,
+        time out or when the server answers 503. Such chunks are retried up to 'maxRetries' times. 'timeout' is the number of seconds to wait for the server's answer to a chunk.
+        Returns a BulkImportResult with the per chunk counters, the errors, the throughput and the statistics of every worker"""
+
+        params = self._importParams(onDuplicate, complete, waitForSync, importArgs)
+        importer = ParallelImporter(self, maxWorkers = maxWorkers, minWorkers = minWorkers, maxRetries = maxRetries, timeout = timeout)
+        return importer.run(self._importChunks(source, chunkSize), params)
+
+    def _importParams(self, onDuplicate, complete, waitForSync, importArgs) :
+        "returns the url parameters of an import"
+        params = dict(importArgs)
+        params.update({"collection" : self.name, "type" : "documents", "onDuplicate" : onDuplicate, "complete" : complete, "waitForSync" : waitForSync})
+        return params
+
     def fetchDocument(self, key, rawResults = False, rev = None) :
-        """Fetches a document from the collection given it's key. This function always goes straight to the db and bypasses the cache. If you
-        want to take advantage of the cache use the __getitem__ interface: collection[key]"""
+        """Fetches a document from the collection given it's key. This function always goes straight to the db, and refreshes the cached version of
+        the document if the cache is activated. If you want to take advantage of the cache use the __getitem__ interface: collection[key].
+        If coalescing is activated (see activateCoalescing()), concurrent fetches share their requests, except inside a batch or a stream transaction"""
+        if rev is None and key in self.missingDocuments :
+            raise KeyError("Unable to find document with _key: %s" % key)
+
+        if self.coalescer is not None and rev is None and getActiveBatch() is None and getActiveTransaction(self.documentsURL) is None :
+            docJson = self.coalescer.fetch(key)
+            if rawResults :
+                return docJson
+            doc = self.documentClass(self, docJson)
+            self._cacheDocument(doc)
+            return doc
+
+        url, params = self._fetchDocumentRequest(key, rev)
+        r = self.connection.session.get(url, params = params)
+        return self._fetchDocumentResponse(r, key, rawResults)
+
+    def _fetchDocumentRequest(self, key, rev) :
+        """returns the url and parameters of the request that fetches a document"""
         url = "%s/%s/%s" % (self.documentsURL, self.name, key)
         if rev is not None :
-            r = self.connection.session.get(url, params = {'rev' : rev})
-        else :
-            r = self.connection.session.get(url)
+            return url, {'rev' : rev}
+        return url, None
+
+    def _fetchDocumentResponse(self, r, key, rawResults) :
+        """returns the document contained in ArangoDB's response to a fetch request, raises a KeyError if it was not found"""
         if (r.status_code - 400) < 0 :
             if rawResults :
                 return r.json()
-            return self.documentClass(self, r.json())
+            doc = self.documentClass(self, r.json())
+            self._cacheDocument(doc)
+            return doc
         else :
+            if r.status_code == 404 :
+                self.missingDocuments.add(key)
             raise KeyError("Unable to find document with _key: %s" % key, r.json())
 
-    def fetchByExample(self, exampleDict, batchSize, rawResults = False, **queryArgs) :
-        "exampleDict should be something like {'age' : 28}"
-        return self.simpleQuery('by-example', rawResults, example = exampleDict, batchSize = batchSize, **queryArgs)
+    def fetchDocuments(self, keys, rawResults = False, batchSize = 1000) :
+        """Fetches several documents given their keys, with a single request per 'batchSize' keys. Returns a tuple (documents, missing keys), documents are
+        in the order of 'keys'. Unless rawResults is True, documents that are in the cache are not fetched again, and the fetched ones are cached.
+        Documents are always returned as instances of the document class of the collection, cached ones included"""
+        useCache = not rawResults and self.documentCache is not None
+        found = {}
+        toFetch, seen = [], set()
+        for key in keys :
+            if key in seen :
+                continue
+            seen.add(key)
+            if key in self.missingDocuments :
+                continue
+            if useCache :
+                try :
+                    cachedDoc = self.documentCache[key]
+                except KeyError :
+                    pass
+                else :
+                    if not self.documentCache.isStale(cachedDoc) :
+                        found[key] = cachedDoc.document
+                        registerDocument(cachedDoc.document)
+                        continue
+            toFetch.append(key)
+
+        for i in range(0, len(toFetch), batchSize) :
+            for docJson in self._lookupKeys(toFetch[i:i+batchSize]) :
+                key = docJson["_key"]
+                if rawResults :
+                    found[key] = docJson
+                else :
+                    found[key] = self.documentClass(self, docJson)
+                    self._cacheDocument(found[key])
+
+        for key in toFetch :
+            if key not in found :
+                self.missingDocuments.add(key)
+
+        docs, missing = [], []
+        for key in keys :
+            try :
+                docs.append(found[key])
+            except KeyError :
+                missing.append(key)
+        return docs, missing
+
+    def _lookupKeys(self, keys) :
+        """returns the json of the documents of 'keys' that exist, in no particular order"""
+        payload = self.connection.codec.encode({"collection" : self.name, "keys" : keys})
+        r = self.connection.session.put("%s/simple/lookup-by-keys" % self.database.URL, data = payload)
+        data = r.json()
+        if r.status_code != 200 or data.get("error") :
+            raise SimpleQueryError(data["errorMessage"], data)
+        return data["documents"]
+
+    def fetchByExample(self, exampleDict, batchSize, rawResults = False, prefetch = 0, **queryArgs) :
+        """exampleDict should be something like {'age' : 28}. Set prefetch = N to fetch up to N of the next batches in the background"""
+        return self.simpleQuery('by-example', rawResults, prefetch = prefetch, example = exampleDict, batchSize = batchSize, **queryArgs)
 
     def fetchFirstExample(self, exampleDict, rawResults = False) :
         """exampleDict should be something like {'age' : 28}. returns only a single element but still in a SimpleQuery object.
         returns the first example found that matches the example"""
         return self.simpleQuery('first-example', rawResults = rawResults, example = exampleDict)
 
-    def fetchAll(self, rawResults = False, **queryArgs) :
+    def fetchAll(self, rawResults = False, prefetch = 0, **queryArgs) :
         """Returns all the documents in the collection. You can use the optinal arguments 'skip' and 'limit'::
 
-            fetchAlll(limit = 3, shik = 10)"""
-        return self.simpleQuery('all', rawResults = rawResults, **queryArgs)
+            fetchAlll(limit = 3, shik = 10)
+
+        Set prefetch = N to fetch up to N of the next batches in the background"""
+        return self.simpleQuery('all', rawResults = rawResults, prefetch = prefetch, **queryArgs)
 
     def simpleQuery(self, queryType, rawResults = False, **queryArgs) :
         """General interface for simple queries. queryType can be something like 'all', 'by-example' etc... everything is in the arango doc.
-        If rawResults, the query will return dictionaries instead of Document objetcs.
+        If rawResults, the query will return dictionaries instead of Document objetcs. The keyword argument prefetch = N fetches up to N of the next batches in the background,
+        and resultFormat = 'columns' or 'numpy' returns the batches as columns.
         """
         return SimpleQuery(self, queryType, rawResults, **queryArgs)
 
-    def action(self, method, action, **params) :
-        "a generic fct for interacting everything that doesn't have an assigned fct"
+    def action(self, method, action, asyncJob = False, **params) :
+        """a generic fct for interacting everything that doesn't have an assigned fct.
+        With asyncJob = True, ArangoDB runs the action in the background and a Job is returned, whose result is the decoded response"""
+        if asyncJob :
+            return self.database.jobs.submit(method, self.URL + "/" + action, params = params)
+
         fct = getattr(self.connection.session, method.lower())
         r = fct(self.URL + "/" + action, params = params)
         return r.json()
 
-    def truncate(self) :
-        "deletes every document in the collection"
-        return self.action('PUT', 'truncate')
+    def _truncated(self) :
+        "forgets the cached documents and missing keys once the collection has been truncated"
+        if self.documentCache is not None :
+            self.documentCache.clear()
+        self.missingDocuments.clear()
+
+    def truncate(self, asyncJob = False) :
+        """deletes every document in the collection. With asyncJob = True, returns a Job instead of waiting for the truncation,
+        the cache is then cleared when the result of the job is fetched"""
+        if asyncJob :
+            def truncated(r) :
+                if r.status_code < 400 :
+                    self._truncated()
+                return r.json()
+            return self.database.jobs.submit('PUT', self.URL + "/truncate", resultFct = truncated)
+
+        ret = self.action('PUT', 'truncate')
+        self._truncated()
+        return ret
 
     def empty(self) :
         "alias for truncate"
@@ -489,15 +1033,35 @@ class Collection(with_metaclass(Collection_metaclass, object)) :
         return "ArangoDB collection name: %s, id: %s, type: %s, status: %s" % (self.name, self.id, self.getType(), self.getStatus())
 
     def __getitem__(self, key) :
-        "returns a document from the cache. If it's not there, fetches it from the db and caches it first. If the cache is not activated this is equivalent to fetchDocument( rawResults = False)"
+        """returns a document from the cache. If it's not there, fetches it from the db and caches it first. If the cache is not activated this is equivalent to fetchDocument( rawResults = False).
+        If the cache revalidates its documents, stale ones are checked with a conditional request. Cached documents are registered in the active unit of work, as fetched ones"""
         if self.documentCache is None :
             return self.fetchDocument(key, rawResults = False)
         try :
-            return self.documentCache[key]
+            ret = self.documentCache[key]
         except KeyError :
-            doc = self.fetchDocument(key, rawResults = False)
-            self.documentCache.cache(doc)
-        return doc
+            return self.fetchDocument(key, rawResults = False)
+
+        if self.documentCache.isStale(ret) :
+            ret = self._revalidateDocument(ret)
+        if isinstance(ret, CachedDoc) :
+            registerDocument(ret.document)
+        return ret
+
+    def _revalidateDocument(self, cachedDoc) :
+        """checks with a conditional GET whether the stale cached document has changed. Returns it if it has not (304), the new version otherwise"""
+        url, params = self._fetchDocumentRequest(cachedDoc._key, None)
+        r = self.connection.session.get(url, params = params, headers = {"If-None-Match" : '"%s"' % cachedDoc._rev})
+        if r.status_code == 304 :
+            self.documentCache.revalidated(cachedDoc._key, modified = False)
+            return cachedDoc
+
+        if r.status_code >= 400 :
+            # it was deleted (a 404, its key is then remembered as missing) or can't be checked, the stale version must not be returned anymore
+            self._uncacheDocument(cachedDoc._key)
+        else :
+            self.documentCache.revalidated(cachedDoc._key, modified = True)
+        return self._fetchDocumentResponse(r, cachedDoc._key, rawResults = False)
 
 class SystemCollection(Collection) :
     "for all collections with isSystem = True"
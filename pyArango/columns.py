@@ -0,0 +1,93 @@
+try :
+    import numpy
+except ImportError :
+    numpy = None
+
+__all__ = ["ColumnBuilder", "toArrays"]
+
+class ColumnBuilder(object) :
+    """Pivots rows (dictionaries) into columns: a dictionary {attribute : list of values}. Values missing from a row are set to None,
+    and rows that are not dictionaries (ex: RETURN u.name) are put in the column None. If 'fields' is given, only these attributes are kept"""
+
+    def __init__(self, fields = None) :
+        self.fields = None if fields is None else set(fields)
+        self.columns = {}
+        self.nbRows = 0
+
+    def addRows(self, rows) :
+        """appends every row of 'rows' to the columns"""
+        columns = self.columns
+        fields = self.fields
+        nbRows = self.nbRows
+        for row in rows :
+            if not isinstance(row, dict) :
+                row = {None : row}
+
+            for k, v in row.items() :
+                if fields is not None and k not in fields :
+                    continue
+                try :
+                    column = columns[k]
+                except KeyError :
+                    column = []
+                    columns[k] = column
+                # columns are only padded when they get a value, and once at the end by getColumns()
+                if len(column) < nbRows :
+                    column.extend([None] * (nbRows - len(column)))
+                column.append(v)
+            nbRows += 1
+        self.nbRows = nbRows
+
+    def getColumns(self, arrays = False) :
+        """returns the columns as lists, or as NumPy arrays if arrays = True"""
+        for column in self.columns.values() :
+            if len(column) < self.nbRows :
+                column.extend([None] * (self.nbRows - len(column)))
+        if arrays :
+            return toArrays(self.columns)
+        return self.columns
+
+def _arrayDtype(values) :
+    hasNone = False
+    dtype = None
+    for v in values :
+        if v is None :
+            hasNone = True
+        elif isinstance(v, bool) :
+            if dtype is None :
+                dtype = "bool"
+            elif dtype != "bool" :
+                return object
+        elif isinstance(v, (int, float)) :
+            if dtype is None or dtype == "int64" :
+                dtype = "float64" if isinstance(v, float) else "int64"
+            elif dtype != "float64" :
+                return object
+        else :
+            return object
+
+    if dtype is None :
+        return object
+    if hasNone :
+        return "float64" if dtype != "bool" else object
+    return dtype
+
+def toArrays(columns) :
+    """converts columns of values into NumPy arrays: numeric columns become typed arrays (missing values are NaNs), all the others, including strings, object arrays.
+    Requires numpy"""
+    if numpy is None :
+        raise ImportError("NumPy is required to convert columns into arrays")
+
+    ret = {}
+    for k, values in columns.items() :
+        dtype = _arrayDtype(values)
+        if dtype is object :
+            array = numpy.empty(len(values), dtype = object)
+            for i, v in enumerate(values) :
+                array[i] = v
+        elif dtype == "float64" :
+            array = numpy.array([numpy.nan if v is None else v for v in values], dtype = dtype)
+        else :
+            array = numpy.array(values, dtype = dtype)
+        ret[k] = array
+    return ret
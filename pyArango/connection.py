@@ -1,76 +1,327 @@
 import requests
-import json
+import threading
+import time
+import zlib
 
 from .database import Database, DBHandle
 from .theExceptions import CreationError, ConnectionError
 from .users import Users
+from .endpoints import EndpointBalancer
+from .codec import getCodec
+from .negativecache import NegativeCache
+from .transactions import getActiveTransaction
+from .batch import Batch, getActiveBatch
 
-class JsonHook(object) :
-    """This one replaces requests' original json() function. If a call to json() fails, it will print a message with the request content"""
-    def __init__(self, ret) :
-        self.ret = ret
-        self.ret.json_originalFct = self.ret.json
-    
-    def __call__(self, *args, **kwargs) :
-        try :
-            return self.ret.json_originalFct(*args, **kwargs)
-        except Exception as e :
-            print( "Unable to get json for request: %s. Content: %s" % (self.ret.url, self.ret.content) )
-            raise e 
+_NOT_DECODED = object()
+
+class JsonResponse(object) :
+    """Wraps the responses of requests. The content is decoded by 'codec' on the first call to json() and the result is cached, so that a response is never decoded twice:
+    every call to json() returns the same object. If the decoding fails, it will print a message with the request content.
+    'endpoint' is the url of the coordinator that answered, if the requests are balanced"""
+
+    __slots__ = ("response", "codec", "endpoint", "_json")
+
+    def __init__(self, response, codec, endpoint = None) :
+        self.response = response
+        self.codec = codec
+        self.endpoint = endpoint
+        self._json = _NOT_DECODED
+
+    def json(self) :
+        if self._json is _NOT_DECODED :
+            try :
+                self._json = self.codec.decode(self.content)
+            except Exception as e :
+                print( "Unable to get json for request: %s. Content: %s" % (self.url, self.content) )
+                raise e
+        return self._json
+
+    @property
+    def status_code(self) :
+        return self.response.status_code
+
+    @property
+    def url(self) :
+        return self.response.url
+
+    @property
+    def content(self) :
+        return self.response.content
+
+    @property
+    def headers(self) :
+        return self.response.headers
+
+    def __getattr__(self, k) :
+        return getattr(self.response, k)
 
 class AikidoSession(object) :
     """Magical Aikido being that you probably do not need to access directly that deflects every http request to requests in the most graceful way.
     It will also save basic stats on requests in it's attribute '.log'.
+    Connections are kept in a pool of 'poolMaxsize' connections per host ('poolSize' hosts are pooled). If 'poolBlock' is True, requests wait for a free connection
+    instead of opening extra connections that are discarded afterwards. If 'keepAliveTimeout' is set (it should match ArangoDB's --http.keep-alive-timeout),
+    pooled connections that have been idle for longer are dropped instead of being reused after the server closed them.
+    If a 'balancer' (EndpointBalancer) is given, requests are distributed among several coordinators. The endpoint that answered is stored in the response's
+    attribute '.endpoint', and a request can be sent to a specific endpoint with the keyword argument 'endpoint'.
+    Responses are wrapped into JsonResponses decoded by 'codec' (see pyArango.codec).
+    If 'compression' is 'gzip' or 'deflate', request bodies of at least 'compressionThreshold' bytes are compressed. If 'acceptCompressed' is True, ArangoDB
+    may send compressed responses. The number of bytes sent and received is counted in '.log', both before compression ('bytesSent', 'bytesReceived')
+    and as transferred ('bytesSentWire', 'bytesReceivedWire').
     """
 
     class Holder(object) :
-        def __init__(self, fct, auth) :
+        def __init__(self, fct, auth, aikido) :
             self.fct = fct
             self.auth = auth
+            self.aikido = aikido
+            self.codec = aikido.codec
 
-        def __call__(self, *args, **kwargs) :
+        def __call__(self, url, *args, **kwargs) :
             if self.auth :
                 kwargs["auth"] = self.auth
 
-            try :
-                ret = self.fct(*args, **kwargs)
-            except :
-                print ("===\nUnable to establish connection, perhaps arango is not running.\n===")
-                raise
+            pinnedEndpoint = kwargs.pop("endpoint", None)
+            trx = getActiveTransaction(url)
+            if trx is not None :
+                headers = dict(kwargs.get("headers") or {})
+                headers["x-arango-trx-id"] = trx.id
+                kwargs["headers"] = headers
+                if pinnedEndpoint is None :
+                    pinnedEndpoint = trx.endpoint
+
+            batch = getActiveBatch()
+            if batch is not None :
+                ret = batch.defer(self.fct.__name__.upper(), url, kwargs, pinnedEndpoint)
+                endpoint = ret.endpoint
+            else :
+                self.aikido._compress(kwargs)
+                try :
+                    if self.aikido.balancer is None :
+                        ret, endpoint = self._send(url, args, kwargs), None
+                    else :
+                        ret, endpoint = self._balance(url, args, kwargs, pinnedEndpoint)
+                except :
+                    print ("===\nUnable to establish connection, perhaps arango is not running.\n===")
+                    raise
+
+            if batch is None :
+                self.aikido._countResponse(ret)
 
             if ret.status_code == 401 :
                 raise ConnectionError("Unauthorized access, you must supply a (username, password) with the correct credentials", ret.url, ret.status_code, ret.content)
 
-            ret.json = JsonHook(ret)
-            return ret
+            return JsonResponse(ret, self.codec, endpoint)
+
+        def _send(self, url, args, kwargs) :
+            self.aikido._startRequest()
+            try :
+                return self.fct(url, *args, **kwargs)
+            finally :
+                self.aikido._endRequest()
+
+        def _balance(self, url, args, kwargs, pinnedEndpoint) :
+            """sends the request to the endpoint chosen by the balancer, or to 'pinnedEndpoint' if it's not None.
+            If an endpoint can't be reached, the request is sent to the next one"""
+            balancer = self.aikido.balancer
+            tried = []
+            while True :
+                if pinnedEndpoint is not None :
+                    endpoint = balancer.find(pinnedEndpoint)
+                else :
+                    endpoint = balancer.pick(exclude = tried)
+
+                startTime = balancer.start(endpoint)
+                try :
+                    ret = self._send(balancer.rewrite(url, endpoint), args, kwargs)
+                except requests.exceptions.ConnectionError :
+                    balancer.failure(endpoint)
+                    tried.append(endpoint)
+                    if pinnedEndpoint is not None or len(tried) >= len(balancer.endpoints) :
+                        raise
+                    continue
+                except :
+                    balancer.failure(endpoint)
+                    raise
+
+                balancer.success(endpoint, startTime)
+                return ret, endpoint.url
+
+    compressions = ("gzip", "deflate")
+
+    def __init__(self, username, password, poolSize = 10, poolMaxsize = 10, poolBlock = False, keepAliveTimeout = None, balancer = None, codec = None, compression = None, compressionThreshold = 1024, compressionLevel = 6, acceptCompressed = True) :
+        if compression is not None and compression not in self.compressions :
+            raise ValueError("Unknown compression '%s', must be one of: %s" % (compression, ", ".join(self.compressions)))
 
-    def __init__(self, username, password) :
         if username :
             self.auth = (username, password)
         else :
             self.auth = None
 
+        self.poolMaxsize = poolMaxsize
+        self.keepAliveTimeout = keepAliveTimeout
+        self.balancer = balancer
+        self.codec = getCodec(codec or "json")
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections = poolSize, pool_maxsize = poolMaxsize, pool_block = poolBlock)
         self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate" if acceptCompressed else "identity"
+
+        self.compression = compression
+        self.compressionThreshold = compressionThreshold
+        self.compressionLevel = compressionLevel
+
+        self.lock = threading.Lock()
+        self.inFlight = 0
+        self.maxInFlight = 0
+        self.lastRequestTime = None
+
+        self.holders = {}
         self.log = {}
         self.log["nb_request"] = 0
         self.log["requests"] = {}
+        for counter in ("bytesSent", "bytesSentWire", "bytesReceived", "bytesReceivedWire") :
+            self.log[counter] = 0
+
+    def _compress(self, kwargs) :
+        """compresses the body of a request if it is large enough, and counts the bytes sent"""
+        data = kwargs.get("data")
+        if data is None :
+            return
+        if not isinstance(data, bytes) :
+            try :
+                data = data.encode("utf-8")
+            except AttributeError :
+                # a file or a generator, sent as it is
+                return
+
+        rawSize = len(data)
+        if self.compression is not None and rawSize >= self.compressionThreshold :
+            if self.compression == "gzip" :
+                compressor = zlib.compressobj(self.compressionLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                data = compressor.compress(data) + compressor.flush()
+            else :
+                data = zlib.compress(data, self.compressionLevel)
+            headers = dict(kwargs.get("headers") or {})
+            headers["Content-Encoding"] = self.compression
+            kwargs["headers"] = headers
+        kwargs["data"] = data
+
+        with self.lock :
+            self.log["bytesSent"] += rawSize
+            self.log["bytesSentWire"] += len(data)
+
+    def _countResponse(self, response) :
+        """counts the bytes received, before decompression and as transferred"""
+        rawSize = len(response.content or b"")
+        try :
+            wireSize = response.raw.tell()
+        except Exception :
+            wireSize = None
+        if not wireSize :
+            wireSize = rawSize
+
+        with self.lock :
+            self.log["bytesReceived"] += rawSize
+            self.log["bytesReceivedWire"] += wireSize
+
+    def getTransferStats(self) :
+        """returns the bytes sent and received, before compression and as transferred, and the ratios between them"""
+        with self.lock :
+            stats = dict((k, self.log[k]) for k in ("bytesSent", "bytesSentWire", "bytesReceived", "bytesReceivedWire"))
+        stats["sentRatio"] = float(stats["bytesSentWire"]) / stats["bytesSent"] if stats["bytesSent"] > 0 else 1.
+        stats["receivedRatio"] = float(stats["bytesReceivedWire"]) / stats["bytesReceived"] if stats["bytesReceived"] > 0 else 1.
+        return stats
+
+    def _startRequest(self) :
+        with self.lock :
+            now = time.time()
+            if self.keepAliveTimeout is not None and self.inFlight == 0 and self.lastRequestTime is not None and now - self.lastRequestTime > self.keepAliveTimeout :
+                self._closeIdleConnections()
+            self.lastRequestTime = now
+            self.inFlight += 1
+            self.maxInFlight = max(self.maxInFlight, self.inFlight)
+
+    def _endRequest(self) :
+        with self.lock :
+            self.inFlight -= 1
+            self.lastRequestTime = time.time()
+
+    def prewarm(self, url, nbConnections) :
+        """opens 'nbConnections' connections to the coordinator 'url' and puts them in the pool, so that the first requests do not have to wait for handshakes.
+        They are opened by lightweight requests (GET /_api/version), whose responses are only read once all of them have been sent: each one holds its connection until then"""
+        responses = []
+        try :
+            for i in range(min(nbConnections, self.poolMaxsize)) :
+                responses.append(self.session.get("%s/_api/version" % url, auth = self.auth, stream = True))
+        finally :
+            for r in responses :
+                # reading the whole response gives the connection back to the pool
+                r.content
+                r.close()
+
+    def _closeIdleConnections(self) :
+        "closes the idle connections of the pools, they are opened again when needed"
+        poolManager = self.adapter.poolmanager
+        for key in list(poolManager.pools.keys()) :
+            pool = poolManager.pools.get(key)
+            if pool is None or pool.pool is None :
+                continue
+            for conn in list(pool.pool.queue) :
+                if conn is not None :
+                    conn.close()
+
+    def getPoolStats(self) :
+        """returns statistics about the connection pools: the number of pooled hosts, the number of connections opened since the creation of the pools,
+        the number of idle connections ready for reuse, the number of requests in flight (current and maximum) and the utilisation of the pools"""
+        stats = {
+            "pools" : 0,
+            "poolMaxsize" : self.poolMaxsize,
+            "connectionsOpened" : 0,
+            "idleConnections" : 0,
+            "inFlight" : self.inFlight,
+            "maxInFlight" : self.maxInFlight,
+        }
+
+        poolManager = self.adapter.poolmanager
+        for key in list(poolManager.pools.keys()) :
+            pool = poolManager.pools.get(key)
+            if pool is None or pool.pool is None :
+                continue
+            stats["pools"] += 1
+            stats["connectionsOpened"] += pool.num_connections
+            stats["idleConnections"] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+        if stats["pools"] > 0 :
+            stats["utilisation"] = float(self.inFlight) / (stats["pools"] * self.poolMaxsize)
+        else :
+            stats["utilisation"] = 0.
+
+        return stats
 
     def __getattr__(self, k) :
+        holders = object.__getattribute__(self, "holders")
         try :
-            reqFct = getattr(object.__getattribute__(self, "session"), k)
-        except :
-            raise AttributeError("Attribute '%s' not found (no Aikido move available)" % k)
+            holder = holders[k]
+        except KeyError :
+            try :
+                reqFct = getattr(object.__getattribute__(self, "session"), k)
+            except :
+                raise AttributeError("Attribute '%s' not found (no Aikido move available)" % k)
+
+            holdClass = object.__getattribute__(self, "Holder")
+            auth = object.__getattribute__(self, "auth")
+            holder = holdClass(reqFct, auth, self)
+            holders[k] = holder
 
-        holdClass = object.__getattribute__(self, "Holder")
-        auth = object.__getattribute__(self, "auth")
         log = object.__getattribute__(self, "log")
         log["nb_request"] += 1
         try :
-            log["requests"][reqFct.__name__] += 1
+            log["requests"][holder.fct.__name__] += 1
         except :
-            log["requests"][reqFct.__name__] = 1
+            log["requests"][holder.fct.__name__] = 1
 
-        return holdClass(reqFct, auth)
+        return holder
 
     def disconnect(self) :
         try:
@@ -79,9 +330,35 @@ class AikidoSession(object) :
             pass
 
 class Connection(object) :
-    """This is the entry point in pyArango and directly handles databases."""
-    def __init__(self, arangoURL = 'http://127.0.0.1:8529', username=None, password=None) :
+    """This is the entry point in pyArango and directly handles databases.
+    arangoURL can also be a list of coordinators urls, requests are then distributed among them according to 'loadBalancing' ('round-robin', 'least-outstanding'
+    or 'latency'). Unreachable coordinators are avoided for 'endpointRetryDelay' seconds. Cursors are always continued on the coordinator that created them.
+    poolSize, poolMaxsize, poolBlock and keepAliveTimeout configure the connection pool of the sessions (see AikidoSession).
+    If prewarm > 0, this number of connections is opened beforehand, so that the first burst of requests does not pay the TCP handshakes.
+    'codec' encodes all payloads and decodes all responses. It can be 'json' (python's json module), 'orjson', 'ujson', 'auto' (the fastest one installed) or any codec instance, see pyArango.codec.
+    If negativeCacheTTL > 0, the databases, collections and documents that were not found are remembered as missing for that number of seconds, instead of
+    triggering a request (or a reload) every time they are asked for. Creating them through pyArango makes them available immediately.
+    compression ('gzip' or 'deflate'), compressionThreshold, compressionLevel and acceptCompressed configure the compression of the bodies (see AikidoSession)."""
+    def __init__(self, arangoURL = 'http://127.0.0.1:8529', username=None, password=None, poolSize = 10, poolMaxsize = 10, poolBlock = False, keepAliveTimeout = None, prewarm = 0, loadBalancing = "round-robin", endpointRetryDelay = 30, codec = "json", negativeCacheTTL = 0, compression = None, compressionThreshold = 1024, compressionLevel = 6, acceptCompressed = True) :
         self.databases = {}
+        self.codec = getCodec(codec)
+        self.negativeCacheTTL = negativeCacheTTL
+        self.missingDatabases = NegativeCache(negativeCacheTTL)
+        self.balancer = None
+        if isinstance(arangoURL, (list, tuple)) :
+            endpoints = [url.rstrip("/") for url in arangoURL]
+            if len(endpoints) > 1 :
+                self.balancer = EndpointBalancer(endpoints, strategy = loadBalancing, retryDelay = endpointRetryDelay)
+                poolSize = max(poolSize, len(endpoints))
+            arangoURL = endpoints[0]
+        self.poolSize = poolSize
+        self.poolMaxsize = poolMaxsize
+        self.poolBlock = poolBlock
+        self.keepAliveTimeout = keepAliveTimeout
+        self.compression = compression
+        self.compressionThreshold = compressionThreshold
+        self.compressionLevel = compressionLevel
+        self.acceptCompressed = acceptCompressed
         if arangoURL[-1] == "/" :
             if ('url' not in vars()):
                 raise Exception("you either need to define `url` or make arangoURL contain an HTTP-Host")
@@ -91,6 +368,9 @@ class Connection(object) :
 
         self.session = None
         self.resetSession(username, password)
+        if prewarm > 0 :
+            for url in self.getEndpoints() :
+                self.session.prewarm(url, prewarm)
 
         self.URL = '%s/_api' % self.arangoURL
         if not self.session.auth :
@@ -108,8 +388,39 @@ class Connection(object) :
     def resetSession(self, username=None, password=None) :
         """resets the session"""
         self.disconnectSession()
-        self.session = AikidoSession(username, password)
-        
+        self.username = username
+        self.password = password
+        self.session = self.createSession()
+
+    def createSession(self) :
+        """returns a new session using the credentials of the connection. Useful for threads that need their own session"""
+        return AikidoSession(self.username, self.password, poolSize = self.poolSize, poolMaxsize = self.poolMaxsize, poolBlock = self.poolBlock, keepAliveTimeout = self.keepAliveTimeout, balancer = self.balancer, codec = self.codec,
+            compression = self.compression, compressionThreshold = self.compressionThreshold, compressionLevel = self.compressionLevel, acceptCompressed = self.acceptCompressed)
+
+    def getEndpoints(self) :
+        """returns the list of coordinators urls"""
+        if self.balancer is None :
+            return [self.arangoURL]
+        return [endpoint.url for endpoint in self.balancer.endpoints]
+
+    def getEndpointStats(self) :
+        """returns the health, number of requests, failures and average latency of each coordinator"""
+        if self.balancer is None :
+            return []
+        return self.balancer.getStats()
+
+    def getPoolStats(self) :
+        """returns the statistics of the connection pool of the session, see AikidoSession.getPoolStats()"""
+        return self.session.getPoolStats()
+
+    def getTransferStats(self) :
+        """returns the bytes sent and received by the session, see AikidoSession.getTransferStats()"""
+        return self.session.getTransferStats()
+
+    def batch(self, maxSize = 1000) :
+        """returns a Batch, that sends the calls deferred by its call() function with a single request to ArangoDB's batch API (per database and step). See pyArango.batch"""
+        return Batch(self, maxSize = maxSize)
+
     def reload(self) :
         """Reloads the database list.
         Because loading a database triggers the loading of all collections and graphs within,
@@ -130,11 +441,12 @@ class Connection(object) :
     def createDatabase(self, name, **dbArgs) :
         "use dbArgs for arguments other than name. for a full list of arguments please have a look at arangoDB's doc"
         dbArgs['name'] = name
-        payload = json.dumps(dbArgs)
+        payload = self.codec.encode(dbArgs)
         url = self.URL + "/database"
         r = self.session.post(url, data = payload)
         data = r.json()
         if r.status_code == 201 and not data["error"] :
+            self.missingDatabases.discard(name)
             db = Database(self, name)
             self.databases[name] = db
             return self.databases[name]
@@ -150,8 +462,11 @@ class Connection(object) :
         try :
             return self.databases[dbName]
         except KeyError :
+            if dbName in self.missingDatabases :
+                raise KeyError("Can't find any database named : %s" % dbName)
             self.reload()
             try :
                 return self.databases[dbName]
             except KeyError :
+                self.missingDatabases.add(dbName)
                 raise KeyError("Can't find any database named : %s" % dbName)
@@ -1,4 +1,3 @@
-import json
 import types
 
 from . import collection as COL
@@ -9,6 +8,10 @@ from .document import Document
 from .graph import Graph
 from .query import AQLQuery
 from .theExceptions import CreationError, UpdateError, AQLQueryError, TransactionError
+from .negativecache import NegativeCache
+from .unitofwork import UnitOfWork
+from .transactions import StreamTransaction
+from .jobs import JobManager
 
 __all__ = ["Database", "DBHandle"]
 
@@ -30,12 +33,18 @@ class Database(object) :
 
         self.collections = {}
         self.graphs = {}
+        self.missingCollections = NegativeCache(self.connection.negativeCacheTTL)
+        self.jobs = JobManager(self)
 
         self.reload()
 
     def reloadCollections(self) :
         "reloads the collection list."
         r = self.connection.session.get(self.collectionsURL)
+        self._collectionsResponse(r)
+
+    def _collectionsResponse(self, r) :
+        "fills self.collections according to ArangoDB's response to a collection list request"
         data = r.json()
         if r.status_code == 200 :
             self.collections = {}
@@ -59,7 +68,7 @@ class Database(object) :
 
                 self.collections[colName] = colObj
         else :
-            raise updateError(data["errorMessage"], data)
+            raise UpdateError(data["errorMessage"], data)
 
     def reloadGraphs(self) :
         "reloads the graph list"
@@ -86,6 +95,12 @@ class Database(object) :
         Use colArgs to put things such as 'isVolatile = True' (see ArangoDB's doc
         for a full list of possible arugments)."""
 
+        colClass, payload = self._createCollectionRequest(className, waitForSync, colArgs)
+        r = self.connection.session.post(self.collectionsURL, data = payload)
+        return self._createCollectionResponse(colClass, r)
+
+    def _createCollectionRequest(self, className, waitForSync, colArgs) :
+        "returns the collection class and the payload of the request that creates a collection"
         if className != 'Collection' and className != 'Edges' :
             colArgs['name'] = className
         else :
@@ -104,13 +119,16 @@ class Database(object) :
 
         colArgs["waitForSync"] = waitForSync
 
-        payload = json.dumps(colArgs)
-        r = self.connection.session.post(self.collectionsURL, data = payload)
+        return colClass, self.connection.codec.encode(colArgs)
+
+    def _createCollectionResponse(self, colClass, r) :
+        "returns the collection created according to ArangoDB's response"
         data = r.json()
 
         if r.status_code == 200 and not data["error"] :
             col = colClass(self, data)
             self.collections[col.name] = col
+            self.missingCollections.discard(col.name)
             return self.collections[col.name]
         else :
             raise CreationError(data["errorMessage"], data)
@@ -120,6 +138,53 @@ class Database(object) :
         sid = _id.split("/")
         return self[sid[0]][sid[1]]
 
+    def session(self, batchSize = 1000, keepNull = True, waitForSync = False, transaction = False) :
+        """returns a UnitOfWork, to be used as a context manager::
+
+            with db.session() as session :
+                doc = db["users"]["tesla"]
+                doc["age"] = 87
+                db["users"].createDocument({"name" : "edison"})
+                session.delete(db["users"]["marconi"])
+
+        Documents created or loaded inside the with block are saved at its end, grouped into one request per collection and operation.
+        With transaction = True, they are saved inside a stream transaction: either all of them are saved, or none"""
+        return UnitOfWork(self, batchSize = batchSize, keepNull = keepNull, waitForSync = waitForSync, transaction = transaction)
+
+    def beginTransaction(self, read = None, write = None, exclusive = None, **trxArgs) :
+        """begins a stream transaction on the collections named in 'read', 'write' and 'exclusive' and returns it. The requests sent to the database by the current thread
+        are part of the transaction until its commit() or abort(). Use it as a context manager to commit it at the end of a with block, see StreamTransaction.
+        Use trxArgs for things such as waitForSync, lockTimeout or maxTransactionSize"""
+        trx = StreamTransaction(self, read = read, write = write, exclusive = exclusive, **trxArgs)
+        trx.begin()
+        return trx
+
+    def fetchDocuments(self, ids, rawResults = False) :
+        """fetches several documents using their _ids, with one request per collection (see Collection.fetchDocuments()).
+        Returns a tuple (documents, missing _ids), documents are in the order of 'ids'. The _ids of unknown collections are missing"""
+        keys = {}
+        for _id in ids :
+            colName, key = _id.split("/", 1)
+            keys.setdefault(colName, []).append(key)
+
+        found = {}
+        for colName, colKeys in keys.items() :
+            try :
+                collection = self[colName]
+            except KeyError :
+                continue
+            docs, missing = collection.fetchDocuments(colKeys, rawResults = rawResults)
+            for doc in docs :
+                found["%s/%s" % (colName, doc["_key"] if rawResults else doc._key)] = doc
+
+        docs, missing = [], []
+        for _id in ids :
+            try :
+                docs.append(found[_id])
+            except KeyError :
+                missing.append(_id)
+        return docs, missing
+
     def createGraph(self, name, createCollections = True) :
         """Creates a graph and returns it. 'name' must be the name of a class inheriting from Graph.
         You can decide weither or not you want non existing collections to be created by setting the value of 'createCollections'.
@@ -152,7 +217,7 @@ class Database(object) :
                 "orphanCollections": graphClass._orphanedCollections
             }
 
-        payload = json.dumps(payload)
+        payload = self.connection.codec.encode(payload)
         r = self.connection.session.post(self.graphsURL, data = payload)
         data = r.json()
 
@@ -170,29 +235,39 @@ class Database(object) :
         """returns true if the databse has a graph by the name of 'name'"""
         return name in self.graphs
 
-    def AQLQuery(self, query, batchSize = 100, rawResults = False, bindVars = {}, options = {}, count = False, fullCount = False, **moreArgs) :
+    def AQLQuery(self, query, batchSize = 100, rawResults = False, bindVars = {}, options = {}, count = False, fullCount = False, prefetch = 0, resultFormat = "documents", asyncJob = False, **moreArgs) :
         """Set rawResults = True if you want the query to return dictionnaries instead of Document objects.
+        Set prefetch = N to fetch up to N of the next batches in the background while iterating over the current one.
+        Set resultFormat = 'columns' (or 'numpy') to iterate over batches of columns instead of documents, see Query.toColumns().
+        Set asyncJob = True to have ArangoDB run the query in the background, a Job is then returned whose result is the query.
         You can use **moreArgs to pass more arguments supported by the api, such as ttl=60 (time to live)"""
-        return AQLQuery(self, query, rawResults = rawResults, batchSize = batchSize, bindVars  = bindVars, options = options, count = count, fullCount = fullCount, **moreArgs)
+        if asyncJob :
+            payload = AQLQuery.getPayload(query, batchSize, bindVars, options, count, fullCount, moreArgs)
+            def _query(r) :
+                return AQLQuery(self, query, batchSize, bindVars, options, count, fullCount, rawResults = rawResults, prefetch = prefetch, resultFormat = resultFormat, request = r)
+            return self.jobs.submit("POST", self.cursorsURL, _query, data = self.connection.codec.encode(payload))
+
+        return AQLQuery(self, query, rawResults = rawResults, batchSize = batchSize, bindVars  = bindVars, options = options, count = count, fullCount = fullCount, prefetch = prefetch, resultFormat = resultFormat, **moreArgs)
 
     def explainAQLQuery(self, query, allPlans = False) :
         """Returns an explanation of the query. Setting allPlans to True will result in ArangoDB returning all possible plans. False returns only the optimal plan"""
         payload = {'query' : query, 'allPlans' : allPlans}
-        request = self.connection.session.post(self.explainURL, data = json.dumps(payload))
+        request = self.connection.session.post(self.explainURL, data = self.connection.codec.encode(payload))
         return request.json()
 
     def validateAQLQuery(self, query, bindVars = {}, options = {}) :
         "returns the server answer is the query is valid. Raises an AQLQueryError if not"
         payload = {'query' : query, 'bindVars' : bindVars, 'options' : options}
-        r = self.connection.session.post(self.cursorsURL, data = json.dumps(payload))
+        r = self.connection.session.post(self.cursorsURL, data = self.connection.codec.encode(payload))
         data = r.json()
         if r.status_code == 201 and not data["error"] :
             return data
         else :
             raise AQLQueryError(data["errorMessage"], query, data)
 
-    def transaction(self, collections, action, waitForSync = False, lockTimeout = None, params = None) :
-        """Execute a server-side transaction"""
+    def transaction(self, collections, action, waitForSync = False, lockTimeout = None, params = None, asyncJob = False) :
+        """Execute a server-side JavaScript transaction. See beginTransaction() for stream transactions.
+        With asyncJob = True, ArangoDB runs the transaction in the background and a Job is returned, whose result is the one of the transaction"""
         payload = {
                 "collections": collections,
                 "action": action,
@@ -202,14 +277,18 @@ class Database(object) :
         if params is not None:
             payload["params"] = params
 
-        r = self.connection.session.post(self.transactionURL, data = json.dumps(payload))
+        def _result(r) :
+            data = r.json()
+            if r.status_code == 200 and not data["error"] :
+                return data
+            else :
+                raise TransactionError(data["errorMessage"], action, data)
 
-        data = r.json()
+        if asyncJob :
+            return self.jobs.submit("POST", self.transactionURL, _result, data = self.connection.codec.encode(payload))
 
-        if r.status_code == 200 and not data["error"] :
-            return data
-        else :
-            raise TransactionError(data["errorMessage"], action, data)
+        r = self.connection.session.post(self.transactionURL, data = self.connection.codec.encode(payload))
+        return _result(r)
 
     def __repr__(self) :
         return "ArangoDB database: %s" % self.name
@@ -219,10 +298,13 @@ class Database(object) :
         try :
             return self.collections[collectionName]
         except KeyError :
+            if collectionName in self.missingCollections :
+                raise KeyError("Can't find any collection named : %s" % collectionName)
             self.reload()
             try :
                 return self.collections[collectionName]
             except KeyError :
+                self.missingCollections.add(collectionName)
                 raise KeyError("Can't find any collection named : %s" % collectionName)
 
 class DBHandle(Database) :
@@ -1,15 +1,23 @@
-import json, types
+import types
 
 from .theExceptions import (CreationError, DeletionError, UpdateError)
+from .unitofwork import registerDocument
+from .batch import getActiveBatch
+from .transactions import getActiveTransaction
+from .tracking import PatchNode, track, detach
 
 __all__ = ["Document", "Edge"]
 
 class Document(object) :
     """The class that represents a document. Documents are meant to be instanciated by collections"""
 
+    # save() sends a PATCH instead of a PUT when the patch is at most this fraction of the size of the whole document
+    savePatchRatio = 0.5
+
     def __init__(self, collection, jsonFieldInit = {}) :
         self.reset(collection, jsonFieldInit)
         self.typeName = "ArangoDoc"
+        registerDocument(self)
 
     def reset(self, collection, jsonFieldInit = {}) :
         """replaces the current values in the document by those in jsonFieldInit"""
@@ -19,11 +27,14 @@ class Document(object) :
 
         self._store = {}
         self._patchStore = {}
+        self._fullSave = False
 
         self._id, self._rev, self._key = None, None, None
         self.URL = None
 
         self.set(jsonFieldInit)
+        # the initial values are not modifications
+        self._patchStore = {}
         self.modified = True
 
     def setPrivates(self, fieldDict) :
@@ -53,55 +64,123 @@ class Document(object) :
             for k in list(fieldDict.keys()) :
                 self[k] = fieldDict[k]
         else :
+            for k in fieldDict :
+                detach(self._store.get(k), fieldDict[k])
             self._store.update(fieldDict)
+            if self.URL is not None :
+                for k in fieldDict :
+                    self._patchStore[k] = self._store[k]
 
     def save(self, waitForSync = False, **docArgs) :
         """Saves the document to the database by either performing a POST (for a new document) or a PUT (complete document overwrite).
         If you want to only update the modified fields use the .path() function.
         Use docArgs to put things such as 'waitForSync = True' (for a full list cf ArangoDB's doc).
-        It will only trigger a saving of the document if it has been modified since the last save. If you want to force the saving you can use forceSave()"""
+        It will only trigger a saving of the document if it has been modified since the last save. If you want to force the saving you can use forceSave().
+        If the write-behind mode of the collection is activated, a new document is only enqueued and will be inserted in the background (except inside a batch or a stream transaction).
+        If only a few fields of an existing document were modified, the document is patched instead (see savePatchRatio).
+        With returnNew = True, the document is updated with the version stored by ArangoDB without any additional request. With returnOld = True, the previous version is returned"""
 
-        if self.modified :
+        writeBehind = self.collection.writeBehind
+        if self.modified and self.URL is None and writeBehind is not None and getActiveBatch() is None and getActiveTransaction(self.collection.documentsURL) is None :
             if self.collection._validation['on_save'] :
                 self.validate(patch = False)
+            if writeBehind.put(self) :
+                self.modified = False
+                self._patchStore = {}
+                return
 
-            params = dict(docArgs)
-            params.update({'collection': self.collection.name, "waitForSync" : waitForSync })
-            payload = {}
-            payload.update(self._store)
-
-            if self.URL is None :
-                if self._key is not None :
-                    payload["_key"] = self._key
-                payload = json.dumps(payload)
-                r = self.connection.session.post(self.documentsURL, params = params, data = payload)
-                update = False
-            else :
-                payload = json.dumps(payload)
-                r = self.connection.session.put(self.URL, params = params, data = payload)
-                update = True
+        if self.modified :
+            method, url, params, payload = self._saveRequest(waitForSync, docArgs)
+            if method == "put" and self._canPatch(len(payload)) :
+                return self.patch(waitForSync = waitForSync, **docArgs)
+            r = getattr(self.connection.session, method)(url, params = params, data = payload)
+            old = self._saveResponse(r)
+            self._patchStore = {}
+            return old
 
-            data = r.json()
+        self._patchStore = {}
 
-            if (r.status_code == 201 or r.status_code == 202) and "error" not in data :
-                if update :
-                    self._rev = data['_rev']
-                else :
-                    self.setPrivates(data)
-            else :
-                if update :
-                    raise UpdateError(data['errorMessage'], data)
-                else :
-                    raise CreationError(data['errorMessage'], data)
+    def _saveRequest(self, waitForSync, docArgs) :
+        """validates the document and returns the http method, url, parameters and payload of the request that saves it"""
+        if self.collection._validation['on_save'] :
+            self.validate(patch = False)
 
-            self.modified = False
+        params = dict(docArgs)
+        params.update({'collection': self.collection.name, "waitForSync" : waitForSync })
+        payload = {}
+        payload.update(self._store)
 
-        self._patchStore = {}
+        if self.URL is None :
+            if self._key is not None :
+                payload["_key"] = self._key
+            return "post", self.documentsURL, params, self.connection.codec.encode(payload)
+
+        return "put", self.URL, params, self.connection.codec.encode(payload)
+
+    def _canPatch(self, fullSize = None) :
+        """returns True if patching the document has the same effect as saving it as a whole, and sends much less data.
+        'fullSize' is the size of the encoded document, if it is already known"""
+        if self.URL is None or self._fullSave or len(self._patchStore) == 0 :
+            return False
+
+        def _noMerge(patch) :
+            for v in patch.values() :
+                if isinstance(v, PatchNode) :
+                    if not _noMerge(v) :
+                        return False
+                elif isinstance(v, dict) :
+                    # ArangoDB would merge it with the stored object instead of replacing it
+                    return False
+            return True
+
+        if not _noMerge(self._patchStore) :
+            return False
+
+        codec = self.connection.codec
+        if fullSize is None :
+            fullSize = len(codec.encode(self._store))
+        return len(codec.encode(self._patchStore)) <= self.savePatchRatio * fullSize
+
+    def _saveResponse(self, r) :
+        """updates the document according to ArangoDB's response to a save request. Returns the previous version of the document if ArangoDB sent it (returnOld)"""
+        update = self.URL is not None
+        data = r.json()
+
+        if (r.status_code == 201 or r.status_code == 202) and "error" not in data :
+            if update :
+                self._rev = data['_rev']
+            else :
+                self.setPrivates(data)
+                self.collection.missingDocuments.discard(self._key)
+            if "new" in data :
+                self._setNew(data["new"])
+        else :
+            if update :
+                self.collection._uncacheDocument(self._key)
+                raise UpdateError(data['errorMessage'], data)
+            else :
+                raise CreationError(data['errorMessage'], data)
+
+        self.modified = False
+        self._fullSave = False
+        self.collection._cacheDocument(self)
+        return data.get("old")
+
+    def _setNew(self, new) :
+        """replaces the fields of the document by those of 'new', the document as stored by ArangoDB"""
+        for v in self._store.values() :
+            detach(v)
+        new = dict(new)
+        for k in ("_id", "_rev", "_key") :
+            new.pop(k, None)
+        self._store = new
 
     def forceSave(self, **docArgs) :
-        "saves even if the document has not been modified since the last save"
+        "saves the whole document, even if it has not been modified since the last save. It is never downgraded to a patch"
         self.modified = True
-        self.save(**docArgs)
+        if self.URL is not None :
+            self._fullSave = True
+        return self.save(**docArgs)
 
     def saveCopy(self) :
         "saves a copy of the object and become that copy. returns a tuple (old _key, new _key)"
@@ -111,44 +190,78 @@ class Document(object) :
         return (old_key, self._key)
 
     def patch(self, keepNull = True, **docArgs) :
-        """Saves the document by only updating the modified fields.
-        The default behaviour concening the keepNull parameter is the opposite of ArangoDB's default, Null values won't be ignored
-        Use docArgs for things such as waitForSync = True"""
+        """Saves the document by only updating the modified fields, nested ones included: only the paths that changed are sent.
+        The default behaviour concening the keepNull parameter is the opposite of ArangoDB's default, Null values won't be ignored.
+        Fields removed from the document can't be patched away, if there are any the whole document is saved instead.
+        Use docArgs for things such as waitForSync = True, returnNew = True (to update the document with the version stored by ArangoDB) or returnOld = True (to get the previous version)"""
+
+        if self._fullSave and self.URL is not None :
+            return self.forceSave(**docArgs)
+
+        old = None
+        request = self._patchRequest(keepNull, docArgs)
+        if request is not None :
+            url, params, payload = request
+            r = self.connection.session.patch(url, params = params, data = payload)
+            old = self._patchResponse(r)
+
+        self._patchStore = {}
+        return old
 
+    def _patchRequest(self, keepNull, docArgs) :
+        """validates the modified fields and returns the url, parameters and payload of the request that patches the document. Returns None if there is nothing to patch"""
         if self.collection._validation['on_save'] :
             self.validate(patch = True)
 
         if self.URL is None :
             raise ValueError("Cannot patch a document that was not previously saved")
 
-        if len(self._patchStore) > 0 :
-            params = dict(docArgs)
-            params.update({'collection': self.collection.name, 'keepNull' : keepNull})
-            payload = json.dumps(self._patchStore)
+        if len(self._patchStore) == 0 :
+            return None
 
-            r = self.connection.session.patch(self.URL, params = params, data = payload)
-            data = r.json()
-            if (r.status_code == 201 or r.status_code == 202) and "error" not in data :
-                self._rev = data['_rev']
-            else :
-                raise UpdateError(data['errorMessage'], data)
+        params = dict(docArgs)
+        params.update({'collection': self.collection.name, 'keepNull' : keepNull})
+        return self.URL, params, self.connection.codec.encode(self._patchStore)
 
-            self.modified = False
+    def _patchResponse(self, r) :
+        """updates the document according to ArangoDB's response to a patch request. Returns the previous version of the document if ArangoDB sent it (returnOld)"""
+        data = r.json()
+        if (r.status_code == 201 or r.status_code == 202) and "error" not in data :
+            self._rev = data['_rev']
+            if "new" in data :
+                self._setNew(data["new"])
+        else :
+            self.collection._uncacheDocument(self._key)
+            raise UpdateError(data['errorMessage'], data)
 
-        self._patchStore = {}
+        self.modified = False
+        self.collection._cacheDocument(self)
+        return data.get("old")
+
+    def delete(self, **docArgs) :
+        """deletes the document from the database. Use docArgs for things such as waitForSync = True or returnOld = True, to get the deleted version of the document"""
+        url, params = self._deleteRequest(docArgs)
+        r = self.connection.session.delete(url, params = params)
+        return self._deleteResponse(r)
 
-    def delete(self) :
-        "deletes the document from the database"
+    def _deleteRequest(self, docArgs) :
+        """returns the url and parameters of the request that deletes the document"""
         if self.URL is None :
             raise DeletionError("Can't delete a document that was not saved")
-        r = self.connection.session.delete(self.URL)
+        return self.URL, dict(docArgs)
+
+    def _deleteResponse(self, r) :
+        """resets the document according to ArangoDB's response to a delete request. Returns the deleted version of the document if ArangoDB sent it (returnOld)"""
         data = r.json()
 
+        self.collection._uncacheDocument(self._key)
         if (r.status_code != 200 and r.status_code != 202) or 'error' in data :
             raise DeletionError(data['errorMessage'], data)
+        self.collection.missingDocuments.add(self._key)
         self.reset(self.collection)
 
         self.modified = True
+        return data.get("old")
 
     def validate(self, patch = False) :
         "validates either the whole store, or only the patch store( patch = True) of the document according to the collection's settings.If logErrors returns a dictionary of errros per field, else raises exceptions"
@@ -175,21 +288,26 @@ class Document(object) :
 
     def __getitem__(self, k) :
         """Document fields are accessed in a dictionary like fashion: doc[fieldName]. With the exceptions of private fiels (starting with '_')
-        that are accessed as object fields: doc._key"""
+        that are accessed as object fields: doc._key. Dictionaries and lists are returned wrapped, so that their modifications are tracked"""
         if self.collection._validation['allow_foreign_fields'] or self.collection.hasField(k) :
-            return self._store.get(k)
+            v = self._store.get(k)
+        else :
+            try :
+                v = self._store[k]
+            except KeyError :
+                raise KeyError("Document of collection '%s' has no field '%s', for a permissive behaviour set 'allow_foreign_fields' to True" % (self.collection.name, k))
 
-        try :
-            return self._store[k]
-        except KeyError :
-            raise KeyError("Document of collection '%s' has no field '%s', for a permissive behaviour set 'allow_foreign_fields' to True" % (self.collection.name, k))
+        w = track(v, self, (k, ))
+        if w is not v :
+            self._store[k] = w
+        return w
 
     def __setitem__(self, k, v) :
         """Documents work just like dictionaries doc[fieldName] = value. With the exceptions of private fiels (starting with '_')
         that are accessed as object fields: doc._key"""
 
         def _recValidate(k, v) :
-            if type(v) is dict :
+            if isinstance(v, dict) :
                 for kk, vv in v.items() :
                     newk = "%s.%s" % (k, kk)
                     _recValidate(newk, vv)
@@ -199,14 +317,47 @@ class Document(object) :
         if self.collection._validation['on_set'] :
             _recValidate(k, v)
 
-        self._store[k] = v
+        detach(self._store.get(k), v)
+        self._store[k] = track(v, self, (k, ))
         if self.URL is not None :
             self._patchStore[k] = self._store[k]
 
         self.modified = True
 
     def __delitem__(self, k) :
+        detach(self._store.get(k))
         del(self._store[k])
+        self._patchStore.pop(k, None)
+        self._nestedDeleted()
+
+    def _nestedChanged(self, path) :
+        """called by tracked dictionaries and lists, records the new value at 'path' (a tuple of field names) in the patch store"""
+        self.modified = True
+        if self.URL is None :
+            return
+
+        store, patch = self._store, self._patchStore
+        try :
+            for k in path[:-1] :
+                store = store[k]
+                node = patch.get(k)
+                if node is None :
+                    node = PatchNode()
+                    patch[k] = node
+                elif not isinstance(node, PatchNode) :
+                    # an ancestor is already patched as a whole
+                    return
+                patch = node
+            patch[path[-1]] = store[path[-1]]
+        except (KeyError, TypeError) :
+            # the container is no longer part of the document
+            return
+
+    def _nestedDeleted(self) :
+        """called when a field is removed, something a patch can't do: the whole document will be saved"""
+        self.modified = True
+        if self.URL is not None :
+            self._fullSave = True
 
     def __str__(self) :
         return "%s '%s': %s" % (self.typeName, self._id, repr(self._store))
@@ -218,6 +369,7 @@ class Edge(Document) :
     """An Edge document"""
     def __init__(self, edgeCollection, jsonFieldInit = {}) :
         self.reset(edgeCollection, jsonFieldInit)
+        registerDocument(self)
 
     def reset(self, edgeCollection, jsonFieldInit = {}) :
         Document.reset(self, edgeCollection, jsonFieldInit)
@@ -256,7 +408,7 @@ class Edge(Document) :
         if "_from" not in self._store or "_to" not in self._store :
             raise AttributeError("You must specify '_from' and '_to' attributes before saving. You can also use the function 'links()'")
 
-        Document.save(self, **edgeArgs)
+        return Document.save(self, **edgeArgs)
 
     def __getattr__(self, k) :
         if k == "_from" or k == "_to" :
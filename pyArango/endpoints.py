@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+
+__all__ = ["Endpoint", "EndpointBalancer"]
+
+class Endpoint(object) :
+    """A coordinator url with the statistics used to balance requests"""
+
+    def __init__(self, url) :
+        self.url = url
+        self.outstanding = 0
+        self.nbRequests = 0
+        self.nbFailures = 0
+        self.latency = None
+        self.healthy = True
+        self.failureTime = None
+
+    def toJson(self) :
+        return {
+            "url" : self.url,
+            "healthy" : self.healthy,
+            "outstanding" : self.outstanding,
+            "nbRequests" : self.nbRequests,
+            "nbFailures" : self.nbFailures,
+            "latency" : self.latency,
+        }
+
+    def __repr__(self) :
+        return "<Endpoint %s, healthy: %s, outstanding: %d, latency: %s>" % (self.url, self.healthy, self.outstanding, self.latency)
+
+class EndpointBalancer(object) :
+    """Distributes requests among several coordinators according to a strategy:
+
+        * 'round-robin': each endpoint in turn
+        * 'least-outstanding': the endpoint with the least requests in flight
+        * 'latency': a random endpoint, with a probability inversely proportional to its average latency
+
+    Endpoints that fail to answer are marked as unhealthy and are left aside for 'retryDelay' seconds.
+    Urls are built using the first endpoint and rewritten to target the chosen one"""
+
+    strategies = ("round-robin", "least-outstanding", "latency")
+
+    def __init__(self, urls, strategy = "round-robin", retryDelay = 30, smoothing = 0.2) :
+        if strategy not in self.strategies :
+            raise ValueError("Unknown load balancing strategy '%s', must be one of: %s" % (strategy, ", ".join(self.strategies)))
+        if len(urls) < 1 :
+            raise ValueError("At least one endpoint is needed")
+
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.retryDelay = retryDelay
+        self.smoothing = smoothing
+        self.nextIndex = 0
+        self.lock = threading.Lock()
+
+    @property
+    def primary(self) :
+        """the endpoint used to build urls"""
+        return self.endpoints[0]
+
+    def find(self, url) :
+        """returns the endpoint of url 'url'"""
+        for endpoint in self.endpoints :
+            if endpoint.url == url :
+                return endpoint
+        raise KeyError("Unknown endpoint: %s" % url)
+
+    def rewrite(self, url, endpoint) :
+        """returns 'url' targeting 'endpoint' instead of the primary endpoint"""
+        primary = self.primary.url
+        if endpoint is self.primary or not url.startswith(primary) :
+            return url
+        return endpoint.url + url[len(primary):]
+
+    def pick(self, exclude = ()) :
+        """chooses the endpoint of the next request among the healthy ones that are not in 'exclude'.
+        If none is healthy, the one that failed the longest time ago is returned"""
+        with self.lock :
+            now = time.time()
+            candidates = []
+            for endpoint in self.endpoints :
+                if endpoint in exclude :
+                    continue
+                if not endpoint.healthy and now - endpoint.failureTime > self.retryDelay :
+                    endpoint.healthy = True
+                if endpoint.healthy :
+                    candidates.append(endpoint)
+
+            if len(candidates) == 0 :
+                candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+                if len(candidates) == 0 :
+                    raise ValueError("No endpoint left to try")
+                return min(candidates, key = lambda endpoint : endpoint.failureTime)
+
+            if self.strategy == "round-robin" :
+                endpoint = candidates[self.nextIndex % len(candidates)]
+                self.nextIndex += 1
+            elif self.strategy == "least-outstanding" :
+                start = self.nextIndex % len(candidates)
+                self.nextIndex += 1
+                rotated = candidates[start:] + candidates[:start]
+                endpoint = min(rotated, key = lambda endpoint : endpoint.outstanding)
+            else :
+                endpoint = self._pickByLatency(candidates)
+
+            return endpoint
+
+    def _pickByLatency(self, candidates) :
+        known = [endpoint.latency for endpoint in candidates if endpoint.latency]
+        default = min(known) if len(known) > 0 else 1.
+        weights = [1. / (endpoint.latency or default) for endpoint in candidates]
+
+        r = random.random() * sum(weights)
+        for endpoint, weight in zip(candidates, weights) :
+            r -= weight
+            if r <= 0 :
+                return endpoint
+        return candidates[-1]
+
+    def start(self, endpoint) :
+        """must be called before sending a request to 'endpoint', returns the start time"""
+        with self.lock :
+            endpoint.outstanding += 1
+            endpoint.nbRequests += 1
+        return time.time()
+
+    def success(self, endpoint, startTime) :
+        """must be called when 'endpoint' answered a request"""
+        latency = time.time() - startTime
+        with self.lock :
+            endpoint.outstanding -= 1
+            endpoint.healthy = True
+            if endpoint.latency is None :
+                endpoint.latency = latency
+            else :
+                endpoint.latency += self.smoothing * (latency - endpoint.latency)
+
+    def failure(self, endpoint) :
+        """must be called when 'endpoint' could not be reached, marks it as unhealthy"""
+        with self.lock :
+            endpoint.outstanding -= 1
+            endpoint.nbFailures += 1
+            endpoint.healthy = False
+            endpoint.failureTime = time.time()
+
+    def getStats(self) :
+        """returns the statistics of all endpoints"""
+        with self.lock :
+            return [endpoint.toJson() for endpoint in self.endpoints]
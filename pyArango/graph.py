@@ -1,4 +1,3 @@
-import json
 from future.utils import with_metaclass
 
 from .theExceptions import (CreationError, DeletionError, UpdateError, TraversalError)
@@ -93,16 +92,28 @@ class Graph(with_metaclass(Graph_metaclass, object)) :
 
         self.URL = "%s/%s" % (self.database.graphsURL, self._key)
 
+    def _createdDocument(self, collectionName, data, field) :
+        """returns the document created by a vertex or edge creation request. It is built from the version returned by ArangoDB (returnNew),
+        servers that do not send it cost an additional request"""
+        collection = self.database[collectionName]
+        if "new" not in data :
+            return collection[data[field]["_key"]]
+
+        doc = collection.documentClass(collection, data["new"])
+        collection.missingDocuments.discard(doc._key)
+        collection._cacheDocument(doc)
+        return doc
+
     def createVertex(self, collectionName, docAttributes, waitForSync = False) :
         """adds a vertex to the graph and returns it"""
         url = "%s/vertex/%s" % (self.URL, collectionName)
         self.database[collectionName].validateDct(docAttributes)
 
-        r = self.connection.session.post(url, data = json.dumps(docAttributes), params = {'waitForSync' : waitForSync})
+        r = self.connection.session.post(url, data = self.connection.codec.encode(docAttributes), params = {'waitForSync' : waitForSync, 'returnNew' : True})
 
         data = r.json()
         if r.status_code == 201 or r.status_code == 202 :
-            return self.database[collectionName][data["vertex"]["_key"]]
+            return self._createdDocument(collectionName, data, "vertex")
 
         raise CreationError("Unable to create vertice, %s" % data["errorMessage"], data)
 
@@ -128,10 +139,10 @@ class Graph(with_metaclass(Graph_metaclass, object)) :
         payload = edgeAttributes
         payload.update({'_from' : _fromId, '_to' : _toId})
 
-        r = self.connection.session.post(url, data = json.dumps(payload), params = {'waitForSync' : waitForSync})
+        r = self.connection.session.post(url, data = self.connection.codec.encode(payload), params = {'waitForSync' : waitForSync, 'returnNew' : True})
         data = r.json()
         if r.status_code == 201 or r.status_code == 202 :
-            return self.database[collectionName][data["edge"]["_key"]]
+            return self._createdDocument(collectionName, data, "edge")
         raise CreationError("Unable to create edge, %s" % r.json()["errorMessage"], data)
 
     def link(self, definition, doc1, doc2, edgeAttributes, waitForSync = False) :
@@ -175,7 +186,7 @@ class Graph(with_metaclass(Graph_metaclass, object)) :
 
         payload.update(kwargs)
 
-        r = self.connection.session.post(url, data = json.dumps(payload))
+        r = self.connection.session.post(url, data = self.connection.codec.encode(payload))
         data = r.json()
         if r.status_code < 200 or r.status_code > 202 or data["error"] :
             raise TraversalError(data["errorMessage"], data)
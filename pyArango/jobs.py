@@ -0,0 +1,155 @@
+import time
+
+from .theExceptions import JobError
+
+__all__ = ["Job", "JobManager"]
+
+_PENDING = object()
+
+class Job(object) :
+    """An async job stored by ArangoDB (x-arango-async: store): the request returned immediately and the server runs it in the background.
+    result() waits for it and returns what the synchronous call would have returned, or raises its exception.
+    Jobs are created by the functions that accept asyncJob = True, or by Database.jobs.submit()"""
+
+    def __init__(self, manager, jobId, endpoint = None, resultFct = None) :
+        self.manager = manager
+        self.connection = manager.connection
+        self.id = jobId
+        self.endpoint = endpoint
+        self.resultFct = resultFct
+        self.URL = "%s/%s" % (manager.URL, jobId)
+
+        self._result = _PENDING
+        self._exception = None
+
+    @property
+    def done(self) :
+        "True once the result has been fetched"
+        return self._result is not _PENDING or self._exception is not None
+
+    def _setResponse(self, r) :
+        try :
+            if self.resultFct is None :
+                self._result = r.json()
+            else :
+                self._result = self.resultFct(r)
+        except Exception as e :
+            self._exception = e
+
+    def fetch(self) :
+        """fetches the result of the job if it is finished, ArangoDB then forgets the job. Returns True if the job is done"""
+        if self.done :
+            return True
+
+        r = self.connection.session.put(self.URL, endpoint = self.endpoint)
+        if r.status_code == 204 :
+            return False
+        if r.status_code == 404 and r.headers.get("x-arango-async-id") is None :
+            raise JobError("Unable to find job %s" % self.id, r.json())
+        self._setResponse(r)
+        return True
+
+    def poll(self) :
+        """returns True if the job is finished, without fetching its result"""
+        if self.done :
+            return True
+
+        r = self.connection.session.get(self.URL, endpoint = self.endpoint)
+        if r.status_code == 204 :
+            return False
+        if r.status_code == 200 :
+            return True
+        raise JobError("Unable to find job %s" % self.id, r.json())
+
+    def result(self, timeout = None, pollInterval = 0.05) :
+        """waits for the job to finish and returns its result, or raises its exception. Raises a JobError if it is still running after 'timeout' seconds"""
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.fetch() :
+            if deadline is not None and time.time() >= deadline :
+                raise JobError("Job %s is not finished after %s seconds" % (self.id, timeout))
+            time.sleep(pollInterval)
+
+        if self._exception is not None :
+            raise self._exception
+        return self._result
+
+    def cancel(self) :
+        "asks ArangoDB to cancel the job"
+        r = self.connection.session.put("%s/cancel" % self.URL, endpoint = self.endpoint)
+        if r.status_code != 200 :
+            raise JobError("Unable to cancel job %s" % self.id, r.json())
+        self._exception = JobError("Job %s was cancelled" % self.id)
+
+    def delete(self) :
+        "makes ArangoDB forget the job and its result"
+        r = self.connection.session.delete(self.URL, endpoint = self.endpoint)
+        if r.status_code != 200 :
+            raise JobError("Unable to delete job %s" % self.id, r.json())
+
+    def __repr__(self) :
+        return "[Job %s, done: %s]" % (self.id, self.done)
+
+class JobManager(object) :
+    """Manages the async jobs of a database, available as Database.jobs"""
+
+    def __init__(self, database) :
+        self.database = database
+        self.connection = database.connection
+        self.URL = "%s/job" % database.URL
+
+    def submit(self, method, url, resultFct = None, **requestArgs) :
+        """sends a request as an async job and returns its Job. resultFct(response) turns the response of the request into the result of the job,
+        by default its decoded json. Use requestArgs for the arguments of the request, such as params or data"""
+        headers = dict(requestArgs.pop("headers", None) or {})
+        headers["x-arango-async"] = "store"
+        fct = getattr(self.connection.session, method.lower())
+        r = fct(url, headers = headers, **requestArgs)
+
+        jobId = r.headers.get("x-arango-async-id")
+        if r.status_code != 202 or jobId is None :
+            raise JobError("Unable to create job for: %s %s" % (method.upper(), url), r.json())
+        return Job(self, jobId, r.endpoint, resultFct)
+
+    def _list(self, jobType, count, endpoint = None) :
+        params = {}
+        if count is not None :
+            params["count"] = count
+        r = self.connection.session.get("%s/%s" % (self.URL, jobType), params = params, endpoint = endpoint)
+        if r.status_code != 200 :
+            raise JobError("Unable to list %s jobs" % jobType, r.json())
+        return r.json()
+
+    def pending(self, count = None, endpoint = None) :
+        "returns the ids of the jobs that are still running (on the coordinator 'endpoint', if the requests are balanced)"
+        return self._list("pending", count, endpoint)
+
+    def finished(self, count = None, endpoint = None) :
+        "returns the ids of the jobs that are finished, whose results have not been fetched yet (on the coordinator 'endpoint', if the requests are balanced)"
+        return self._list("done", count, endpoint)
+
+    def wait(self, jobs, timeout = None, pollInterval = 0.05) :
+        """waits for several jobs at once: each round costs one request per coordinator to list the finished jobs, plus one per job that has just finished to fetch its result.
+        Returns a tuple (done, pending) of lists of jobs, pending is empty unless 'timeout' seconds have elapsed"""
+        deadline = None if timeout is None else time.time() + timeout
+        pending = [job for job in jobs if not job.done]
+        while len(pending) > 0 :
+            finished = {}
+            stillPending = []
+            for job in pending :
+                if job.endpoint not in finished :
+                    finished[job.endpoint] = set(str(jobId) for jobId in self.finished(endpoint = job.endpoint))
+                if str(job.id) not in finished[job.endpoint] or not job.fetch() :
+                    stillPending.append(job)
+            pending = stillPending
+
+            if len(pending) == 0 or (deadline is not None and time.time() >= deadline) :
+                break
+            time.sleep(pollInterval)
+
+        return [job for job in jobs if job.done], pending
+
+    def clear(self, jobType = "all") :
+        "deletes the results of jobs: 'all', or 'expired'"
+        r = self.connection.session.delete("%s/%s" % (self.URL, jobType))
+        if r.status_code != 200 :
+            raise JobError("Unable to delete %s jobs" % jobType, r.json())
@@ -0,0 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ["NegativeCache"]
+
+class NegativeCache(object) :
+    """Remembers, for 'ttl' seconds, the names or keys that were not found, so that repeated misses do not cost a request each.
+    At most 'maxSize' of them are kept, the oldest ones are forgotten first. A ttl of 0 disables the cache"""
+
+    def __init__(self, ttl = 0, maxSize = 10000, clock = time.time) :
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.clock = clock
+        self.store = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+
+    def add(self, key) :
+        "remembers that 'key' was not found"
+        if self.ttl <= 0 :
+            return
+        with self.lock :
+            self.store.pop(key, None)
+            self.store[key] = self.clock() + self.ttl
+            while len(self.store) > self.maxSize :
+                self.store.popitem(last = False)
+
+    def discard(self, key) :
+        "forgets 'key', must be called when it is created"
+        with self.lock :
+            self.store.pop(key, None)
+
+    def clear(self) :
+        "forgets everything"
+        with self.lock :
+            self.store.clear()
+
+    def __contains__(self, key) :
+        "returns True if 'key' was not found less than ttl seconds ago"
+        with self.lock :
+            expires = self.store.get(key)
+            if expires is None :
+                return False
+            if expires <= self.clock() :
+                del(self.store[key])
+                return False
+            self.hits += 1
+            return True
+
+    def __len__(self) :
+        return len(self.store)
+
+    def __repr__(self) :
+        return "[NegativeCache, ttl: %s, size: %d, hits: %d]" % (self.ttl, len(self.store), self.hits)
@@ -1,38 +1,119 @@
-import json
+import threading
+import weakref
 
 from future.utils import implements_iterator
 
+try :
+    import queue
+except ImportError :
+    import Queue as queue
+
 from .document import Document, Edge
-from .theExceptions import QueryError, AQLQueryError, SimpleQueryError, CreationError
+from .columns import ColumnBuilder
+from .theExceptions import QueryError, AQLQueryError, SimpleQueryError, CreationError, CursorError
 from . import consts as CONST
 
-__all__ = ["Query", "AQLQuery", "SimpleQuery", "Cursor", "RawCursor"]
+__all__ = ["Query", "AQLQuery", "SimpleQuery", "Cursor", "RawCursor", "PrefetchingCursor"]
 
 @implements_iterator
 class RawCursor(object) :
     "a raw interface to cursors that returns json"
-    def __init__(self, database, cursorId) :
+    def __init__(self, database, cursorId, endpoint = None) :
+        "'endpoint' is the coordinator that created the cursor, all requests concerning the cursor are sent to it"
         self.database = database
         self.connection = self.database.connection
         self.id = cursorId
+        self.endpoint = endpoint
         self.URL = "%s/cursor/%s" % (self.database.URL, self.id)
 
+    def _endpointArgs(self) :
+        if self.endpoint is None :
+            return {}
+        return {"endpoint" : self.endpoint}
+
     def __next__(self) :
         "returns the next batch"
-        r = self.connection.session.put(self.URL)
+        r = self.connection.session.put(self.URL, **self._endpointArgs())
+        return self._batchResponse(r)
+
+    def delete(self) :
+        "kills the cursor"
+        self.connection.session.delete(self.URL, **self._endpointArgs())
+
+    def _batchResponse(self, r) :
+        """returns the batch contained in ArangoDB's response"""
         data = r.json()
         if r.status_code == 400 :
             raise CursorError(data["errorMessage"], self.id, data)
-        return r.json()
+        return data
+
+def _prefetch(cursor, buffer, stop, owner) :
+    """fetches the batches of 'cursor' into 'buffer' until the last one, or until 'stop' is set or the PrefetchingCursor 'owner' is garbage collected"""
+    while True :
+        try :
+            item = (next(cursor), None)
+        except Exception as e :
+            item = (None, e)
+
+        while True :
+            if stop.is_set() or owner() is None :
+                return
+            try :
+                buffer.put(item, timeout = 0.1)
+                break
+            except queue.Full :
+                pass
+
+        batch, exception = item
+        if exception is not None or not batch.get("hasMore", False) :
+            return
+
+@implements_iterator
+class PrefetchingCursor(object) :
+    """Wraps a RawCursor and fetches up to 'prefetch' of the next batches on a background thread, while the current one is being consumed.
+    Batches are returned in order, and errors are raised by the call to next() that would have returned the failed batch"""
+    def __init__(self, cursor, prefetch) :
+        if prefetch < 1 :
+            raise ValueError("prefetch must be >= 1, got: %s" % prefetch)
+
+        self.cursor = cursor
+        self.id = cursor.id
+        self.buffer = queue.Queue(maxsize = prefetch)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target = _prefetch, args = (cursor, self.buffer, self.stop, weakref.ref(self)))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __next__(self) :
+        "returns the next batch"
+        batch, exception = self.buffer.get()
+        if exception is not None :
+            raise exception
+        return batch
+
+    def delete(self) :
+        "stops prefetching and kills the cursor"
+        self.stop.set()
+        self.thread.join()
+        self.cursor.delete()
 
 @implements_iterator
 class Query(object) :
     "This class is abstract and should not be instanciated. All query classes derive from it"
 
-    def __init__(self, request, database, rawResults) :
-        "If rawResults = True, the results will be returned as dictionaries instead of Document objects."
+    cursorClass = RawCursor
+    resultFormats = ("documents", "columns", "numpy")
+
+    def __init__(self, request, database, rawResults, prefetch = 0, resultFormat = "documents") :
+        """If rawResults = True, the results will be returned as dictionaries instead of Document objects.
+        If prefetch > 0, up to 'prefetch' batches are fetched in the background while the current one is consumed.
+        With resultFormat = 'columns' or 'numpy', iterating over the query returns every batch as a dictionary of columns (lists or NumPy arrays, see toColumns())"""
+
+        if resultFormat not in self.resultFormats :
+            raise ValueError("Unknown result format '%s', must be one of: %s" % (resultFormat, ", ".join(self.resultFormats)))
 
         self.rawResults = rawResults
+        self.resultFormat = resultFormat
         self.response = request.json()
         if self.response["error"] and self.response["errorMessage"] != "no match" :
             raise QueryError(self.response["errorMessage"], self.response)
@@ -50,7 +131,9 @@ class Query(object) :
                 pass
 
             if "hasMore" in self.response and self.response["hasMore"] :
-                self.cursor = RawCursor(self.database, self.id)
+                self.cursor = self.cursorClass(self.database, self.id, request.endpoint)
+                if prefetch > 0 :
+                    self.cursor = PrefetchingCursor(self.cursor, prefetch)
             else :
                 self.cursor = None
         elif request.status_code == 404 :
@@ -78,6 +161,11 @@ class Query(object) :
 
     def nextBatch(self) :
         "become the next batch. raises a StopIteration if there is None"
+        self._checkHasMore()
+        self.response = next(self.cursor)
+
+    def _checkHasMore(self) :
+        "moves the batch counters forward, raises a StopIteration if there are no more batches"
         self.batchNumber += 1
         self.currI = 0
         try :
@@ -86,14 +174,52 @@ class Query(object) :
         except KeyError :
             raise AQLQueryError(self.response["errorMessage"], self.query, self.response)
 
-        self.response = next(self.cursor)
-
     def delete(self) :
         "kills the cursor"
-        self.connection.session.delete(self.cursor)
+        if self.cursor is not None :
+            self.cursor.delete()
+
+    def _remainingRows(self) :
+        """returns the rows of the current batch that have not been consumed yet, as dictionaries"""
+        rows = []
+        for row in self.result[self.currI:] :
+            if isinstance(row, Document) :
+                doc = row
+                row = dict(doc._store)
+                row["_id"], row["_key"], row["_rev"] = doc._id, doc._key, doc._rev
+            rows.append(row)
+        self.currI = len(self.result)
+        return rows
+
+    def _nextColumns(self) :
+        while self.currI >= len(self.result) :
+            self.nextBatch()
+        builder = ColumnBuilder()
+        builder.addRows(self._remainingRows())
+        return builder.getColumns(arrays = self.resultFormat == "numpy")
+
+    def toColumns(self, numpy = None, fields = None) :
+        """consumes all the remaining results of the query and returns them as a dictionary {attribute : values}, without creating any Document.
+        Values are lists, or NumPy arrays if numpy = True (by default, if the query was created with resultFormat = 'numpy'): numeric attributes become typed arrays, all the others object arrays.
+        Missing values are None (NaN in numeric arrays) and results that are not documents are in the column None. 'fields' restricts the attributes returned"""
+        builder = ColumnBuilder(fields)
+        while True :
+            builder.addRows(self._remainingRows())
+            try :
+                self.nextBatch()
+            except StopIteration :
+                break
+
+        if numpy is None :
+            numpy = self.resultFormat == "numpy"
+        return builder.getColumns(arrays = numpy)
 
     def __next__(self) :
-        """returns the next element of the query result. Automatomatically calls for new batches if needed"""
+        """returns the next element of the query result. Automatomatically calls for new batches if needed.
+        If the result format is 'columns' or 'numpy', returns the next batch as columns"""
+        if self.resultFormat != "documents" :
+            return self._nextColumns()
+
         try :
             v = self[self.currI]
         except IndexError :
@@ -111,7 +237,7 @@ class Query(object) :
 
     def __getitem__(self, i) :
         "returns a ith result of the query."
-        if not self.rawResults and (self.result[i].__class__ is not Edge and self.result[i].__class__ is not Document) : 
+        if not self.rawResults and not isinstance(self.result[i], Document) :
             self._developDoc(i)
         return self.result[i]
 
@@ -131,15 +257,22 @@ class Query(object) :
 
 class AQLQuery(Query) :
     "AQL queries are attached to and instanciated by a database"
-    def __init__(self, database, query, batchSize, bindVars, options, count, fullCount, rawResults = True, **moreArgs) :
-        payload = {'query' : query, 'batchSize' : batchSize, 'bindVars' : bindVars, 'options' : options, 'count' : count, 'fullCount' : fullCount}
-        payload.update(moreArgs)
-
+    def __init__(self, database, query, batchSize, bindVars, options, count, fullCount, rawResults = True, prefetch = 0, resultFormat = "documents", request = None, **moreArgs) :
+        """'request' is the response of a request that already created the cursor (an async job), if it's None the query is sent"""
         self.query = query
         self.database = database
         self.connection = self.database.connection
-        request = self.connection.session.post(database.cursorsURL, data = json.dumps(payload))
-        Query.__init__(self, request, database, rawResults)
+        if request is None :
+            payload = self.getPayload(query, batchSize, bindVars, options, count, fullCount, moreArgs)
+            request = self.connection.session.post(database.cursorsURL, data = self.connection.codec.encode(payload))
+        Query.__init__(self, request, database, rawResults, prefetch, resultFormat)
+
+    @staticmethod
+    def getPayload(query, batchSize, bindVars, options, count, fullCount, moreArgs) :
+        """returns the payload that creates the cursor of a query"""
+        payload = {'query' : query, 'batchSize' : batchSize, 'bindVars' : bindVars, 'options' : options, 'count' : count, 'fullCount' : fullCount}
+        payload.update(moreArgs)
+        return payload
 
     def explain(self, allPlans = False) :
         """Returns an explanation of the query. Setting allPlans to True will result in ArangoDB returning all possible plans. False returns only the optimal plan"""
@@ -151,12 +284,19 @@ class AQLQuery(Query) :
 
 class Cursor(Query) :
     "Cursor queries are attached to and instanciated by a database, use them to continue from where you left"
-    def __init__(self, database, cursorId, rawResults) :
+    def __init__(self, database, cursorId, rawResults, endpoint = None, prefetch = 0, resultFormat = "documents") :
+        if resultFormat not in self.resultFormats :
+            raise ValueError("Unknown result format '%s', must be one of: %s" % (resultFormat, ", ".join(self.resultFormats)))
+
         self.rawResults = rawResults
+        self.resultFormat = resultFormat
+        self.currI = 0
         self._developed = set()
         self.batchNumber = 1
-        self.cursor = RawCursor(database, cursorId)
+        self.cursor = RawCursor(database, cursorId, endpoint)
         self.response = next(self.cursor)
+        if prefetch > 0 and self.response["hasMore"] :
+            self.cursor = PrefetchingCursor(self.cursor, prefetch)
 
     def _raiseInitFailed(self, request) :
         data = request.json()
@@ -165,18 +305,18 @@ class Cursor(Query) :
 
 class SimpleQuery(Query) :
     "Simple queries are attached to and instanciated by a collection"
-    def __init__(self, collection, queryType, rawResults, **queryArgs) :
+    def __init__(self, collection, queryType, rawResults, prefetch = 0, resultFormat = "documents", **queryArgs) :
 
         self.collection = collection
         self.connection = self.collection.database.connection
 
         payload = {'collection' : collection.name}
         payload.update(queryArgs)
-        payload = json.dumps(payload)
+        payload = self.connection.codec.encode(payload)
         URL = "%s/simple/%s" % (collection.database.URL, queryType)
         request = self.connection.session.put(URL, data = payload)
 
-        Query.__init__(self, request, collection.database, rawResults)
+        Query.__init__(self, request, collection.database, rawResults, prefetch, resultFormat)
 
     def _raiseInitFailed(self, request) :
         data = request.json()
@@ -0,0 +1,40 @@
+import random
+import time
+
+from pyArango.collection import DocumentCache
+
+# A little script to test the performances of the document cache: millions of random get/put/delete operations,
+# the time per operation should not depend on the size of the cache
+
+class DummyDoc(object) :
+    def __init__(self, key) :
+        self._key = key
+        self._store = {"name" : "Tesla-%d" % key, "number" : key}
+
+nbOperations = 2000000
+rand = random.Random(42)
+
+for cacheSize in (1000, 100000, 1000000) :
+    cache = DocumentCache(cacheSize, maxBytes = cacheSize * 300, ttl = 60)
+    keys = [rand.randint(0, 2 * cacheSize) for i in range(nbOperations)]
+    ops = [rand.random() for i in range(nbOperations)]
+
+    startTime = time.time()
+    for key, op in zip(keys, ops) :
+        if op < 0.6 :
+            try :
+                cache[key]
+            except KeyError :
+                cache.cache(DummyDoc(key))
+        elif op < 0.95 :
+            cache.cache(DummyDoc(key))
+        else :
+            try :
+                cache.delete(key)
+            except KeyError :
+                pass
+    took = time.time() - startTime
+
+    print ("cacheSize = %d" % cacheSize)
+    print ("avg, 1sc => ", float(nbOperations)/took, "operations")
+    print (cache.getStats())
@@ -0,0 +1,11 @@
+from pyArango.codec import JSONCodec
+
+class CountingCodec(JSONCodec) :
+    """A json codec that counts the responses it decodes, used by the tests and benchmarks to check that every response is decoded once"""
+
+    def __init__(self) :
+        self.nbDecodes = 0
+
+    def decode(self, data) :
+        self.nbDecodes += 1
+        return JSONCodec.decode(self, data)
@@ -0,0 +1,61 @@
+import time
+
+from pyArango.connection import *
+from pyArango.tests.countingcodec import CountingCodec
+
+# A little script to measure the cost of reading a cursor: time, number of decodes per batch and memory
+
+try :
+    import tracemalloc
+except ImportError :
+    tracemalloc = None
+
+codec = CountingCodec()
+conn = Connection(username="root", password="root", codec = codec)
+
+print ("Creating db...")
+try :
+    db = conn.createDatabase(name = "test_db_2")
+except :
+    print ("DB already exists")
+db = conn["test_db_2"]
+
+try :
+    collection = db.createCollection(name = "users")
+except :
+    print ("Collection already exists")
+
+collection = db["users"]
+collection.truncate()
+
+nbUsers = 100000
+batchSize = 1000
+
+print ("Saving users...")
+users = ({"name" : "Tesla-%d" % i, "number" : i, "species" : "human"} for i in range(nbUsers))
+collection.saveMany(users, batchSize = batchSize)
+
+for rawResults, prefetch in ((True, 0), (False, 0), (False, 2)) :
+    codec.nbDecodes = 0
+    if tracemalloc is not None :
+        tracemalloc.start()
+
+    startTime = time.time()
+    query = db.AQLQuery("FOR u IN users RETURN u", batchSize = batchSize, rawResults = rawResults, prefetch = prefetch)
+    nbDocs = 0
+    for doc in query :
+        nbDocs += 1
+    took = time.time() - startTime
+
+    nbBatches = query.batchNumber
+    print ("rawResults = %s, prefetch = %d: %d documents in %d batches" % (rawResults, prefetch, nbDocs, nbBatches))
+    print ("avg, 1sc => ", float(nbDocs)/took, "documents")
+    print ("decodes per batch =>", float(codec.nbDecodes)/nbBatches)
+    if tracemalloc is not None :
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print ("peak memory =>", peak, "bytes")
+
+print ("Cleaning up...")
+collection.delete()
+print ("Done...")
@@ -48,6 +48,16 @@ for i in range(nbUsers) :
 took = time.time() - startTime
 print ("avg, 1sc => ", float(nbUsers)/took, "saves")
 
+print ("Saving the same users in batches...")
+collection.truncate()
+startTime = time.time()
+
+users = ({"name" : "Tesla-%d" % i, "number" : i, "species" : "human"} for i in range(nbUsers))
+collection.saveMany(users, batchSize = 1000)
+
+took = time.time() - startTime
+print ("avg, 1sc => ", float(nbUsers)/took, "batched saves")
+
 print ("Cleaning up...")
 
 db["users"].delete()
@@ -1,11 +1,15 @@
 import unittest, copy
 import os
+import sys
+import time
 
 from pyArango.connection import *
 from pyArango.database import *
 from pyArango.collection import *
 from pyArango.document import *
 from pyArango.query import *
+from pyArango.tracking import *
+import pyArango.columns
 from pyArango.graph import *
 from pyArango.users import *
 from pyArango.consts import *
@@ -57,6 +61,94 @@ class pyArangoTests(unittest.TestCase):
             doc.save()
         return collection
 
+    # @unittest.skip("stand by")
+    def test_connection_pool(self) :
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, poolMaxsize = 8, prewarm = 4)
+        stats = conn.getPoolStats()
+        self.assertEqual(stats["poolMaxsize"], 8)
+        self.assertTrue(stats["connectionsOpened"] >= 4)
+        self.assertTrue(stats["idleConnections"] >= 4)
+        self.assertEqual(stats["inFlight"], 0)
+        conn.disconnectSession()
+
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, keepAliveTimeout = 0.05)
+        conn.reload()
+        poolManager = conn.session.adapter.poolmanager
+        pools = [poolManager.pools.get(key) for key in poolManager.pools.keys()]
+        time.sleep(0.1)
+        conn.reload()
+        self.assertEqual([poolManager.pools.get(key) for key in poolManager.pools.keys()], pools)
+        conn.disconnectSession()
+
+    # @unittest.skip("stand by")
+    def test_connection_load_balancing(self) :
+        self.createManyUsers(20)
+        unreachable = "http://127.0.0.1:1"
+        conn = Connection(arangoURL = [self.conn.arangoURL, unreachable], username = self.conn.username, password = self.conn.password, loadBalancing = "round-robin")
+        q = conn["test_db_2"].AQLQuery("FOR u IN users RETURN u", batchSize = 2, rawResults = True)
+        self.assertEqual(len(list(q)), 20)
+
+        stats = dict((e["url"], e) for e in conn.getEndpointStats())
+        self.assertFalse(stats[unreachable]["healthy"])
+        self.assertTrue(stats[self.conn.arangoURL]["healthy"])
+        self.assertEqual(stats[unreachable]["nbRequests"], stats[unreachable]["nbFailures"])
+        conn.disconnectSession()
+
+    # @unittest.skip("stand by")
+    def test_connection_codec(self) :
+        from pyArango.codec import getCodec
+
+        value = {"name" : u"Tesla \u00e9", "numbers" : [1, 2.5, None, True]}
+        for name in ("json", "auto") :
+            codec = getCodec(name)
+            self.assertTrue(isinstance(codec.encode(value), bytes))
+            self.assertEqual(codec.decode(codec.encode(value)), value)
+        self.assertRaises(KeyError, getCodec, "no_codec_by_that_name")
+        self.assertEqual(getCodec(u"json").name, "json")
+
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, codec = "auto")
+        collection = conn["test_db_2"].createCollection(name = "lala")
+        doc = collection.createDocument(value)
+        doc.save()
+        self.assertEqual(collection.fetchDocument(doc._key)["name"], value["name"])
+        conn.disconnectSession()
+
+    # @unittest.skip("stand by")
+    def test_response_decoded_once(self) :
+        from pyArango.tests.countingcodec import CountingCodec
+
+        codec = CountingCodec()
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, codec = codec)
+        collection = conn["test_db_2"].createCollection(name = "users")
+        collection.saveMany([{"number" : i} for i in range(100)])
+
+        r = conn.session.get(collection.URL)
+        self.assertTrue(r.json() is r.json())
+
+        try :
+            import tracemalloc
+        except ImportError :
+            tracemalloc = None
+        if tracemalloc is not None :
+            r = conn.session.get(collection.URL)
+            tracemalloc.start()
+            try :
+                r.json()
+                decoded = tracemalloc.get_traced_memory()[0]
+                for i in range(100) :
+                    r.json()
+                # decoding allocates, the following calls must not
+                self.assertTrue(decoded > 0)
+                self.assertTrue(tracemalloc.get_traced_memory()[0] - decoded < decoded / 10)
+            finally :
+                tracemalloc.stop()
+
+        codec.nbDecodes = 0
+        query = conn["test_db_2"].AQLQuery("FOR u IN users RETURN u", batchSize = 10, rawResults = True)
+        self.assertEqual(len([u for u in query]), 100)
+        self.assertEqual(codec.nbDecodes, 10)
+        conn.disconnectSession()
+
     # @unittest.skip("stand by")
     def test_collection_create_delete(self) :
         col = self.db.createCollection(name = "to_be_erased")
@@ -124,6 +216,123 @@ class pyArangoTests(unittest.TestCase):
         doc.delete()
         self.assertTrue(doc.URL is None)
 
+    # @unittest.skip("stand by")
+    def test_collection_save_many(self) :
+        collection = self.db.createCollection(name = "lala")
+        docs = []
+        for i in range(10) :
+            doc = collection.createDocument()
+            doc["number"] = i
+            docs.append(doc)
+        docs.append({"_key" : "dict_doc", "number" : 10})
+        docs.append({"_key" : "dict_doc", "number" : 11})
+
+        results = collection.saveMany(docs, batchSize = 3)
+        self.assertEqual(len(results), 12)
+        self.assertEqual(11, collection.count())
+        for doc, res in zip(docs[:10], results[:10]) :
+            self.assertFalse(doc.URL is None)
+            self.assertEqual(doc._key, res["_key"])
+            self.assertEqual(collection[doc._key]["number"], doc["number"])
+        self.assertTrue("error" not in results[10])
+        self.assertTrue(results[11]["error"])
+
+    # @unittest.skip("stand by")
+    def test_collection_import_bulk(self) :
+        import tempfile
+        collection = self.db.createCollection(name = "lala")
+
+        results = collection.importBulk(({"number" : i} for i in range(25)), chunkSize = 10)
+        self.assertEqual([res["created"] for res in results], [10, 10, 5])
+        self.assertEqual(25, collection.count())
+
+        fd, path = tempfile.mkstemp(suffix = ".jsonl")
+        with os.fdopen(fd, "w") as f :
+            f.write('{"_key": "k1", "number": 1}\n{"_key": "k2", "number": 2}\n\n{"_key": "k1", "number": 3}\n')
+        try :
+            results = collection.importBulk(path, chunkSize = 10, onDuplicate = "ignore")
+        finally :
+            os.remove(path)
+        self.assertEqual(results[0]["created"], 2)
+        self.assertEqual(results[0]["ignored"], 1)
+        self.assertEqual(collection["k1"]["number"], 1)
+
+    # @unittest.skip("stand by")
+    def test_collection_import_bulk_parallel(self) :
+        collection = self.db.createCollection(name = "lala")
+        res = collection.importBulkParallel(({"number" : i} for i in range(1000)), chunkSize = 50, maxWorkers = 4)
+        self.assertEqual(len(res.chunks), 20)
+        self.assertEqual(res.created, 1000)
+        self.assertEqual(res.nbDocuments, 1000)
+        self.assertEqual(len(res.failures), 0)
+        self.assertEqual(sum(w.nbDocuments for w in res.workers.values()), 1000)
+        self.assertEqual(1000, collection.count())
+
+        from pyArango.bulk import ParallelImporter
+        class DyingImporter(ParallelImporter) :
+            def _work(self, name, session, tasks, params, result, lock) :
+                session.disconnect()
+                raise RuntimeError("worker died")
+
+        importer = DyingImporter(collection, maxWorkers = 2)
+        params = collection._importParams("error", False, False, {})
+        self.assertRaises(CreationError, importer.run, collection._importChunks(({"number" : i} for i in range(1000)), 10), params)
+
+    @unittest.skipIf(sys.version_info < (3, 5), "asyncio support requires python >= 3.5")
+    def test_async_document_and_query(self) :
+        import asyncio
+        try :
+            from pyArango.aio import AsyncConnection, AsyncDocument
+        except ImportError :
+            self.skipTest("aiohttp is not installed")
+
+        self.createManyUsers(20)
+        loop = asyncio.new_event_loop()
+        run = loop.run_until_complete
+        conn = AsyncConnection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password)
+        try :
+            run(conn.connect())
+            db = run(conn.getDatabase("test_db_2"))
+            users = db["users"]
+
+            docs = [users.createDocument({"number" : 100 + i}) for i in range(10)]
+            tasks = [loop.create_task(doc.save()) for doc in docs]
+            run(asyncio.wait(tasks))
+            for task in tasks :
+                task.result()
+            self.assertEqual(run(users.count()), 30)
+
+            doc = run(users.fetchDocument(docs[0]._key))
+            self.assertTrue(isinstance(doc, AsyncDocument))
+            doc["name"] = "Tesla-async"
+            run(doc.patch())
+            self.assertEqual(self.db["users"][doc._key]["name"], "Tesla-async")
+            run(doc.delete())
+            self.assertEqual(run(users.count()), 29)
+
+            doc = users.createDocument({"number" : 1000})
+            run(doc.save())
+            oldKey, newKey = run(doc.saveCopy())
+            self.assertNotEqual(oldKey, newKey)
+            self.assertEqual(run(users.count()), 31)
+            run(doc.delete())
+            run(run(users.fetchDocument(oldKey)).delete())
+            for name in ("session", "beginTransaction", "createGraph", "jobs") :
+                self.assertFalse(hasattr(db, name))
+
+            query = run(db.AQLQuery("FOR u IN users RETURN u", batchSize = 4))
+            nb = 0
+            while True :
+                try :
+                    self.assertTrue(isinstance(run(query.__anext__()), AsyncDocument))
+                except StopAsyncIteration :
+                    break
+                nb += 1
+            self.assertEqual(nb, 29)
+        finally :
+            run(conn.disconnect())
+            loop.close()
+
     # @unittest.skip("stand by")
     def test_document_fetch_by_key(self) :
         collection = self.db.createCollection(name = "lala")
@@ -178,6 +387,63 @@ class pyArangoTests(unittest.TestCase):
         self.assertEqual(len(q.result), 1)
         self.assertEqual(q[0], 'Tesla-3')
 
+    # @unittest.skip("stand by")
+    def test_query_prefetch(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.saveMany([{"number" : i} for i in range(100)])
+
+        expected = [u["number"] for u in self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 10, rawResults = True)]
+        query = self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 10, rawResults = True, prefetch = 2)
+        time.sleep(0.5)
+        self.assertTrue(query.cursor.buffer.qsize() <= 2)
+        self.assertEqual([u["number"] for u in query], expected)
+
+        query = collection.fetchAll(batchSize = 10, prefetch = 3)
+        self.assertEqual(sorted(u["number"] for u in query), list(range(100)))
+
+        query = self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 10, rawResults = True, prefetch = 1)
+        next(query)
+        query.delete()
+        self.assertFalse(query.cursor.thread.is_alive())
+
+    # @unittest.skip("stand by")
+    def test_query_columns(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.saveMany([{"number" : i, "name" : "Tesla-%d" % i} for i in range(25)])
+        collection.createDocument({"name" : "no number"}).save()
+
+        batches = list(self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 10, resultFormat = "columns"))
+        self.assertEqual([len(b["name"]) for b in batches], [10, 10, 6])
+
+        columns = self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 10).toColumns(fields = ["number", "name"])
+        self.assertEqual(sorted(columns.keys()), ["name", "number"])
+        self.assertEqual(len(columns["number"]), 26)
+        self.assertEqual(sorted(columns["number"], key = lambda n : -1 if n is None else n), [None] + list(range(25)))
+
+        columns = self.db.AQLQuery("FOR u IN users RETURN u.name", batchSize = 10).toColumns()
+        self.assertEqual(list(columns.keys()), [None])
+        self.assertEqual(len(columns[None]), 26)
+
+        self.assertRaises(ValueError, collection.fetchAll, resultFormat = "rows")
+
+        builder = pyArango.columns.ColumnBuilder()
+        builder.addRows([{"a" : 1}, {"b" : 2}, "c", {"a" : 4}])
+        self.assertEqual(builder.getColumns(), {"a" : [1, None, None, 4], "b" : [None, 2, None, None], None : [None, None, "c", None]})
+
+    @unittest.skipIf(pyArango.columns.numpy is None, "requires numpy")
+    def test_query_columns_numpy(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.saveMany([{"number" : i, "name" : "Tesla-%d" % i} for i in range(25)])
+
+        columns = collection.fetchAll(batchSize = 10).toColumns(numpy = True)
+        self.assertEqual(columns["number"].dtype.kind, "i")
+        self.assertEqual(columns["number"].sum(), sum(range(25)))
+        self.assertEqual(columns["name"].dtype, object)
+
+        columns = collection.fetchAll(batchSize = 10, resultFormat = "numpy").toColumns()
+        self.assertEqual(columns["number"].dtype.kind, "i")
+        self.assertEqual(type(collection.fetchAll(batchSize = 10, resultFormat = "numpy").toColumns(numpy = False)["number"]), list)
+
     # @unittest.skip("stand by")
     def test_aql_query_rawResults_false(self) :
         self.createManyUsers(100)
@@ -387,6 +653,644 @@ class pyArangoTests(unittest.TestCase):
         self.assertEqual(cache.head._key, doc._key)
         self.assertEqual(cache.getChain(), [5, 9, 8, 7, 6])
 
+    # @unittest.skip("stand by")
+    def test_document_cache_write_through(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.activateCache(10)
+
+        doc = collection.createDocument({"name" : "Tesla"})
+        doc.save()
+        self.assertTrue(doc._key in collection.documentCache)
+
+        other = collection.fetchDocument(doc._key)
+        other["name"] = "Nikola"
+        other.patch()
+        self.assertEqual(collection[doc._key]["name"], "Nikola")
+        self.assertEqual(collection[doc._key]._rev, other._rev)
+
+        other["name"] = "Tesla"
+        other.save()
+        self.assertEqual(collection[doc._key]._rev, other._rev)
+
+        key = other._key
+        other.delete()
+        self.assertFalse(key in collection.documentCache)
+        self.assertRaises(KeyError, collection.__getitem__, key)
+
+        docs = [collection.createDocument({"number" : i}) for i in range(3)]
+        collection.saveMany(docs)
+        self.assertEqual(len(collection.documentCache), 3)
+        collection.truncate()
+        self.assertEqual(len(collection.documentCache), 0)
+
+    # @unittest.skip("stand by")
+    def test_document_cache_revalidation(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.activateCache(10, ttl = 10, revalidate = True)
+        now = [0.]
+        collection.documentCache.clock = lambda : now[0]
+
+        doc = collection.createDocument({"name" : "Tesla"})
+        doc.save()
+
+        now[0] = 20
+        self.assertTrue(collection[doc._key] is collection.documentCache[doc._key])
+        self.assertFalse(collection.documentCache.isStale(collection.documentCache[doc._key]))
+
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password)
+        other = conn["test_db_2"]["users"].fetchDocument(doc._key)
+        other["name"] = "Nikola"
+        other.patch()
+        conn.disconnectSession()
+
+        now[0] = 40
+        self.assertEqual(collection[doc._key]["name"], "Nikola")
+
+        stats = collection.documentCache.getStats()
+        self.assertEqual((stats["notModified"], stats["modified"]), (1, 1))
+
+        # stale documents are still in a revalidating cache, and renewed with their own ttl
+        collection.documentCache.cache(collection.documentCache[doc._key].document, ttl = 100)
+        now[0] = 200
+        self.assertTrue(doc._key in collection.documentCache)
+        collection[doc._key]
+        self.assertEqual(collection.documentCache[doc._key].expires, 300)
+
+        from pyArango.negativecache import NegativeCache
+        collection.missingDocuments = NegativeCache(60)
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password)
+        conn["test_db_2"]["users"].fetchDocument(doc._key).delete()
+        conn.disconnectSession()
+
+        now[0] = 400
+        self.assertRaises(KeyError, collection.__getitem__, doc._key)
+        self.assertFalse(doc._key in collection.documentCache)
+        self.assertTrue(doc._key in collection.missingDocuments)
+        stats = collection.documentCache.getStats()
+        self.assertEqual((stats["notModified"], stats["modified"]), (2, 1))
+
+    # @unittest.skip("stand by")
+    def test_fetch_documents(self) :
+        collection = self.db.createCollection(name = "users")
+        collection.saveMany([{"_key" : "k%d" % i, "number" : i} for i in range(20)])
+
+        keys = ["k5", "nope", "k3", "k5", "k19"]
+        docs, missing = collection.fetchDocuments(keys, rawResults = True)
+        self.assertEqual([d["number"] for d in docs], [5, 3, 5, 19])
+        self.assertEqual(missing, ["nope"])
+
+        collection.activateCache(100)
+        collection.fetchDocument("k3")
+        nbRequests = self.conn.session.log["nb_request"]
+        docs, missing = collection.fetchDocuments(keys, batchSize = 2)
+        self.assertEqual(self.conn.session.log["nb_request"] - nbRequests, 2)
+        self.assertEqual([d._key for d in docs], ["k5", "k3", "k5", "k19"])
+        self.assertTrue("k19" in collection.documentCache)
+        self.assertEqual(set(type(d) for d in docs), set([Document]))
+
+        docs, missing = self.db.fetchDocuments(["users/k1", "users/nope", "nocollection/k1", "users/k0"])
+        self.assertEqual([d["number"] for d in docs], [1, 0])
+        self.assertEqual(missing, ["users/nope", "nocollection/k1"])
+
+    # @unittest.skip("stand by")
+    def test_fetch_coalescing(self) :
+        import threading
+        from pyArango.coalescing import Coalescer
+
+        def runThreads(fct, args) :
+            results = {}
+            def run(arg) :
+                try :
+                    results[arg] = fct(arg)
+                except KeyError as e :
+                    results[arg] = e
+            threads = [threading.Thread(target = run, args = (arg, )) for arg in args]
+            for thread in threads :
+                thread.start()
+            for thread in threads :
+                thread.join()
+            return results
+
+        nbFetches = [0]
+        def slowFetch(key) :
+            nbFetches[0] += 1
+            time.sleep(0.2)
+            return {"_key" : key}
+
+        coalescer = Coalescer(slowFetch)
+        results = runThreads(lambda i : coalescer.fetch("hot"), range(10))
+        self.assertEqual(nbFetches[0], 1)
+        self.assertEqual(len(set(id(r) for r in results.values())), 10)
+
+        collection = self.db.createCollection(name = "users")
+        collection.saveMany([{"_key" : "k%d" % i, "number" : i} for i in range(10)])
+        collection.activateCoalescing(window = 0.1)
+        nbRequests = self.conn.session.log["nb_request"]
+        results = runThreads(collection.fetchDocument, ["k%d" % i for i in range(10)] + ["nope"])
+        self.assertTrue(self.conn.session.log["nb_request"] - nbRequests < 5)
+        self.assertEqual(results["k7"]["number"], 7)
+        self.assertTrue(isinstance(results["nope"], KeyError))
+
+    # @unittest.skip("stand by")
+    def test_negative_cache(self) :
+        conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, negativeCacheTTL = 60)
+        db = conn["test_db_2"]
+        collection = db.createCollection(name = "users")
+
+        log = conn.session.log
+        self.assertRaises(KeyError, collection.fetchDocument, "nope")
+        nbRequests = log["nb_request"]
+        for i in range(10) :
+            self.assertRaises(KeyError, collection.fetchDocument, "nope")
+            self.assertRaises(KeyError, db.__getitem__, "no_collection")
+            self.assertRaises(KeyError, conn.__getitem__, "no_db")
+        self.assertEqual(log["nb_request"] - nbRequests, 3)
+
+        doc = collection.createDocument()
+        doc._key = "nope"
+        doc.save()
+        self.assertEqual(collection.fetchDocument("nope")._key, "nope")
+        doc.delete()
+        nbRequests = log["nb_request"]
+        self.assertRaises(KeyError, collection.fetchDocument, "nope")
+        self.assertEqual(log["nb_request"], nbRequests)
+
+        db.createCollection(name = "no_collection")
+        self.assertEqual(db["no_collection"].name, "no_collection")
+        conn.disconnectSession()
+
+    # @unittest.skip("stand by")
+    def test_unit_of_work(self) :
+        users = self.db.createCollection(name = "users")
+        users.saveMany([{"_key" : "k%d" % i, "number" : i} for i in range(5)])
+
+        log = self.conn.session.log
+        nbRequests = log["nb_request"]
+        with self.db.session() as session :
+            docs = [users.fetchDocument("k%d" % i) for i in range(3)]
+            for doc in docs :
+                doc["number"] = -doc["number"]
+            session.delete(users.fetchDocument("k4"))
+            new = [users.createDocument({"number" : 10 + i}) for i in range(3)]
+            self.assertEqual(new[0]._key, None)
+        self.assertEqual(log["nb_request"] - nbRequests, 4 + 3)
+
+        self.assertEqual(len(session.results), 7)
+        self.assertEqual(session.errors, [])
+        self.assertEqual(sorted(op for doc, op, res in session.results), ["delete"] + ["insert"] * 3 + ["patch"] * 3)
+        self.assertTrue(new[0]._key is not None)
+        self.assertEqual(users.fetchDocument("k2")["number"], -2)
+        self.assertRaises(KeyError, users.fetchDocument, "k4")
+        self.assertEqual(users.count(), 7)
+
+        try :
+            with self.db.session() as session :
+                users.createDocument({"number" : 100})
+                raise ValueError("rollback")
+        except ValueError :
+            pass
+        self.assertEqual(users.count(), 7)
+
+        users.activateCache(10)
+        users["k0"], users["k1"]
+        with self.db.session() as session :
+            self.db["users"]["k0"]["number"] = 1000
+            docs, missing = users.fetchDocuments(["k1"])
+            docs[0]["number"] = 1001
+        self.assertEqual(sorted(op for doc, op, res in session.results), ["patch"] * 2)
+        self.assertEqual(users.fetchDocument("k0")["number"], 1000)
+        self.assertEqual(users.fetchDocument("k1")["number"], 1001)
+
+    # @unittest.skip("stand by")
+    def test_write_behind(self) :
+        users = self.db.createCollection(name = "users")
+        errors = []
+        queue = users.activateWriteBehind(maxSize = 50, batchSize = 20, maxLatency = 0.05, nbWorkers = 2, onError = lambda doc, error : errors.append(doc))
+
+        docs = []
+        for i in range(200) :
+            doc = users.createDocument({"number" : i, "bio" : "b" * 1000})
+            doc.save()
+            docs.append(doc)
+        for i in range(2) :
+            doc = users.createDocument()
+            doc._key = "dup"
+            doc.save()
+
+        queue.flush()
+        self.assertEqual(users.count(), 201)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(all(doc._key is not None for doc in docs))
+        self.assertTrue(queue.getStats()["batches"] >= 10)
+
+        docs[0]["number"] = -1
+        self.assertFalse(docs[0]._fullSave)
+        requests = self.conn.session.log["requests"]
+        nbPatches = requests.get("patch", 0)
+        docs[0].save()
+        self.assertEqual(requests.get("patch", 0) - nbPatches, 1)
+        self.assertEqual(users.fetchDocument(docs[0]._key)["number"], -1)
+
+        users.createDocument({"number" : 1000}).save()
+        users.deactivateWriteBehind()
+        self.assertEqual(users.count(), 202)
+        self.assertRaises(ValueError, queue.put, {})
+
+        # saving a queued document again updates its snapshot, changes made after it are not lost
+        queue = users.activateWriteBehind(batchSize = 100, maxLatency = 0.2)
+        doc = users.createDocument({"number" : 1})
+        doc.save()
+        doc["number"] = 2
+        doc.save()
+        doc["number"] = 3
+        queue.flush()
+        self.assertEqual(users.fetchDocument(doc._key)["number"], 2)
+        self.assertTrue(doc.modified)
+        self.assertTrue(doc._fullSave)
+        doc.save()
+        self.assertEqual(users.fetchDocument(doc._key)["number"], 3)
+        self.assertEqual(queue.getStats()["written"], 1)
+        users.deactivateWriteBehind()
+
+    # @unittest.skip("stand by")
+    def test_update_replace_delete_many(self) :
+        users = self.db.createCollection(name = "users")
+        users.saveMany([{"_key" : "k%d" % i, "number" : i, "name" : "n"} for i in range(10)])
+
+        docs = [users.fetchDocument("k%d" % i) for i in range(3)]
+        stale = users.fetchDocument("k0")
+        for doc in docs :
+            doc["number"] = 100
+
+        log = self.conn.session.log
+        nbRequests = log["nb_request"]
+        results = users.updateMany(docs + [{"_key" : "k3", "number" : 103}, {"_key" : "nope", "number" : 0}], batchSize = 2)
+        self.assertEqual(log["nb_request"] - nbRequests, 3)
+        self.assertEqual([bool(res.get("error")) for res in results], [False] * 4 + [True])
+        self.assertEqual(docs[0]._rev, results[0]["_rev"])
+        self.assertEqual(docs[0]._patchStore, {})
+        self.assertEqual(users.fetchDocument("k3")["number"], 103)
+        self.assertEqual(users.fetchDocument("k3")["name"], "n")
+
+        stale["number"] = -1
+        results = users.updateMany([stale], checkRevs = True)
+        self.assertEqual(results[0]["errorNum"], 1200)
+        self.assertEqual(users.fetchDocument("k0")["number"], 100)
+
+        results = users.replaceMany([{"_key" : "k4", "other" : 1}])
+        self.assertFalse(results[0].get("error"))
+        self.assertEqual(users.fetchDocument("k4")["number"], None)
+        self.assertEqual(users.fetchDocument("k4")["other"], 1)
+
+        results = users.deleteMany([stale], checkRevs = True)
+        self.assertEqual(results[0]["errorNum"], 1200)
+        results = users.deleteMany([docs[0], {"_key" : "k5"}, "k6", "nope"])
+        self.assertEqual([bool(res.get("error")) for res in results], [False] * 3 + [True])
+        self.assertEqual(docs[0]._key, None)
+        self.assertEqual(users.count(), 7)
+
+    # @unittest.skip("stand by")
+    def test_stream_transaction(self) :
+        users = self.db.createCollection(name = "users")
+
+        with self.db.beginTransaction(write = ["users"]) as trx :
+            users.createDocument({"name" : "a"}).save()
+            self.assertEqual(trx.status, "running")
+        self.assertEqual(trx.status, "committed")
+        self.assertEqual(users.count(), 1)
+
+        try :
+            with self.db.beginTransaction(write = ["users"]) as trx :
+                users.createDocument({"name" : "b"}).save()
+                users.saveMany([{"name" : "c"}])
+                raise ValueError("abort")
+        except ValueError :
+            pass
+        self.assertEqual(trx.status, "aborted")
+        self.assertEqual(users.count(), 1)
+
+        trx = self.db.beginTransaction(write = ["users"])
+        users.createDocument({"name" : "d"}).save()
+        trx.abort()
+        self.assertEqual(trx.getStatus(), "aborted")
+        self.assertEqual(users.count(), 1)
+
+        users.saveMany([{"_key" : "dup"}, {"_key" : "k1", "number" : 1}, {"_key" : "k2"}])
+        from pyArango.negativecache import NegativeCache
+        users.missingDocuments = NegativeCache(60)
+        try :
+            with self.db.session(transaction = True) as session :
+                new = users.createDocument({"name" : "e"})
+                patched = users.fetchDocument("k1")
+                patched["number"] = 2
+                deleted = users.fetchDocument("k2")
+                session.delete(deleted)
+                doc = users.createDocument()
+                doc._key = "dup"
+            self.fail("the transaction should have been aborted")
+        except TransactionError :
+            pass
+        self.assertEqual(users.count(), 4)
+
+        # the documents are as they were before the session, it can be retried
+        self.assertEqual((new._key, new.modified), (None, True))
+        self.assertEqual(patched._patchStore, {"number" : 2})
+        self.assertEqual(deleted._key, "k2")
+        self.assertFalse("k2" in users.missingDocuments)
+        with self.db.session(transaction = True) as session :
+            session.add(new)
+            session.add(patched)
+            session.delete(deleted)
+        self.assertEqual(users.fetchDocument("k1")["number"], 2)
+        self.assertRaises(KeyError, users.fetchDocument, "k2")
+        self.assertEqual(users.count(), 4)
+
+        queue = users.activateWriteBehind(maxLatency = 10)
+        users.activateCoalescing(window = 0.01)
+        trx = self.db.beginTransaction(write = ["users"])
+        doc = users.createDocument({"_key" : "wb"})
+        doc.save()
+        self.assertTrue(doc.URL is not None)
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(users.fetchDocument("wb")._key, "wb")
+        self.assertEqual(users.coalescer.nbCalls, 0)
+        trx.abort()
+        users.deactivateWriteBehind()
+        users.deactivateCoalescing()
+        self.assertEqual(users.count(), 4)
+        self.assertRaises(KeyError, users.fetchDocument, "wb")
+
+    # @unittest.skip("stand by")
+    def test_async_jobs(self) :
+        users = self.db.createCollection(name = "users")
+        users.saveMany([{"number" : i} for i in range(10)])
+
+        job = self.db.AQLQuery("FOR u IN users RETURN u", batchSize = 3, rawResults = True, asyncJob = True)
+        query = job.result(timeout = 10)
+        self.assertEqual(sorted(doc["number"] for doc in query), list(range(10)))
+        self.assertTrue(job.done)
+
+        jobs = [users.action("GET", "count", asyncJob = True) for i in range(3)]
+        done, pending = self.db.jobs.wait(jobs, timeout = 10)
+        self.assertEqual(len(done), 3)
+        self.assertEqual(pending, [])
+        self.assertEqual([job.result()["count"] for job in jobs], [10] * 3)
+
+        users.activateCache(10)
+        doc = users.fetchDocument(query[0]["_key"])
+        job = users.truncate(asyncJob = True)
+        users.documentCache.cache(doc)
+        job.result(timeout = 10)
+        self.assertEqual(users.count(), 0)
+        self.assertEqual(len(users.documentCache), 0)
+
+    # @unittest.skip("stand by")
+    def test_batch(self) :
+        users = self.db.createCollection(name = "users")
+        users.saveMany([{"_key" : "k%d" % i, "number" : i} for i in range(10)])
+        doc = users.fetchDocument("k0")
+        doc["number"] = -1
+
+        with self.conn.batch() as batch :
+            count = batch.call(users.count)
+            docs = [batch.call(users.fetchDocument, "k%d" % i) for i in range(1, 5)]
+            missing = batch.call(users.fetchDocument, "nope")
+            patch = batch.call(doc.patch)
+            self.assertFalse(count.done)
+        self.assertEqual(batch.nbRequests, 1)
+        self.assertEqual(count.result(), 10)
+        self.assertEqual([d.result()["number"] for d in docs], [1, 2, 3, 4])
+        self.assertRaises(KeyError, missing.result)
+        patch.result()
+        self.assertEqual(users.fetchDocument("k0")["number"], -1)
+
+        count = batch.call(users.count)
+        self.assertEqual(count.result(), 10)
+        self.assertEqual(batch.nbRequests, 2)
+
+        users.activateCoalescing(window = 0.1)
+        users.activateWriteBehind(maxLatency = 10)
+        new = users.createDocument({"_key" : "new"})
+        with self.conn.batch() as batch :
+            docs = [batch.call(users.fetchDocument, "k1") for i in range(2)]
+            saved = batch.call(new.save)
+        self.assertEqual([d.result()["number"] for d in docs], [1, 1])
+        saved.result()
+        self.assertEqual(new._key, "new")
+        self.assertEqual(len(users.writeBehind), 0)
+        users.deactivateWriteBehind()
+        users.deactivateCoalescing()
+
+        other = self.conn.arangoURL.replace("127.0.0.1", "localhost") if "127.0.0.1" in self.conn.arangoURL else self.conn.arangoURL.replace("localhost", "127.0.0.1")
+        conn = Connection(arangoURL = [self.conn.arangoURL, other], username = self.conn.username, password = self.conn.password)
+        url = conn["test_db_2"]["users"].URL + "/count"
+        with conn.batch() as batch :
+            counts = [batch.call(conn.session.get, url, endpoint = endpoint) for endpoint in (other, self.conn.arangoURL, other)]
+        self.assertEqual(batch.nbRequests, 2)
+        self.assertEqual([c.result().endpoint for c in counts], [other, self.conn.arangoURL, other])
+        self.assertEqual([c.result().json()["count"] for c in counts], [11] * 3)
+        conn.disconnectSession()
+
+    # @unittest.skip("stand by")
+    def test_compression(self) :
+        self.assertRaises(ValueError, Connection, arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, compression = "lz4")
+
+        for compression in ("gzip", "deflate") :
+            conn = Connection(arangoURL = self.conn.arangoURL, username = self.conn.username, password = self.conn.password, compression = compression, compressionThreshold = 512)
+            self.assertEqual(conn.session.session.headers["Accept-Encoding"], "gzip, deflate")
+            users = conn["test_db_2"].createCollection(name = "users_%s" % compression)
+
+            stats = conn.getTransferStats()
+            users.saveMany([{"_key" : "k%d" % i, "bio" : "b" * 200} for i in range(50)])
+            after = conn.getTransferStats()
+            sent, sentWire = after["bytesSent"] - stats["bytesSent"], after["bytesSentWire"] - stats["bytesSentWire"]
+            self.assertTrue(sentWire < sent / 10)
+            self.assertEqual(users.fetchDocument("k49")["bio"], "b" * 200)
+
+            stats = conn.getTransferStats()
+            users.fetchDocument("k0", rawResults = True)
+            after = conn.getTransferStats()
+            self.assertEqual(after["bytesSent"], stats["bytesSent"])
+            self.assertTrue(after["bytesReceived"] > stats["bytesReceived"])
+            self.assertTrue(after["bytesReceivedWire"] > stats["bytesReceivedWire"])
+
+    # @unittest.skip("stand by")
+    def test_nested_patch(self) :
+        users = self.db.createCollection(name = "users")
+        doc = users.createDocument({"name" : "a", "address" : {"city" : "Paris", "geo" : {"lat" : 1, "lng" : 2}}, "tags" : ["x"], "items" : [{"n" : 1}], "bio" : "b" * 1000})
+        doc.save()
+
+        doc["address"]["geo"]["lat"] = 10
+        doc["tags"].append("y")
+        doc["items"][0]["n"] = 5
+        self.assertEqual(doc._patchStore, {"address" : {"geo" : {"lat" : 10}}, "tags" : ["x", "y"], "items" : [{"n" : 5}]})
+        self.assertTrue(isinstance(doc._patchStore["address"]["geo"], PatchNode))
+        self.assertTrue(doc._canPatch())
+        doc.save()
+        self.assertEqual(doc._patchStore, {})
+
+        fetched = users.fetchDocument(doc._key)
+        self.assertEqual(fetched["address"], {"city" : "Paris", "geo" : {"lat" : 10, "lng" : 2}})
+        self.assertEqual(fetched["tags"], ["x", "y"])
+        self.assertEqual(fetched["items"], [{"n" : 5}])
+
+        address = doc["address"]
+        doc["address"] = {"city" : "Lyon"}
+        address["city"] = "Rome"
+        self.assertEqual(doc._patchStore, {"address" : {"city" : "Lyon"}})
+        self.assertFalse(doc._canPatch())
+        doc.save()
+        self.assertEqual(users.fetchDocument(doc._key)["address"], {"city" : "Lyon"})
+
+        del(doc["address"]["city"])
+        self.assertTrue(doc._fullSave)
+        doc.patch()
+        self.assertFalse(doc._fullSave)
+        self.assertEqual(users.fetchDocument(doc._key)["address"], {})
+        self.assertEqual(copy.deepcopy(doc["tags"]).__class__, list)
+
+        doc = users.fetchDocument(doc._key)
+        self.assertEqual(doc._patchStore, {})
+        doc["name"] = "b"
+        doc.set({"tags" : ["z"]})
+        doc.save()
+        fetched = users.fetchDocument(doc._key)
+        self.assertEqual((fetched["name"], fetched["tags"]), ("b", ["z"]))
+
+        requests = self.conn.session.log["requests"]
+        nbPuts = requests.get("put", 0)
+        doc["name"] = "c"
+        doc.forceSave()
+        self.assertEqual(requests.get("put", 0) - nbPuts, 1)
+        self.assertEqual(users.fetchDocument(doc._key)["name"], "c")
+
+        doc = users.fetchDocument(doc._key)
+        doc["address"] = {"city" : "Paris"}
+        doc.save()
+        doc["address"] = doc["address"]
+        tags = doc["tags"]
+        doc["tags"] = tags
+        doc.save()
+        doc["address"]["city"] = "Oslo"
+        tags.append("w")
+        self.assertTrue(doc.modified)
+        self.assertEqual(doc._patchStore, {"address" : {"city" : "Oslo"}, "tags" : ["z", "w"]})
+        doc.save()
+        fetched = users.fetchDocument(doc._key)
+        self.assertEqual((fetched["address"], fetched["tags"]), ({"city" : "Oslo"}, ["z", "w"]))
+
+        other = users.createDocument({"name" : "d"})
+        other.save()
+        other["address"] = doc["address"]
+        other["tags"] = doc["tags"]
+        other["address"]["city"] = "Nice"
+        other["tags"].append("v")
+        self.assertEqual(doc._patchStore, {})
+        self.assertFalse(doc.modified)
+        self.assertEqual(other._patchStore, {"address" : {"city" : "Nice"}, "tags" : ["z", "w", "v"]})
+        other.save()
+        self.assertEqual(users.fetchDocument(other._key)["address"], {"city" : "Nice"})
+
+    # @unittest.skip("stand by")
+    def test_return_new_old(self) :
+        users = self.db.createCollection(name = "users")
+        doc = users.createDocument({"name" : "a", "number" : 1})
+        self.assertEqual(doc.save(returnNew = True), None)
+        self.assertEqual(doc["name"], "a")
+
+        log = self.conn.session.log
+        doc["number"] = 2
+        old = doc.patch(returnNew = True, returnOld = True)
+        self.assertEqual(old["number"], 1)
+        self.assertEqual(old["_key"], doc._key)
+        self.assertEqual(doc["number"], 2)
+        self.assertFalse("_rev" in doc._store)
+
+        doc["number"] = 3
+        old = doc.forceSave(returnOld = True)
+        self.assertEqual(old["number"], 2)
+
+        key = doc._key
+        nbRequests = log["nb_request"]
+        old = doc.delete(returnOld = True)
+        self.assertEqual(log["nb_request"] - nbRequests, 1)
+        self.assertEqual(old["number"], 3)
+        self.assertEqual(old["_key"], key)
+        self.assertEqual(doc._key, None)
+
+    # @unittest.skip("stand by")
+    def test_document_cache_limits(self) :
+        class DummyDoc(object) :
+            def __init__(self, key, size = 0) :
+                self._key = key
+                self.size = size
+
+        now = [0.]
+        cache = DocumentCache(100, maxBytes = 1000, ttl = 10, sizeOf = lambda doc : doc.size, clock = lambda : now[0])
+        for i in range(5) :
+            cache.cache(DummyDoc(i, 300))
+        self.assertEqual(cache.getChain(), [4, 3, 2])
+        self.assertEqual(cache.nbBytes, 900)
+        self.assertEqual(cache.evictions, 2)
+
+        cache.cache(DummyDoc(3, 50), ttl = 100)
+        now[0] = 20
+        self.assertRaises(KeyError, cache.__getitem__, 4)
+        self.assertEqual(cache[3].size, 50)
+        self.assertFalse(2 in cache)
+
+        stats = cache.getStats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["expirations"]), (1, 1, 1))
+        self.assertEqual(stats["bytes"], 350)
+
+    # @unittest.skip("stand by")
+    def test_document_cache_stress(self) :
+        import random
+        from collections import OrderedDict
+
+        class DummyDoc(object) :
+            def __init__(self, key) :
+                self._key = key
+
+        rand = random.Random(42)
+        now = [0.]
+        cache = DocumentCache(500, maxBytes = 40000, ttl = 50, sizeOf = lambda doc : 50 + doc._key % 100, clock = lambda : now[0])
+        model = OrderedDict()
+        nbBytes = 0
+        for i in range(300000) :
+            now[0] += 0.001
+            key = rand.randint(0, 2000)
+            op = rand.random()
+            if op < 0.5 :
+                entry = model.pop(key, None)
+                if entry is not None and entry[1] > now[0] :
+                    model[key] = entry
+                    self.assertEqual(cache[key]._key, key)
+                else :
+                    if entry is not None :
+                        nbBytes -= entry[0]
+                    self.assertRaises(KeyError, cache.__getitem__, key)
+            elif op < 0.9 :
+                cache.cache(DummyDoc(key))
+                if key in model :
+                    nbBytes -= model.pop(key)[0]
+                model[key] = (50 + key % 100, now[0] + 50)
+                nbBytes += model[key][0]
+                while len(model) > 500 or nbBytes > 40000 :
+                    nbBytes -= model.popitem(last = False)[1][0]
+            else :
+                if key in model :
+                    nbBytes -= model.pop(key)[0]
+                    cache.delete(key)
+                else :
+                    self.assertRaises(KeyError, cache.delete, key)
+
+            if i % 10000 == 0 :
+                self.assertEqual(cache.getChain(), list(reversed(model)))
+                self.assertEqual(cache.nbBytes, nbBytes)
+
+        self.assertEqual(cache.getChain(), list(reversed(model)))
+
     # @unittest.skip("stand by")
     def test_validation_default_settings(self) :
 
@@ -534,6 +1438,8 @@ class pyArangoTests(unittest.TestCase):
         h2 = g.createVertex('Humans', {"name" : "simba2"})
         h3 = g.createVertex('Humans', {"name" : "simba3"})
         h4 = g.createVertex('Humans', {"name" : "simba4"})
+        self.assertEqual(h4["name"], "simba4")
+        self.assertEqual(h4.collection.name, "Humans")
 
         g.link('Friend', h1, h3, {})
         g.link('Friend', h2, h3, {})
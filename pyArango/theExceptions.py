@@ -87,6 +87,11 @@ class TransactionError(pyArangoException) :
         message = "Error in: %s.\n->%s" % (action, message)
         pyArangoException.__init__(self, message, errors)
 
+class JobError(pyArangoException) :
+    """Something went wrong with an async job"""
+    def __init__(self, message, errors = {}) :
+        pyArangoException.__init__(self, message, errors)
+
 class AbstractInstanciationError(Exception) :
     """Raised when someone tries to instanciate an abstract class"""
     def __init__(self, cls) :
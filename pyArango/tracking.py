@@ -0,0 +1,224 @@
+import copy
+
+__all__ = ["TrackedDict", "TrackedList", "PatchNode", "track"]
+
+class PatchNode(dict) :
+    """A nested object of a patch that only contains the fields that changed, ArangoDB merges it with the stored object"""
+
+def track(value, document, path, replaced = False) :
+    """wraps 'value' into a TrackedDict or a TrackedList if it is a dict or a list, returns it as is otherwise.
+    A tracked container that belongs to another document or path is wrapped again, so that its changes are reported to 'document' only"""
+    if isinstance(value, TrackedDict) :
+        if value._document is document and value._path == path and value._replaced == replaced :
+            return value
+        return TrackedDict(value, document, path, replaced)
+    if isinstance(value, TrackedList) :
+        if value._document is document and value._path == path :
+            return value
+        return TrackedList(value, document, path)
+    if type(value) is dict :
+        return TrackedDict(value, document, path, replaced)
+    if type(value) is list :
+        return TrackedList(value, document, path)
+    return value
+
+def detach(value, new = None) :
+    "stops 'value' from reporting changes to its document, if it is a tracked container that is not replaced by itself ('new')"
+    if value is not new and isinstance(value, (TrackedDict, TrackedList)) :
+        value._document = None
+
+class TrackedDict(dict) :
+    """A dictionary nested in a document that reports its changes to the document: the path of every modified field is recorded in the patch store of the document.
+    Removing a field can't be expressed by a patch, the whole document will then have to be saved. If 'replaced' is True (for dictionaries inside lists),
+    any change is reported as a change of the value at 'path' as a whole"""
+
+    __slots__ = ("_document", "_path", "_replaced")
+
+    def __init__(self, value, document, path, replaced = False) :
+        dict.__init__(self, value)
+        self._document = document
+        self._path = path
+        self._replaced = replaced
+
+    def _wrap(self, k, v) :
+        if self._replaced :
+            return track(v, self._document, self._path, True)
+        return track(v, self._document, self._path + (k, ))
+
+    def _changed(self, k) :
+        if self._document is None :
+            return
+        if self._replaced :
+            self._document._nestedChanged(self._path)
+        else :
+            self._document._nestedChanged(self._path + (k, ))
+
+    def _deleted(self) :
+        if self._document is None :
+            return
+        if self._replaced :
+            self._document._nestedChanged(self._path)
+        else :
+            self._document._nestedDeleted()
+
+    def __getitem__(self, k) :
+        v = dict.__getitem__(self, k)
+        w = self._wrap(k, v)
+        if w is not v :
+            dict.__setitem__(self, k, w)
+        return w
+
+    def get(self, k, default = None) :
+        if k in self :
+            return self[k]
+        return default
+
+    def __setitem__(self, k, v) :
+        detach(dict.get(self, k), v)
+        dict.__setitem__(self, k, self._wrap(k, v))
+        self._changed(k)
+
+    def __delitem__(self, k) :
+        detach(dict.get(self, k))
+        dict.__delitem__(self, k)
+        self._deleted()
+
+    def pop(self, k, *default) :
+        if k not in self :
+            return dict.pop(self, k, *default)
+        v = dict.pop(self, k)
+        detach(v)
+        self._deleted()
+        return v
+
+    def popitem(self) :
+        k, v = dict.popitem(self)
+        detach(v)
+        self._deleted()
+        return k, v
+
+    def clear(self) :
+        if len(self) > 0 :
+            for v in dict.values(self) :
+                detach(v)
+            dict.clear(self)
+            self._deleted()
+
+    def update(self, *args, **kwargs) :
+        for k, v in dict(*args, **kwargs).items() :
+            self[k] = v
+
+    def setdefault(self, k, default = None) :
+        if k not in self :
+            self[k] = default
+        return self[k]
+
+    def values(self) :
+        return [self[k] for k in self]
+
+    def items(self) :
+        return [(k, self[k]) for k in self]
+
+    def __copy__(self) :
+        return dict(self)
+
+    def __deepcopy__(self, memo) :
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self) :
+        return (dict, (dict(self), ))
+
+class TrackedList(list) :
+    """A list nested in a document that reports its changes to the document. ArangoDB can't patch parts of a list, any change is reported as a change
+    of the whole list"""
+
+    __slots__ = ("_document", "_path")
+
+    def __init__(self, value, document, path) :
+        list.__init__(self, value)
+        self._document = document
+        self._path = path
+
+    def _changed(self) :
+        if self._document is not None :
+            self._document._nestedChanged(self._path)
+
+    def __getitem__(self, i) :
+        if isinstance(i, slice) :
+            return list.__getitem__(self, i)
+        v = list.__getitem__(self, i)
+        w = track(v, self._document, self._path, True)
+        if w is not v :
+            list.__setitem__(self, i, w)
+        return w
+
+    def __iter__(self) :
+        for i in range(len(self)) :
+            yield self[i]
+
+    def __setitem__(self, i, v) :
+        list.__setitem__(self, i, v)
+        self._changed()
+
+    def __delitem__(self, i) :
+        list.__delitem__(self, i)
+        self._changed()
+
+    def __setslice__(self, i, j, v) :
+        list.__setslice__(self, i, j, v)
+        self._changed()
+
+    def __delslice__(self, i, j) :
+        list.__delslice__(self, i, j)
+        self._changed()
+
+    def __iadd__(self, v) :
+        list.__iadd__(self, v)
+        self._changed()
+        return self
+
+    def __imul__(self, n) :
+        list.__imul__(self, n)
+        self._changed()
+        return self
+
+    def append(self, v) :
+        list.append(self, v)
+        self._changed()
+
+    def extend(self, v) :
+        list.extend(self, v)
+        self._changed()
+
+    def insert(self, i, v) :
+        list.insert(self, i, v)
+        self._changed()
+
+    def pop(self, *args) :
+        v = list.pop(self, *args)
+        self._changed()
+        return v
+
+    def remove(self, v) :
+        list.remove(self, v)
+        self._changed()
+
+    def reverse(self) :
+        list.reverse(self)
+        self._changed()
+
+    def sort(self, *args, **kwargs) :
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def clear(self) :
+        del self[:]
+
+    def __copy__(self) :
+        return list(self)
+
+    def __deepcopy__(self, memo) :
+        return copy.deepcopy(list(self), memo)
+
+    def __reduce__(self) :
+        return (list, (list(self), ))
@@ -0,0 +1,139 @@
+import threading
+
+from .theExceptions import TransactionError
+
+__all__ = ["StreamTransaction", "getActiveTransaction"]
+
+_local = threading.local()
+
+def _activeTransactions() :
+    try :
+        return _local.transactions
+    except AttributeError :
+        _local.transactions = []
+        return _local.transactions
+
+def getActiveTransaction(url) :
+    """returns the innermost transaction running in the current thread on the database that 'url' belongs to, or None.
+    Used by sessions to add the transaction header to the requests"""
+    transactions = getattr(_local, "transactions", None)
+    if not transactions :
+        return None
+
+    for trx in reversed(transactions) :
+        if url.startswith(trx.databaseURL) :
+            return trx
+    return None
+
+class StreamTransaction(object) :
+    """A server-side stream transaction (ArangoDB >= 3.5), created by Database.beginTransaction(). Once begun, every request the current thread sends to the
+    database (documents saves, patches and deletes, bulk operations, AQL queries...) is part of the transaction, until it is committed or aborted.
+    Used as a context manager, it is committed at the end of the with block, or aborted if the block raises an exception::
+
+        with db.beginTransaction(write = ["users"]) as trx :
+            db["users"].createDocument({"name" : "edison"}).save()
+            db.AQLQuery("FOR u IN users UPDATE u WITH {checked : true} IN users")
+
+    Aborting the transaction does not restore the Document objects (except those of a unit of work, see Database.session()), the caches of their collections are emptied"""
+
+    def __init__(self, database, read = None, write = None, exclusive = None, waitForSync = False, allowImplicit = True, lockTimeout = None, maxTransactionSize = None) :
+        self.database = database
+        self.connection = database.connection
+        self.databaseURL = database.URL + "/"
+        self.collections = {"read" : read or [], "write" : write or [], "exclusive" : exclusive or []}
+        self.waitForSync = waitForSync
+        self.allowImplicit = allowImplicit
+        self.lockTimeout = lockTimeout
+        self.maxTransactionSize = maxTransactionSize
+
+        self.id = None
+        self.endpoint = None
+        self.status = None
+
+    @property
+    def URL(self) :
+        return "%s/%s" % (self.database.transactionURL, self.id)
+
+    def begin(self) :
+        """starts the transaction on the server and makes it the active transaction of the current thread"""
+        if self.id is not None :
+            raise ValueError("Transaction %s has already begun" % self.id)
+
+        payload = {
+            "collections" : self.collections,
+            "waitForSync" : self.waitForSync,
+            "allowImplicit" : self.allowImplicit
+        }
+        if self.lockTimeout is not None :
+            payload["lockTimeout"] = self.lockTimeout
+        if self.maxTransactionSize is not None :
+            payload["maxTransactionSize"] = self.maxTransactionSize
+
+        r = self.connection.session.post("%s/begin" % self.database.transactionURL, data = self.connection.codec.encode(payload))
+        data = r.json()
+        if r.status_code != 201 or data.get("error") :
+            raise TransactionError(data["errorMessage"], "begin", data)
+
+        self.id = data["result"]["id"]
+        self.status = data["result"]["status"]
+        # stream transactions live on the coordinator that created them
+        self.endpoint = r.endpoint
+        _activeTransactions().append(self)
+
+    def _end(self, method, action) :
+        if self.id is None :
+            raise ValueError("Transaction has not begun")
+
+        transactions = _activeTransactions()
+        if self in transactions :
+            transactions.remove(self)
+
+        r = getattr(self.connection.session, method)(self.URL, endpoint = self.endpoint)
+        data = r.json()
+        if r.status_code != 200 or data.get("error") :
+            raise TransactionError(data["errorMessage"], action, data)
+        self.status = data["result"]["status"]
+
+    def commit(self) :
+        "commits the transaction"
+        self._end("put", "commit")
+
+    def abort(self) :
+        "aborts the transaction and empties the document caches and the caches of missing documents of the collections it wrote to"
+        try :
+            self._end("delete", "abort")
+        finally :
+            for name in self.collections["write"] + self.collections["exclusive"] :
+                try :
+                    collection = self.database.collections[name]
+                except KeyError :
+                    continue
+                if collection.documentCache is not None :
+                    collection.documentCache.clear()
+                collection.missingDocuments.clear()
+
+    def getStatus(self) :
+        "asks ArangoDB for the status of the transaction: 'running', 'committed' or 'aborted'"
+        r = self.connection.session.get(self.URL, endpoint = self.endpoint)
+        data = r.json()
+        if r.status_code != 200 or data.get("error") :
+            raise TransactionError(data["errorMessage"], "status", data)
+        self.status = data["result"]["status"]
+        return self.status
+
+    def __enter__(self) :
+        if self.id is None :
+            self.begin()
+        return self
+
+    def __exit__(self, excType, excValue, traceback) :
+        if self.status != "running" :
+            return False
+        if excType is None :
+            self.commit()
+        else :
+            self.abort()
+        return False
+
+    def __repr__(self) :
+        return "[StreamTransaction %s: %s]" % (self.id, self.status)
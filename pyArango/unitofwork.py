@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+
+from .theExceptions import TransactionError
+
+__all__ = ["UnitOfWork", "registerDocument"]
+
+_local = threading.local()
+
+# the attributes of a Document that saves, updates and deletes change
+_DOCUMENT_STATE = ("_id", "_key", "_rev", "URL", "_store", "_patchStore", "_fullSave", "modified")
+
+def _activeUnits() :
+    try :
+        return _local.units
+    except AttributeError :
+        _local.units = []
+        return _local.units
+
+def registerDocument(doc) :
+    """registers 'doc' into the innermost unit of work of its database that is active in the current thread, if any. Called by Documents when they are created"""
+    units = getattr(_local, "units", None)
+    if not units :
+        return
+
+    database = doc.collection.database
+    for unit in reversed(units) :
+        if unit.database is database :
+            unit.add(doc)
+            return
+
+class UnitOfWork(object) :
+    """Tracks the Documents created or loaded by the current thread while it is active (use Database.session() as a context manager), and saves them all when it ends:
+    new documents are inserted, the modified fields of the others are patched (or the whole documents replaced if fields were removed) and those passed to delete() are deleted. The requests are grouped by collection,
+    each one sending up to 'batchSize' documents. If the with block raises an exception, nothing is saved.
+    The outcome of every operation is available in 'results' as a list of (document, operation, result), where operation is 'insert', 'patch', 'replace' or 'delete'
+    and result the dictionary returned by ArangoDB for that document.
+    If 'transaction' is True, the operations are sent inside a stream transaction, which is aborted if any of them fails: a TransactionError is then raised
+    and the Documents are restored to their state before the flush, as if nothing had been sent"""
+
+    def __init__(self, database, batchSize = 1000, keepNull = True, waitForSync = False, transaction = False) :
+        self.database = database
+        self.batchSize = batchSize
+        self.keepNull = keepNull
+        self.waitForSync = waitForSync
+        self.transaction = transaction
+        self.documents = OrderedDict()
+        self.deleted = OrderedDict()
+        self.results = []
+
+    def add(self, doc) :
+        "tracks 'doc', it will be inserted at the end if it has never been saved"
+        if id(doc) not in self.documents :
+            self.documents[id(doc)] = (doc, doc.URL is None)
+
+    def delete(self, doc) :
+        "deletes 'doc' at the end of the unit of work"
+        self.add(doc)
+        self.deleted[id(doc)] = doc
+
+    @property
+    def errors(self) :
+        "the results of the operations that failed"
+        return [res for res in self.results if res[2].get("error")]
+
+    def _operations(self) :
+        """returns the documents to insert, patch, replace and delete, grouped by collection"""
+        operations = OrderedDict()
+        for docId, (doc, isNew) in self.documents.items() :
+            if docId in self.deleted :
+                if doc.URL is None :
+                    continue
+                operation = "delete"
+            elif doc.URL is None :
+                if not isNew :
+                    continue
+                operation = "insert"
+            elif doc._fullSave :
+                operation = "replace"
+            elif len(doc._patchStore) > 0 :
+                operation = "patch"
+            else :
+                continue
+
+            collection = doc.collection
+            if collection.name not in operations :
+                operations[collection.name] = (collection, {"insert" : [], "patch" : [], "replace" : [], "delete" : []})
+            operations[collection.name][1][operation].append(doc)
+        return operations
+
+    def flush(self) :
+        """sends all pending operations and returns their results. Called when the unit of work ends"""
+        operations = self._operations()
+        if self.transaction and len(operations) > 0 :
+            states = self._documentStates(operations)
+            trx = self.database.beginTransaction(write = list(operations.keys()))
+            try :
+                results = self._send(operations)
+                errors = [res for res in results if res[2].get("error")]
+                if len(errors) > 0 :
+                    raise TransactionError("%d operations failed, the transaction was aborted" % len(errors), "session", errors)
+                trx.commit()
+            except Exception :
+                try :
+                    if trx.status == "running" :
+                        trx.abort()
+                finally :
+                    self._restoreStates(states)
+                raise
+        else :
+            results = self._send(operations)
+
+        for docId, doc in self.deleted.items() :
+            self.documents[docId] = (doc, False)
+        self.deleted.clear()
+        self.results.extend(results)
+        return results
+
+    def _documentStates(self, operations) :
+        "returns the state of the documents of 'operations', so that they can be restored if the transaction is aborted"
+        states = []
+        for collection, docs in operations.values() :
+            for opDocs in docs.values() :
+                for doc in opDocs :
+                    states.append((doc, dict((k, getattr(doc, k)) for k in _DOCUMENT_STATE)))
+        return states
+
+    def _restoreStates(self, states) :
+        "puts back the states returned by _documentStates()"
+        for doc, state in states :
+            for k, v in state.items() :
+                setattr(doc, k, v)
+
+    def _send(self, operations) :
+        "sends the operations and returns their results, as a list of (document, operation, result)"
+        results = []
+        for collection, docs in operations.values() :
+            if len(docs["insert"]) > 0 :
+                data = collection.saveMany(docs["insert"], batchSize = self.batchSize, waitForSync = self.waitForSync)
+                results.extend(zip(docs["insert"], ["insert"] * len(data), data))
+            if len(docs["patch"]) > 0 :
+                data = collection.updateMany(docs["patch"], batchSize = self.batchSize, keepNull = self.keepNull, waitForSync = self.waitForSync)
+                results.extend(zip(docs["patch"], ["patch"] * len(data), data))
+            if len(docs["replace"]) > 0 :
+                data = collection.replaceMany(docs["replace"], batchSize = self.batchSize, waitForSync = self.waitForSync)
+                results.extend(zip(docs["replace"], ["replace"] * len(data), data))
+            if len(docs["delete"]) > 0 :
+                data = collection.deleteMany(docs["delete"], batchSize = self.batchSize, waitForSync = self.waitForSync)
+                results.extend(zip(docs["delete"], ["delete"] * len(data), data))
+        return results
+
+    def __enter__(self) :
+        _activeUnits().append(self)
+        return self
+
+    def __exit__(self, excType, excValue, traceback) :
+        _activeUnits().remove(self)
+        if excType is None :
+            self.flush()
+        return False
@@ -35,8 +35,6 @@ class User(object) :
     def save(self):
         """Save/updates the user"""
 
-        import json
-
         payload = {}
         payload.update(self._store)
         payload["user"] = payload["username"]
@@ -44,7 +42,7 @@ class User(object) :
         del(payload["username"])
         del(payload["password"])
 
-        payload = json.dumps(payload)
+        payload = self.connection.codec.encode(payload)
         if not self.URL :
             if "username" not in self._store or "password" not in self._store :
                 raise KeyError("You must define self['name'] and self['password'] to be able to create a new user")    
@@ -65,8 +63,6 @@ class User(object) :
 
     def setPermissions(self, dbName, access) :
         """Grant revoke rights on a database, 'access' is supposed to be boolean. ArangoDB grants/revokes both read and write rights at the same time"""
-        import json
-
         if not self.URL :
             raise CreationError("Please save user first", None, None)
 
@@ -80,7 +76,7 @@ class User(object) :
             raise KeyError("Unknown database: %s" % dbName)
 
         url = "%s/database/%s" % (self.URL, dbName)
-        r = self.connection.session.put(url, data = json.dumps({"grant": rights}))
+        r = self.connection.session.put(url, data = self.connection.codec.encode({"grant": rights}))
         if r.status_code < 200 or r.status_code > 202 :
             raise CreationError("Unable to grant rights", r.content)
 
@@ -0,0 +1,206 @@
+import collections
+import copy
+import threading
+import time
+
+try :
+    import queue
+except ImportError :
+    import Queue as queue
+
+__all__ = ["WriteBehindQueue"]
+
+_STOP = object()
+
+class _Pending(object) :
+    """An item waiting in the queue: a Document, with a snapshot of its fields taken by put(), or a dictionary"""
+
+    __slots__ = ("item", "payload", "sent", "done")
+
+    def __init__(self, item, payload) :
+        self.item = item
+        self.payload = payload
+        self.sent = False
+        self.done = threading.Event()
+
+class WriteBehindQueue(object) :
+    """Saves new documents in the background: put() enqueues a Document (or a dictionary) and returns immediately, while 'nbWorkers' threads drain
+    the queue and insert the documents with Collection.saveMany(), up to 'batchSize' at a time. A document waits at most about 'maxLatency' seconds before being sent.
+    When the queue holds 'maxSize' documents, put() blocks until there is room (backpressure).
+    Documents that could not be saved are passed to onError(document, error), where error is either the result returned by ArangoDB or an exception.
+    Without onError, they are kept in 'errors' (the last 1000 of them).
+    What is sent is a snapshot of the document taken by put(): saving it again while it is still queued only updates the snapshot. Once inserted, a document modified in the meantime
+    is saved as a whole by its next save()"""
+
+    def __init__(self, collection, maxSize = 10000, batchSize = 1000, maxLatency = 0.1, nbWorkers = 1, onError = None, waitForSync = False) :
+        self.collection = collection
+        self.batchSize = batchSize
+        self.maxLatency = maxLatency
+        self.onError = onError
+        self.waitForSync = waitForSync
+        self.queue = queue.Queue(maxsize = maxSize)
+        self.errors = collections.deque(maxlen = 1000)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.pending = {}
+
+        self.nbBatches = 0
+        self.nbWritten = 0
+        self.nbErrors = 0
+
+        self.workers = []
+        for i in range(nbWorkers) :
+            worker = threading.Thread(target = self._work, name = "write-behind-%s-%d" % (collection.name, i))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def put(self, doc, timeout = None) :
+        """enqueues 'doc', blocks while the queue is full. Raises a queue.Full exception if there is still no room after 'timeout' seconds.
+        A Document that is already queued is not enqueued twice, its snapshot is updated instead. If it is being sent, put() waits for the end of
+        the write and returns False: the document must then be saved synchronously. Returns True otherwise"""
+        if self.closed :
+            raise ValueError("Write-behind queue of collection '%s' is closed" % self.collection.name)
+
+        if isinstance(doc, dict) :
+            self.queue.put(_Pending(doc, doc), timeout = timeout)
+            return True
+
+        payload = copy.deepcopy(doc._store)
+        if doc._key is not None :
+            payload["_key"] = doc._key
+
+        with self.lock :
+            entry = self.pending.get(id(doc))
+            if entry is not None and not entry.sent :
+                entry.payload = payload
+                return True
+        if entry is not None :
+            entry.done.wait()
+            return False
+
+        entry = _Pending(doc, payload)
+        with self.lock :
+            self.pending[id(doc)] = entry
+        try :
+            self.queue.put(entry, timeout = timeout)
+        except queue.Full :
+            with self.lock :
+                del(self.pending[id(doc)])
+            raise
+        return True
+
+    def flush(self) :
+        "blocks until all the documents enqueued so far have been sent"
+        self.queue.join()
+
+    def close(self) :
+        "sends the remaining documents and stops the workers"
+        if self.closed :
+            return
+        self.closed = True
+        for worker in self.workers :
+            self.queue.put(_STOP)
+        for worker in self.workers :
+            worker.join()
+
+    def __len__(self) :
+        return self.queue.qsize()
+
+    def getStats(self) :
+        "returns the counters of the queue"
+        with self.lock :
+            return {
+                "queued" : self.queue.qsize(),
+                "batches" : self.nbBatches,
+                "written" : self.nbWritten,
+                "errors" : self.nbErrors,
+            }
+
+    def _error(self, doc, error) :
+        with self.lock :
+            self.nbErrors += 1
+        if self.onError is None :
+            self.errors.append((doc, error))
+            return
+        try :
+            self.onError(doc, error)
+        except Exception as e :
+            self.errors.append((doc, e))
+
+    def _changed(self, doc, payload) :
+        "returns True if the fields of 'doc' differ from the snapshot that was sent"
+        snapshot = dict(payload)
+        if "_key" not in doc._store :
+            snapshot.pop("_key", None)
+        return doc._store != snapshot
+
+    def _write(self, batch) :
+        with self.lock :
+            for entry in batch :
+                entry.sent = True
+
+        try :
+            try :
+                results = self.collection.saveMany([entry.payload for entry in batch], batchSize = self.batchSize, waitForSync = self.waitForSync)
+            except Exception as e :
+                for entry in batch :
+                    self._error(entry.item, e)
+                return
+
+            nbWritten = 0
+            for entry, result in zip(batch, results) :
+                if result.get("error") :
+                    self._error(entry.item, result)
+                    continue
+
+                nbWritten += 1
+                doc = entry.item
+                if doc is not entry.payload :
+                    doc.setPrivates(dict(result))
+                    # changes made after the snapshot were not recorded as patches while the document had no URL
+                    if self._changed(doc, entry.payload) :
+                        doc._fullSave = True
+                    self.collection._cacheDocument(doc)
+
+            with self.lock :
+                self.nbBatches += 1
+                self.nbWritten += nbWritten
+        finally :
+            with self.lock :
+                for entry in batch :
+                    if entry.item is not entry.payload :
+                        self.pending.pop(id(entry.item), None)
+            for entry in batch :
+                entry.done.set()
+
+    def _work(self) :
+        stop = False
+        while not stop :
+            item = self.queue.get()
+            if item is _STOP :
+                self.queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.time() + self.maxLatency
+            while len(batch) < self.batchSize :
+                remaining = deadline - time.time()
+                if remaining <= 0 :
+                    break
+                try :
+                    item = self.queue.get(timeout = remaining)
+                except queue.Empty :
+                    break
+                if item is _STOP :
+                    stop = True
+                    break
+                batch.append(item)
+
+            try :
+                self._write(batch)
+            finally :
+                for doc in batch :
+                    self.queue.task_done()
+                if stop :
+                    self.queue.task_done()
@@ -46,6 +46,10 @@ setup(
 
     install_requires=['requests>=2.7.0', 'future'],
 
+    extras_require={
+        'async': ['aiohttp'],
+    },
+
     keywords='database ORM nosql arangodb driver validation',
 
     packages=find_packages(),